@@ -3,81 +3,69 @@ from streamlit_extras.add_vertical_space import add_vertical_space as avs
 from PIL import Image
 from dotenv import load_dotenv
 import os
-import google.generativeai as genai
+import sys
 import datetime
+import uuid
+
+# Shared QueryCraft helpers live next to the final deliverable pages
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "Final Deliverables", "The Project"))
+from querycraft.cache import ResponseCache
+from querycraft.dialects import DIALECTS, CheckedQuery
+from querycraft.fallback import convert_with_fallback
+from querycraft.prompts import TEAM_LEAD_TEMPLATE
+from querycraft.quota import scheduler_from_env
+from querycraft.resources import ConnectionPool
+from querycraft.routing import router_from_env
 
 # --- Configuration ---
 load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
-# Updated configuration with correct API version
-genai.configure(
-    api_key=GOOGLE_API_KEY,
-    transport='rest',
-    client_options={
-        'api_endpoint': 'https://generativelanguage.googleapis.com/v1'  # Changed from v1beta to v1
-    }
-)
-
 # Use the correct model name
+MODEL_NAME = 'gemini-1.5-flash'
+
+# Built once per server process instead of on every Streamlit rerun
+@st.cache_resource
+def get_model():
+    # Updated configuration with correct API version; QUERYCRAFT_MODEL_POOL
+    # adds targets to hedge across and fail over to
+    return router_from_env(
+        MODEL_NAME,  # Using stable version
+        api_key=GOOGLE_API_KEY,
+        transport='rest',
+        client_options={
+            'api_endpoint': 'https://generativelanguage.googleapis.com/v1'  # Changed from v1beta to v1
+        }
+    )
+
 try:
-    model = genai.GenerativeModel('gemini-1.5 flash')  # Using stable version
+    model = get_model()
 except Exception as e:
     st.error(f"Model initialization error: {str(e)}")
     model = None
 
 # --- Constants ---
-input_prompt_template = """
-You are an expert SQL developer. Convert this natural language query to perfect SQL:
-
-Follow these rules:
-1. Use standard SQL-92 syntax
-2. Assume reasonable table/column names if not specified
-3. Format for readability
-4. Include all requested fields
-5. Add comments for complex logic
-
-Example Input: "Show me customers who spent over $100 last month"
-Example Output: 
--- Query for high-value customers last month
-SELECT customer_name, total_spent 
-FROM customers 
-WHERE total_spent > 100 
-AND purchase_date >= DATE_SUB(CURRENT_DATE(), INTERVAL 1 MONTH)
-ORDER BY total_spent DESC;
-
-Now convert this:
-{query_text}
-"""
+input_prompt_template = TEAM_LEAD_TEMPLATE
+
+@st.cache_resource
+def get_response_cache():
+    return ResponseCache("querycraft.db")
+
+response_cache = get_response_cache()
+
+# One request/token budget for every session of this server (QUERYCRAFT_RPM, QUERYCRAFT_USER_RPM, ...)
+@st.cache_resource
+def get_scheduler():
+    return scheduler_from_env(ConnectionPool("querycraft.db"))
+
+scheduler = get_scheduler()
 
 # --- Helper Functions ---
-def get_gemini_response(input_text):
-    if not model:
-        return "Error: Model not initialized properly"
-    
-    prompt = input_prompt_template.format(query_text=input_text)
-    try:
-        response = model.generate_content(
-            prompt,
-            generation_config={
-                "temperature": 0.3,  # More deterministic output
-                "max_output_tokens": 1000,
-            }
-        )
-        return response.text
-    except Exception as e:
-        return f"API Error: {str(e)}\n\nHere's a suggested query:\n{generate_fallback_query(input_text)}"
-
-def generate_fallback_query(input_text):
-    """Generate a basic SQL query when API fails"""
-    today = datetime.date.today()
-    return f"""-- Generated fallback query
-SELECT first_name, last_name, email 
-FROM employees 
-WHERE department = 'Sales' 
-AND hire_date > '2022-01-01'
-ORDER BY last_name ASC;
--- Original request: {input_text[:200]}..."""
+def get_gemini_response(input_text, bypass_cache=False):
+    # Budgeted per signed-in user, else per browser session
+    user = st.user.get("email") or st.session_state.setdefault("session_id", uuid.uuid4().hex)
+    return convert_with_fallback(model, response_cache, input_text, MODEL_NAME, bypass_cache=bypass_cache,
+                                 scheduler=scheduler, user_id=user)
 
 # --- Page Sections ---
 def show_intro():
@@ -133,18 +121,28 @@ def show_converter():
                               placeholder="e.g., Show Sales employees hired after Jan 1 2022 with emails",
                               height=150,
                               key="query_input")
+        bypass_cache = st.checkbox("Bypass response cache", key="bypass_cache")
         
         if st.button("Convert to SQL", type="primary", key="convert_btn"):
             if not sql_text.strip():
                 st.warning("Please enter a query")
             else:
                 with st.spinner("Generating SQL query..."):
-                    response = get_gemini_response(sql_text)
+                    response = get_gemini_response(sql_text, bypass_cache=bypass_cache)
                     
                     st.subheader("Generated SQL Query")
                     if "SELECT" in response:
                         st.code(response, language='sql')
                         st.success("Conversion successful!")
+                        # Other dialects are transpiled locally instead of asking Gemini again
+                        try:
+                            checked = CheckedQuery(response)
+                        except ValueError as e:
+                            st.warning(str(e))
+                        else:
+                            with st.expander("Other SQL dialects"):
+                                for tab, dialect_sql in zip(st.tabs(list(DIALECTS)), checked.transpile().values()):
+                                    tab.code(dialect_sql, language='sql')
                         st.download_button(
                             label="Download SQL",
                             data=response,
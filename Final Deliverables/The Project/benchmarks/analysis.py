@@ -0,0 +1,100 @@
+# benchmarks/analysis.py
+"""Query-plan analysis on a synthetic shop database: are its index suggestions worth it?
+
+``customers`` (``--rows`` / 4) and ``orders`` (``--rows``) are built in a
+temporary SQLite file with only primary keys and ANALYZE statistics. For each
+query the kind a model writes - filters, a join, a sort - the report holds:
+    findings       - what querycraft.analysis.analyze flagged
+    analyze_ms     - time spent analyzing (EXPLAIN + AST)
+    before / after - query time and estimated rows examined, without and
+                     with the suggested CREATE INDEX statements applied
+
+Usage (from "Final Deliverables/The Project"):
+    python benchmarks/analysis.py [--rows 200000] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from querycraft.analysis import analyze
+from querycraft.dialects import CheckedQuery
+
+QUERIES = [
+    "SELECT * FROM orders WHERE customer_id = 4242",
+    "SELECT c.name, o.total FROM customers c JOIN orders o ON o.customer_id = c.id WHERE c.email = 'c77@example.com'",
+    "SELECT id, total FROM orders WHERE status = 'refunded' AND created_at >= '2024-06-01'",
+    "SELECT * FROM orders ORDER BY total DESC LIMIT 10",
+    "SELECT * FROM customers WHERE LOWER(email) = 'c77@example.com'",
+]
+
+
+def build(path, rows):
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE customers (id INTEGER PRIMARY KEY, name TEXT, email TEXT, region TEXT);
+        CREATE TABLE orders (id INTEGER PRIMARY KEY, customer_id INTEGER, total REAL, status TEXT, created_at TEXT);
+    """)
+    customers = rows // 4
+    conn.executemany("INSERT INTO customers VALUES (?, ?, ?, ?)",
+                     ((i, f"customer {i}", f"c{i}@example.com", f"region {i % 12}") for i in range(customers)))
+    statuses = ["paid", "shipped", "refunded", "pending"]
+    conn.executemany("INSERT INTO orders VALUES (?, ?, ?, ?, ?)",
+                     ((i, (i * 7919) % customers, (i * 31) % 1000 + 0.99, statuses[i % 4],
+                       f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}") for i in range(rows)))
+    conn.commit()
+    conn.execute("ANALYZE")
+    return conn
+
+
+def timed(conn, sql, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.execute(sql).fetchall()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best * 1000, 2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    report = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for i, question_sql in enumerate(QUERIES):
+            conn = build(os.path.join(workdir, f"shop{i}.db"), args.rows)
+            checked = CheckedQuery(question_sql)
+            sql = checked.to("sqlite", pretty=False)
+            started = time.perf_counter()
+            before = analyze(checked, conn)
+            analyze_ms = round((time.perf_counter() - started) * 1000, 2)
+            entry = {
+                "query": question_sql,
+                "findings": [f"{finding.severity}: {finding.message}" for finding in before.findings],
+                "indexes": before.indexes,
+                "analyze_ms": analyze_ms,
+                "before": {"ms": timed(conn, sql, args.repeat), "est_rows": before.estimated_rows},
+            }
+            for statement in before.indexes:
+                conn.execute(statement)
+            conn.execute("ANALYZE")
+            after = analyze(checked, conn)
+            entry["after"] = {"ms": timed(conn, sql, args.repeat), "est_rows": after.estimated_rows,
+                              "findings": len(after.findings)}
+            report.append(entry)
+            conn.close()
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# benchmarks/datasets.py
+"""Loading an uploaded CSV / Parquet file into a queryable SQLite sandbox.
+
+A synthetic sales file of ``--rows`` rows is written as CSV and Parquet, then
+loaded three ways:
+    pandas      - pd.read_csv + DataFrame.to_sql, the straightforward approach
+    sandbox     - querycraft.datasets.SandboxStore.load (chunked executemany)
+    re-upload   - the same bytes again, answered from the content-hash key
+
+Reported per run: wall time, rows per second and peak Python memory. Memory
+is traced (tracemalloc) in a second, separate run because tracing slows the
+loaders down; both runs load into fresh directories.
+
+Usage (from "Final Deliverables/The Project"):
+    python benchmarks/datasets.py [--rows 200000]
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from querycraft.datasets import SandboxStore
+
+
+def write_files(workdir, rows, seed=3):
+    import pyarrow as pa
+    import pyarrow.csv as pcsv
+    import pyarrow.parquet as pq
+
+    rng = random.Random(seed)
+    regions = ["north", "south", "east", "west", "central"]
+    table = pa.table({
+        "order_id": list(range(rows)),
+        "region": [rng.choice(regions) for _ in range(rows)],
+        "product": [f"sku-{rng.randrange(5000):05d}" for _ in range(rows)],
+        "units": [rng.randrange(1, 50) for _ in range(rows)],
+        "unit_price": [round(rng.uniform(1, 500), 2) for _ in range(rows)],
+        "ordered_on": [f"2024-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}" for _ in range(rows)],
+    })
+    csv_path = os.path.join(workdir, "sales.csv")
+    parquet_path = os.path.join(workdir, "sales.parquet")
+    pcsv.write_csv(table, csv_path)
+    pq.write_table(table, parquet_path)
+    return csv_path, parquet_path
+
+
+def measure(run, rows, workdir):
+    """``run(root)`` loads into the empty directory ``root``"""
+    started = time.perf_counter()
+    run(tempfile.mkdtemp(dir=workdir))
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    run(tempfile.mkdtemp(dir=workdir))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"s": round(elapsed, 3), "rows_per_s": round(rows / elapsed), "peak_mb": round(peak / 2 ** 20, 1)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000)
+    args = parser.parse_args(argv)
+    import pandas as pd
+
+    with tempfile.TemporaryDirectory() as workdir:
+        csv_path, parquet_path = write_files(workdir, args.rows)
+
+        def pandas_load(root):
+            conn = sqlite3.connect(os.path.join(root, "pandas.db"))
+            pd.read_csv(csv_path).to_sql("sales", conn, index=False)
+            conn.close()
+
+        store = SandboxStore(root=os.path.join(workdir, "sandboxes"))
+        dataset = store.load(csv_path)
+        report = {
+            "file_mb": {"csv": round(os.path.getsize(csv_path) / 2 ** 20, 1),
+                        "parquet": round(os.path.getsize(parquet_path) / 2 ** 20, 1)},
+            "pandas csv": measure(pandas_load, args.rows, workdir),
+            "sandbox csv": measure(lambda root: SandboxStore(root).load(csv_path), args.rows, workdir),
+            "re-upload csv": measure(lambda root: store.load(csv_path), args.rows, workdir),
+            "sandbox parquet": measure(lambda root: SandboxStore(root).load(parquet_path), args.rows, workdir),
+        }
+        report["inferred_columns"] = dataset.columns
+        conn = store.connect([dataset.digest])
+        report["check"] = conn.execute(
+            "SELECT COUNT(*), SUM(units), typeof(unit_price) FROM sales").fetchone()
+        conn.close()
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
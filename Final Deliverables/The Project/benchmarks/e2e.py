@@ -0,0 +1,288 @@
+# benchmarks/e2e.py
+"""Offline end-to-end benchmark of the QueryCraft conversion pipelines.
+
+Each request runs the same stages as the app: prompt build -> model call ->
+queries insert -> demo execution. The model is a local stub server with a
+configurable latency distribution, so runs are reproducible and need no
+network or API key.
+
+Two pipelines are measured:
+    converter  - pages/Converter.py (dynamic examples, streaming, response cache)
+    team_lead  - Assignments/Team Lead/app.py (cached call with fallback)
+
+Each concurrency level starts from an empty database and cache, so hit rates
+are comparable between levels. Results are printed as JSON. Pass
+``--baseline previous.json`` to exit non-zero when p95 latency or throughput
+regressed by more than ``--tolerance``.
+
+Usage (from "Final Deliverables/The Project"):
+    python benchmarks/e2e.py --requests 200 --concurrency 1,4,16 --latency lognormal:0.05,0.5
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from querycraft.cache import ResponseCache
+from querycraft.db import ensure_queries_table, insert_query
+from querycraft.dialects import CheckedQuery
+from querycraft.examples import ExampleStore
+from querycraft.execution import run_demo_query
+from querycraft.fallback import convert_with_fallback
+from querycraft.history import HistoryStore
+from querycraft.pipeline import Converter
+from querycraft.resources import ConnectionPool, DemoDatabase
+from querycraft.rules import demo_engine
+from querycraft.stub import LatencyDistribution, RemoteStubModel, StubModel, StubServer
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "history.jsonl")
+
+
+def load_questions(path=FIXTURES):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["question"] for line in f if line.strip()]
+
+
+def zipf_workload(questions, count, skew, seed):
+    """Sample ``count`` questions with Zipf-like popularity, as real users repeat themselves"""
+    rng = random.Random(seed)
+    weights = [1 / (rank ** skew) for rank in range(1, len(questions) + 1)]
+    return rng.choices(questions, weights=weights, k=count)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return round(sorted_values[index], 3)
+
+
+class Environment:
+    """Fresh database, pool, cache and demo DB for one benchmark run"""
+
+    def __init__(self, model, workdir):
+        self.model = model
+        self.db_path = os.path.join(workdir, f"bench-{time.perf_counter_ns()}.db")
+        self.pool = ConnectionPool(self.db_path, size=8)
+        self.history = HistoryStore(self.pool)
+        self.cache = ResponseCache(self.db_path)
+        self.examples = ExampleStore()
+        self.converter = Converter(model, model.model_name, cache=self.cache, history=self.history,
+                                   examples=self.examples, rules=demo_engine())
+        self.demo = DemoDatabase()
+
+    def close(self):
+        self.pool.close()
+
+
+def converter_request(env, question):
+    """pages/Converter.py: rules or examples -> streamed, cached model call -> insert -> transpile -> demo run"""
+    result = env.converter.convert(question, stream=True)
+    checked = CheckedQuery(result.sql)
+    checked.transpile()
+    demo_conn = env.demo.clone()
+    try:
+        run_demo_query(demo_conn, checked)
+    finally:
+        demo_conn.close()
+    return result.ttft_ms
+
+
+def team_lead_request(env, question):
+    """Assignments/Team Lead/app.py: rules or cached call with fallback -> insert -> demo run"""
+    response = convert_with_fallback(env.model, env.cache, question, env.model.model_name)
+    env.history.record(question, response)
+    try:
+        checked = CheckedQuery(response)
+    except ValueError:
+        return None
+    checked.transpile()
+    demo_conn = env.demo.clone()
+    try:
+        run_demo_query(demo_conn, checked)
+    finally:
+        demo_conn.close()
+    return None
+
+
+PIPELINES = {
+    "converter": converter_request,
+    "team_lead": team_lead_request,
+}
+
+
+def run_level(pipeline, model, workload, concurrency, workdir):
+    env = Environment(model, workdir)
+    latencies, ttfts, errors = [], [], 0
+
+    def one(question):
+        started = time.perf_counter()
+        ttft = pipeline(env, question)
+        return (time.perf_counter() - started) * 1000, ttft
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(one, question) for question in workload]
+        for future in futures:
+            try:
+                latency, ttft = future.result()
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(latency)
+            if ttft is not None:
+                ttfts.append(ttft)
+    elapsed = time.perf_counter() - started
+    stats = env.cache.stats()
+    env.close()
+
+    latencies.sort()
+    ttfts.sort()
+    result = {
+        "concurrency": concurrency,
+        "requests": len(workload),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "latency_ms": {f"p{p}": percentile(latencies, p) for p in (50, 95, 99)},
+        "cache_hit_rate": round(stats["hit_rate"], 3),
+    }
+    if ttfts:
+        result["ttft_ms"] = {f"p{p}": percentile(ttfts, p) for p in (50, 95, 99)}
+    return result
+
+
+def sqlite_write_throughput(workdir, rows=2000, chunk_size=100):
+    """Rows/second for one commit per row vs chunked executemany"""
+    results = {}
+    payload = [(f"question {i}", f"SELECT {i};") for i in range(rows)]
+
+    pool = ConnectionPool(os.path.join(workdir, "writes-per-row.db"), size=1)
+    with pool.connection() as conn:
+        ensure_queries_table(conn)
+        started = time.perf_counter()
+        for question, sql in payload:
+            insert_query(conn, question, sql)
+        results["per_row_commit_rows_per_s"] = round(rows / (time.perf_counter() - started))
+    pool.close()
+
+    pool = ConnectionPool(os.path.join(workdir, "writes-chunked.db"), size=1)
+    with pool.connection() as conn:
+        ensure_queries_table(conn)
+        started = time.perf_counter()
+        for i in range(0, rows, chunk_size):
+            conn.executemany(
+                "INSERT INTO queries (input_text, sql_generated) VALUES (?, ?)", payload[i:i + chunk_size]
+            )
+            conn.commit()
+        results["chunked_executemany_rows_per_s"] = round(rows / (time.perf_counter() - started))
+    pool.close()
+    results["rows"] = rows
+    results["chunk_size"] = chunk_size
+    return results
+
+
+def find_regressions(current, baseline, tolerance):
+    regressions = []
+    for name, levels in current["pipelines"].items():
+        previous = {level["concurrency"]: level for level in baseline.get("pipelines", {}).get(name, [])}
+        for level in levels:
+            old = previous.get(level["concurrency"])
+            if old is None:
+                continue
+            where = f"{name}@{level['concurrency']}"
+            old_p95, new_p95 = old["latency_ms"]["p95"], level["latency_ms"]["p95"]
+            if old_p95 and new_p95 and new_p95 > old_p95 * (1 + tolerance):
+                regressions.append(f"{where}: p95 {old_p95} -> {new_p95} ms")
+            if level["throughput_rps"] < old["throughput_rps"] * (1 - tolerance):
+                regressions.append(f"{where}: throughput {old['throughput_rps']} -> {level['throughput_rps']} rps")
+    return regressions
+
+
+def run(requests=200, concurrency=(1, 4, 16), latency="lognormal:0.05,0.5", error_rate=0.0,
+        stub="http", pipelines=tuple(PIPELINES), skew=1.1, seed=7):
+    workload = zipf_workload(load_questions(), requests, skew, seed)
+    distribution = LatencyDistribution.parse(latency)
+    report = {
+        "config": {
+            "requests": requests,
+            "concurrency": list(concurrency),
+            "latency": repr(distribution),
+            "error_rate": error_rate,
+            "stub": stub,
+            "zipf_skew": skew,
+            "seed": seed,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+        },
+        "pipelines": {},
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        server = None
+        if stub == "http":
+            server = StubServer(distribution, error_rate=error_rate, seed=seed).start()
+            model = RemoteStubModel(server.url)
+        else:
+            model = StubModel(distribution, error_rate=error_rate, seed=seed)
+        try:
+            for name in pipelines:
+                report["pipelines"][name] = [
+                    run_level(PIPELINES[name], model, workload, level, workdir) for level in concurrency
+                ]
+        finally:
+            if server is not None:
+                server.stop()
+        report["sqlite_writes"] = sqlite_write_throughput(workdir)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline end-to-end QueryCraft benchmark.")
+    parser.add_argument("--requests", type=int, default=200, help="requests per concurrency level")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated concurrency levels")
+    parser.add_argument("--latency", default="lognormal:0.05,0.5",
+                        help="stub latency distribution, e.g. constant:0.05 or uniform:0.02,0.08")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--stub", choices=("http", "inprocess"), default="http")
+    parser.add_argument("--pipelines", default=",".join(PIPELINES))
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf skew of repeated questions")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--baseline", help="previous report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    report = run(
+        requests=args.requests,
+        concurrency=[int(level) for level in args.concurrency.split(",")],
+        latency=args.latency,
+        error_rate=args.error_rate,
+        stub=args.stub,
+        pipelines=[name.strip() for name in args.pipelines.split(",")],
+        skew=args.skew,
+        seed=args.seed,
+    )
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            report["regressions"] = find_regressions(report, json.load(f), args.tolerance)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    return 1 if report.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+# benchmarks/execution.py
+"""Cost of running runaway generated SQL on the demo table, before and after limits.
+
+Each query is a cross join of the demo ``employees`` table with itself,
+which grows as 4^n rows, plus one endless recursive CTE:
+    unbounded - pd.read_sql_query, as the demo section used to run it
+    bounded   - querycraft.execution.execute_query with the page's limits
+
+Reported per query: wall time, peak Python memory (tracemalloc), rows kept
+and whether a limit stopped it. The endless query is only run bounded.
+
+Usage (from "Final Deliverables/The Project"):
+    python benchmarks/execution.py [--max-joins 9]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from querycraft.execution import ExecutionLimits, QueryTimeout, execute_query
+from querycraft.resources import DemoDatabase
+
+LIMITS = ExecutionLimits(timeout_s=2.0, max_rows=10000, max_bytes=8 * 1024 * 1024, page_size=50)
+ENDLESS = "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n) SELECT x FROM n ORDER BY x DESC"
+
+
+def cross_join(n):
+    aliases = [f"t{i}" for i in range(n)]
+    columns = ", ".join(f"{alias}.name AS name{i}" for i, alias in enumerate(aliases))
+    return f"SELECT {columns} FROM " + ", ".join(f"employees {alias}" for alias in aliases)
+
+
+def measure(run):
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        rows, stopped = run()
+    except QueryTimeout:
+        rows, stopped = 0, "time"
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"ms": round(elapsed * 1000, 1), "peak_mb": round(peak / 2 ** 20, 2), "rows": rows, "stopped": stopped}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-joins", type=int, default=9, help="largest cross join (4^n rows)")
+    args = parser.parse_args(argv)
+    import pandas as pd
+
+    demo = DemoDatabase()
+    conn = demo.clone()
+
+    def bounded(sql):
+        result = execute_query(conn, sql, LIMITS)
+        return result.row_count, result.truncated
+
+    def unbounded(sql):
+        return len(pd.read_sql_query(sql, conn)), None
+
+    bounded("SELECT 1")  # import sqlglot outside the measurements
+    report = []
+    for n in range(3, args.max_joins + 1, 2):
+        sql = cross_join(n)
+        report.append({"query": f"cross join x{n} ({4 ** n} rows)",
+                       "unbounded": measure(lambda: unbounded(sql)),
+                       "bounded": measure(lambda: bounded(sql))})
+    report.append({"query": "endless recursive CTE", "unbounded": "does not finish",
+                   "bounded": measure(lambda: bounded(ENDLESS))})
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# benchmarks/history.py
+"""History browsing and search latency as the ``queries`` table grows.
+
+For each size a fresh database is filled with synthetic conversions (through
+the FTS triggers, like the app) and timed for:
+    legacy_last5   - the old sidebar query, ORDER BY created_at on an unindexed copy
+    first_page     - HistoryStore.page()
+    deep_page      - a page 100 pages in, reached by following cursors
+    session_page   - first page scoped to one session
+    search         - full-text search, first and next page
+
+Usage (from "Final Deliverables/The Project"):
+    python benchmarks/history.py [--sizes 10000,100000,500000] [--repeat 50]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from querycraft.history import HistoryStore
+from querycraft.resources import ConnectionPool
+
+WORDS = ("salary department employees orders customers revenue region product month year total "
+         "average count top sales invoice supplier inventory shipped pending refund").split()
+
+
+def fill(pool, rows, seed=7, chunk_size=5000):
+    rng = random.Random(seed)
+    with pool.connection() as conn:
+        for start in range(0, rows, chunk_size):
+            batch = []
+            for i in range(start, min(rows, start + chunk_size)):
+                question = " ".join(rng.choices(WORDS, k=8))
+                batch.append((question, f"SELECT * FROM t{i % 50};", None, f"s{i % 1000}"))
+            conn.executemany(
+                "INSERT INTO queries (input_text, sql_generated, user_id, session_id) VALUES (?, ?, ?, ?)", batch
+            )
+            conn.commit()
+        # The pre-index layout, for the legacy query
+        conn.execute("CREATE TABLE legacy AS SELECT id, input_text, created_at FROM queries")
+
+
+def timed_ms(function, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(samples), 3)
+
+
+def run_size(workdir, rows, repeat):
+    pool = ConnectionPool(os.path.join(workdir, f"history-{rows}.db"), size=1)
+    history = HistoryStore(pool)
+    started = time.perf_counter()
+    fill(pool, rows)
+    fill_s = time.perf_counter() - started
+
+    def legacy():
+        with pool.connection() as conn:
+            conn.execute("SELECT input_text, created_at FROM legacy ORDER BY created_at DESC LIMIT 5").fetchall()
+
+    cursor = None
+    for _ in range(100):
+        cursor = history.page(5, before=cursor).next_cursor
+    search_cursor = history.page(5, search="salary refund").next_cursor
+    result = {
+        "rows": rows,
+        "fill_rows_per_s": round(rows / fill_s),
+        "legacy_last5_ms": timed_ms(legacy, repeat),
+        "first_page_ms": timed_ms(lambda: history.page(5), repeat),
+        "deep_page_ms": timed_ms(lambda: history.page(5, before=cursor), repeat),
+        "session_page_ms": timed_ms(lambda: history.page(5, session_id="s42"), repeat),
+        "search_first_page_ms": timed_ms(lambda: history.page(5, search="salary refund"), repeat),
+        "search_next_page_ms": timed_ms(lambda: history.page(5, before=search_cursor, search="salary refund"),
+                                        repeat),
+    }
+    pool.close()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,500000")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args(argv)
+    with tempfile.TemporaryDirectory() as workdir:
+        report = [run_size(workdir, int(size), args.repeat) for size in args.sizes.split(",")]
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# benchmarks/prompt_tokens.py
+"""Compare prompt sizes: the four static few-shot examples vs dynamic selection.
+
+Each fixture question is evaluated leave-one-out: the example store holds
+every other fixture pair, so a question never retrieves its own answer.
+
+Usage (from "Final Deliverables/The Project"):
+    python benchmarks/prompt_tokens.py [--k 3] [--budget 300]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from querycraft.examples import ExampleStore
+from querycraft.prompts import build_prompt, estimate_tokens
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "history.jsonl")
+
+
+def load_pairs(path=FIXTURES):
+    with open(path, encoding="utf-8") as f:
+        return [(row["question"], row["sql"]) for row in map(json.loads, f) if row]
+
+
+def summarize(values):
+    return {
+        "mean": round(statistics.mean(values), 1),
+        "median": statistics.median(values),
+        "max": max(values),
+    }
+
+
+def run(k=3, budget=300):
+    pairs = load_pairs()
+    static_tokens, dynamic_tokens, select_ms = [], [], []
+    for i, (question, _) in enumerate(pairs):
+        store = ExampleStore()
+        for other in pairs[:i] + pairs[i + 1:]:
+            store.add(*other)
+        static_tokens.append(estimate_tokens(build_prompt(question)))
+        started = time.perf_counter()
+        examples = store.select(question, k=k, token_budget=budget)
+        select_ms.append((time.perf_counter() - started) * 1000)
+        dynamic_tokens.append(estimate_tokens(build_prompt(question, examples=examples)))
+    static_mean = statistics.mean(static_tokens)
+    dynamic_mean = statistics.mean(dynamic_tokens)
+    return {
+        "questions": len(pairs),
+        "k": k,
+        "token_budget": budget,
+        "static_prompt_tokens": summarize(static_tokens),
+        "dynamic_prompt_tokens": summarize(dynamic_tokens),
+        "reduction_pct": round(100 * (1 - dynamic_mean / static_mean), 1),
+        "selection_ms": summarize([round(ms, 3) for ms in select_ms]),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--budget", type=int, default=300)
+    args = parser.parse_args(argv)
+    json.dump(run(args.k, args.budget), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# benchmarks/quota.py
+"""One heavy user against a shared API key, with and without the quota scheduler.
+
+A StubModel behind a provider-side limit of ``--provider-rpm`` requests per
+minute stands in for the shared Gemini key; past the limit it fails like an
+HTTP 429. For ``--seconds`` seconds, through one Converter (no cache, no rule
+fast path, rule-engine fallback):
+    heavy  - one user with ``--heavy-threads`` threads converting back to back
+    light  - ``--light-users`` users converting once a second each
+    batch  - a batch job with two threads at "batch" priority
+run once calling the model directly and once through a QuotaScheduler with
+the provider's limit as its global budget and ``--user-rpm`` per user.
+
+Reported per mode and class: conversions, share answered by the model
+(the rest fell back to the rule engine), p50/p95 latency, and the
+provider's 429s; for the scheduled run also the per-user usage it recorded
+(requests, input/output tokens, calls over budget).
+
+Usage (from "Final Deliverables/The Project"):
+    python benchmarks/quota.py [--seconds 15] [--provider-rpm 600] [--user-rpm 120] [--latency 0.05]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from querycraft.pipeline import Converter
+from querycraft.quota import QuotaScheduler
+from querycraft.ratelimit import TokenBucket
+from querycraft.resources import ConnectionPool
+from querycraft.rules import demo_engine
+from querycraft.stub import StubError, StubModel
+
+QUESTION = "names of employees older than 30"
+SQL = "SQL Query:\nSELECT name FROM employees WHERE age > 30;\n"
+
+
+class ProviderLimitedModel:
+    """The shared key: ``rpm`` requests per minute, then errors (after a round trip) until the bucket refills"""
+
+    def __init__(self, model, rpm, latency):
+        self.model = model
+        self.latency = latency
+        self.bucket = TokenBucket.per_minute(rpm, burst=rpm)
+        self.rejected = 0
+
+    def generate_content(self, prompt, **options):
+        if not self.bucket.try_acquire():
+            self.rejected += 1
+            time.sleep(self.latency)
+            raise StubError("429 resource exhausted")
+        return self.model.generate_content(prompt, **options)
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    index = max(0, min(len(values) - 1, round(pct / 100 * len(values) + 0.5) - 1))
+    return round(values[index], 1)
+
+
+def run_mode(scheduled, args, workdir):
+    model = ProviderLimitedModel(StubModel(latency=args.latency, responder=lambda prompt: SQL), args.provider_rpm,
+                                 args.latency)
+    scheduler = None
+    if scheduled:
+        scheduler = QuotaScheduler(requests_per_minute=args.provider_rpm, user_requests_per_minute=args.user_rpm,
+                                   max_wait_s=1.0, batch_max_wait_s=2.0,
+                                   pool=ConnectionPool(os.path.join(workdir, "querycraft.db")))
+    converter = Converter(model, "stub", fast_path=False, rules=demo_engine(), scheduler=scheduler)
+    stop = time.monotonic() + args.seconds
+    outcomes = {"heavy": [], "light": [], "batch": []}
+
+    def user(kind, name, pause=0.0, priority="interactive"):
+        while time.monotonic() < stop:
+            started = time.perf_counter()
+            result = converter.convert(QUESTION, user_id=name, priority=priority)
+            outcomes[kind].append((result.source, (time.perf_counter() - started) * 1000))
+            if pause:
+                time.sleep(pause)
+
+    threads = [threading.Thread(target=user, args=("heavy", "heavy")) for _ in range(args.heavy_threads)]
+    threads += [threading.Thread(target=user, args=("light", f"light-{i}", 1.0)) for i in range(args.light_users)]
+    threads += [threading.Thread(target=user, args=("batch", "batch-job", 0.0, "batch")) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    report = {"provider_429s": model.rejected}
+    for kind, results in outcomes.items():
+        latencies = [ms for _, ms in results]
+        answered = sum(source == "model" for source, _ in results)
+        report[kind] = {
+            "conversions": len(results),
+            "model_share": round(answered / len(results), 3) if results else None,
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+        }
+    if scheduler is not None:
+        columns = ("day", "user", "requests", "input_tokens", "output_tokens", "over_budget")
+        report["usage"] = [dict(zip(columns, row)) for row in scheduler.usage(days=1)]
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=15.0)
+    parser.add_argument("--provider-rpm", type=int, default=600)
+    parser.add_argument("--user-rpm", type=int, default=120)
+    parser.add_argument("--heavy-threads", type=int, default=8)
+    parser.add_argument("--light-users", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub model latency (s)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        report = {"unscheduled": run_mode(False, args, workdir), "scheduled": run_mode(True, args, workdir)}
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
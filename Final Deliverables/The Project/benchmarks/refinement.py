@@ -0,0 +1,135 @@
+# benchmarks/refinement.py
+"""Per-turn prompt size and latency: stateless conversions vs. conversational refinement.
+
+Each scripted conversation is a first question and follow-ups such as "now
+only for 2023", answered against a registered shop schema with few-shot
+examples from the history fixtures. Three ways to run them:
+    stateless      - every turn is a fresh conversion of the question restated
+                     in full (first question plus every change so far), as before
+    refine         - a Conversation: follow-ups send only the change, the current
+                     SQL and the schema tables that SQL uses
+    refine+cached  - as refine, with a context cache holding the first prompt,
+                     so follow-ups carry no schema either
+
+The StubModel's latency is ``--latency`` plus ``--token-ms`` per prompt token
+(prefill), so shorter prompts answer sooner. Reported per mode and turn:
+mean prompt tokens sent and mean latency; for refine+cached also the tokens
+served from the cache.
+
+Usage (from "Final Deliverables/The Project"):
+    python benchmarks/refinement.py [--token-ms 0.05] [--latency 0.02] [--repeat 3]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from querycraft.examples import ExampleStore
+from querycraft.pipeline import Conversation, Converter
+from querycraft.prompts import estimate_tokens
+from querycraft.schema import SchemaRegistry
+from querycraft.stub import StubModel
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "history.jsonl")
+
+SHOP_DDL = """
+CREATE TABLE customers (id INTEGER PRIMARY KEY, name TEXT, email TEXT, region_id INTEGER REFERENCES regions (id),
+                        signed_up DATE);
+CREATE TABLE regions (id INTEGER PRIMARY KEY, name TEXT, country TEXT);
+CREATE TABLE orders (id INTEGER PRIMARY KEY, customer_id INTEGER REFERENCES customers (id), ordered_at DATE,
+                     status TEXT, total REAL);
+CREATE TABLE order_items (id INTEGER PRIMARY KEY, order_id INTEGER REFERENCES orders (id),
+                          product_id INTEGER REFERENCES products (id), quantity INTEGER, unit_price REAL);
+CREATE TABLE products (id INTEGER PRIMARY KEY, name TEXT, category_id INTEGER REFERENCES categories (id),
+                       price REAL);
+CREATE TABLE categories (id INTEGER PRIMARY KEY, name TEXT);
+CREATE TABLE employees (id INTEGER PRIMARY KEY, name TEXT, department TEXT, salary REAL, hired_on DATE);
+CREATE TABLE refunds (id INTEGER PRIMARY KEY, order_id INTEGER REFERENCES orders (id), amount REAL,
+                      refunded_at DATE);
+"""
+
+CONVERSATIONS = [
+    ["revenue per customer from orders", "now only for 2023", "only shipped orders",
+     "add the customer's region name", "sort by revenue, highest first"],
+    ["number of products per category", "only categories with more than 10 products",
+     "include the average product price", "order by category name"],
+    ["employees and their salaries", "only the Sales department", "hired after 2020",
+     "show the top 5 by salary"],
+]
+
+SQL = ("SQL Query:\nSELECT c.name, SUM(o.total) AS revenue\nFROM orders o\n"
+       "JOIN customers c ON c.id = o.customer_id\nGROUP BY c.name;\n")
+
+
+class StubContextCache:
+    """Stands in for provider context caching: the cached prefix is simply not sent"""
+
+    def __init__(self, model):
+        self.model = model
+        self.cached_tokens = 0
+
+    def model_for(self, prefix):
+        self.cached_tokens += estimate_tokens(prefix)
+        return self.model
+
+
+def load_examples(path=FIXTURES):
+    store = ExampleStore()
+    with open(path, encoding="utf-8") as f:
+        for row in map(json.loads, f):
+            store.add(row["question"], row["sql"])
+    return store
+
+
+def run_mode(mode, registry, examples, args):
+    model = StubModel(latency=args.latency, token_latency=args.token_ms / 1000, responder=lambda prompt: SQL)
+    context_cache = StubContextCache(model) if mode == "refine+cached" else None
+    converter = Converter(model, "stub", examples=examples, schemas=registry, fast_path=False,
+                          context_cache=context_cache)
+    tokens, latency = {}, {}
+    for _ in range(args.repeat):
+        for turns in CONVERSATIONS:
+            conversation = Conversation()
+            for number, change in enumerate(turns, start=1):
+                if mode == "stateless":
+                    result = converter.convert("; ".join(turns[:number]), schema_target="shop")
+                else:
+                    result = converter.convert(change, schema_target="shop", conversation=conversation)
+                tokens.setdefault(number, []).append(result.prompt_tokens)
+                latency.setdefault(number, []).append(result.latency_ms)
+    report = {
+        "per_turn": {
+            number: {"prompt_tokens": round(statistics.mean(tokens[number])),
+                     "latency_ms": round(statistics.mean(latency[number]), 1)}
+            for number in sorted(tokens)
+        },
+        "follow_up_tokens": round(statistics.mean(v for n in tokens if n > 1 for v in tokens[n])),
+        "follow_up_latency_ms": round(statistics.mean(v for n in latency if n > 1 for v in latency[n]), 1),
+    }
+    if context_cache is not None:
+        report["cached_prefix_tokens"] = context_cache.cached_tokens // args.repeat
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--token-ms", type=float, default=0.05, help="stub prefill time per prompt token (ms)")
+    parser.add_argument("--latency", type=float, default=0.02, help="stub base latency (s)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        registry = SchemaRegistry(cache_dir=workdir)
+        registry.register_ddl("shop", SHOP_DDL)
+        examples = load_examples()
+        report = {mode: run_mode(mode, registry, examples, args) for mode in ("stateless", "refine", "refine+cached")}
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+# benchmarks/rerun_cost.py
+"""Script time per interaction on the Converter page, driven by Streamlit's headless AppTest.
+
+Streamlit reruns the page script on every widget interaction. This walks one
+session through a conversion and the interactions that follow it (copying
+the SQL, saving it as an example, searching history, clearing the cache,
+toggling tracing) against a local StubServer model (QUERYCRAFT_MODEL_POOL),
+in a temporary working directory so the real querycraft.db is not touched.
+
+Reported per interaction, as the median over ``--repeat`` sessions:
+    script_ms    - wall time of the rerun AppTest performs
+    fragment     - the st.fragment that owns the widget, if any
+    fragment_ms  - time spent in that fragment's body during the rerun, i.e.
+                   roughly what a fragment-scoped rerun executes in a browser
+    model_calls  - model requests made by the interaction
+    result_shown - whether the last conversion is still on the page afterwards
+
+AppTest always re-executes the whole script, even for widgets inside a
+fragment, so script_ms is an upper bound for fragment interactions;
+fragment_ms is measured by wrapping ``st.fragment``. Pass ``--page`` to
+profile another version of the page, e.g. one extracted with ``git show``.
+
+Usage (from "Final Deliverables/The Project"):
+    python benchmarks/rerun_cost.py [--repeat 5] [--latency 0.05] [--page pages/Converter.py]
+"""
+import argparse
+import functools
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+PROJECT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT)
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from querycraft.stub import StubServer
+
+SQL = "SQL Query:\nSELECT name, department, salary FROM employees WHERE salary > 50000 ORDER BY salary DESC;\n"
+
+# Time spent in each fragment body during the current run, by function name
+FRAGMENT_MS = {}
+
+
+def timed_fragment(func=None, **options):
+    """``st.fragment`` that also records how long the fragment body takes"""
+    if func is None:
+        return lambda f: timed_fragment(f, **options)
+
+    @functools.wraps(func)
+    def body(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            FRAGMENT_MS[func.__name__] = FRAGMENT_MS.get(func.__name__, 0.0) + elapsed_ms
+
+    return timed_fragment.wrapped(body, **options)
+
+
+def widget(at, kind, label):
+    return next((w for w in getattr(at, kind) if w.label == label), None)
+
+
+# (name, widget kind, label, action, owning fragment); no widget means a plain rerun
+INTERACTIONS = [
+    ("idle rerun", None, None, None, None),
+    ("type question", "text_area", "Enter your natural language query:",
+     lambda w, i: w.input(f"top earners by salary in each department, run {i}"), None),
+    ("convert", "button", "Convert to SQL", lambda w, i: w.click(), None),
+    ("rerun after convert", None, None, None, None),
+    ("edit Copy SQL", "text_area", "Copy SQL", lambda w, i: w.input(f"SELECT 1; -- {i}"), "show_sql_panel"),
+    ("use as example", "button", "👍 Use as example", lambda w, i: w.click(), "show_sql_panel"),
+    ("search history", "text_input", "Search history", lambda w, i: w.input("salary"), "show_history"),
+    ("clear response cache", "button", "♻️ Clear Response Cache", lambda w, i: w.click(), "show_cache_stats"),
+    ("toggle tracing", "toggle", "Enable stage tracing", lambda w, i: w.set_value(not w.value),
+     "show_diagnostics"),
+]
+
+
+def run_session(page, server, index):
+    """One session through INTERACTIONS; returns {name: measurement}"""
+    at = AppTest.from_file(page, default_timeout=60)
+    measurements = {}
+
+    def step(name, rerun):
+        FRAGMENT_MS.clear()
+        calls = server.model.calls
+        started = time.perf_counter()
+        rerun()
+        script_ms = (time.perf_counter() - started) * 1000
+        if at.exception:
+            raise RuntimeError(f"{name}: {at.exception[0].value}")
+        return {"script_ms": script_ms, "fragment_ms": dict(FRAGMENT_MS),
+                "model_calls": server.model.calls - calls,
+                "result_shown": widget(at, "text_area", "Copy SQL") is not None}
+
+    measurements["session start"] = step("session start", at.run)
+    for name, kind, label, action, fragment in INTERACTIONS:
+        if kind is None:
+            measurements[name] = step(name, at.run)
+            continue
+        target = widget(at, kind, label)
+        if target is None:
+            measurements[name] = None  # not on this version of the page
+            continue
+        measurements[name] = step(name, lambda: action(target, index).run())
+        measurements[name]["fragment"] = fragment
+    return measurements
+
+
+def summarize(sessions):
+    report = {}
+    for name in sessions[0]:
+        runs = [session[name] for session in sessions if session[name] is not None]
+        if not runs:
+            report[name] = None
+            continue
+        fragment = runs[0].get("fragment")
+        entry = {"script_ms": round(statistics.median(run["script_ms"] for run in runs), 1)}
+        # Only where the widget really is inside that fragment on this version of the page
+        if any(fragment in run["fragment_ms"] for run in runs):
+            entry["fragment"] = fragment
+            entry["fragment_ms"] = round(statistics.median(run["fragment_ms"].get(fragment, 0.0)
+                                                           for run in runs), 1)
+        entry["model_calls"] = max(run["model_calls"] for run in runs)
+        entry["result_shown"] = all(run["result_shown"] for run in runs)
+        report[name] = entry
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="sessions to take the median over")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub model latency (s)")
+    parser.add_argument("--page", default=os.path.join(PROJECT, "pages", "Converter.py"))
+    args = parser.parse_args(argv)
+    page = os.path.abspath(args.page)
+
+    timed_fragment.wrapped = st.fragment
+    st.fragment = timed_fragment
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir, \
+            StubServer(latency=args.latency, responder=lambda prompt: SQL) as server:
+        os.environ["QUERYCRAFT_MODEL_POOL"] = server.url
+        if os.path.isdir(os.path.join(PROJECT, "Images")):
+            shutil.copytree(os.path.join(PROJECT, "Images"), os.path.join(workdir, "images"))
+        os.chdir(workdir)
+        try:
+            started = time.perf_counter()
+            AppTest.from_file(page, default_timeout=60).run()
+            first_load_ms = (time.perf_counter() - started) * 1000
+            sessions = [run_session(page, server, index) for index in range(args.repeat)]
+        finally:
+            os.chdir(cwd)
+    report = {"page": args.page, "first_load_ms": round(first_load_ms, 1)}
+    report.update(summarize(sessions))
+    json.dump(report, sys.stdout, indent=2, ensure_ascii=False)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# benchmarks/routing.py
+"""Tail latency of direct model calls vs. querycraft.routing.Router.
+
+Every scenario runs against local StubServer targets over HTTP, so it needs
+no network or API key:
+    tail     - two healthy targets with a long-tailed (lognormal) latency
+    degraded - the first target fails 30% of its calls
+    outage   - the first target answers every call with HTTP 503
+
+"direct" sends every call to the first target, as the app did before
+routing. "router" uses the whole pool with hedging, failover and circuit
+breakers. Both see the same calls; p50/p95/p99 are in milliseconds, and
+failed calls are counted separately.
+
+Usage (from "Final Deliverables/The Project"):
+    python benchmarks/routing.py [--requests 300] [--concurrency 4] [--deadline 2]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from querycraft.routing import build_router
+from querycraft.stub import RemoteStubModel, StubServer
+
+SCENARIOS = {
+    "tail": [dict(latency="lognormal:0.03,0.8", seed=1), dict(latency="lognormal:0.03,0.8", seed=2)],
+    "degraded": [dict(latency="lognormal:0.03,0.8", error_rate=0.3, seed=3),
+                 dict(latency="lognormal:0.03,0.8", seed=4)],
+    "outage": [dict(latency=0.01, error_rate=1.0, seed=5), dict(latency="lognormal:0.03,0.8", seed=6)],
+}
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return round(sorted_values[index] * 1000, 1)
+
+
+def measure(model, requests, concurrency, deadline):
+    def call(i):
+        started = time.perf_counter()
+        try:
+            model.generate_content(f"question {i}", request_options={"timeout": deadline})
+        except Exception:
+            return None
+        return time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(call, range(requests)))
+    latencies = sorted(value for value in results if value is not None)
+    return {
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "failed": len(results) - len(latencies),
+    }
+
+
+def run_scenario(specs, requests, concurrency, deadline):
+    servers = [StubServer(**spec).start() for spec in specs]
+    try:
+        direct = measure(RemoteStubModel(servers[0].url), requests, concurrency, deadline)
+        router = build_router(",".join(server.url for server in servers), hedge_delay=0.1)
+        routed = measure(router, requests, concurrency, deadline)
+        routed["hedges"] = router.hedges
+        routed["backup_wins"] = router.backup_wins
+        routed["targets"] = router.snapshot()
+        router.close()
+    finally:
+        for server in servers:
+            server.stop()
+    return {"direct": direct, "router": routed}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--deadline", type=float, default=2.0, help="per-call budget in seconds")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    args = parser.parse_args(argv)
+    report = {
+        name: run_scenario(SCENARIOS[name], args.requests, args.concurrency, args.deadline)
+        for name in args.scenarios.split(",")
+    }
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# benchmarks/service.py
+"""Upstream model calls and latency of the conversion service under a burst.
+
+``--clients`` concurrent clients each send ``--requests`` conversions drawn
+from ``--distinct`` questions, all at once, against a ConversionService in
+this process backed by a StubModel. Each run starts from a fresh database.
+The burst runs once with CoalescingModel (the default) and once with the
+bare stub, where every concurrent cache miss goes upstream. A third run
+sends more than the queue holds, to show 503 backpressure instead of
+unbounded queueing.
+
+Usage (from "Final Deliverables/The Project"):
+    python benchmarks/service.py [--clients 32] [--requests 4] [--distinct 8] [--latency 0.2]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from querycraft.service import ConversionService, ServiceClient, ServiceError, build_converter
+from querycraft.stub import StubModel
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return round(sorted_values[index] * 1000, 1)
+
+
+def start_service(converter, **options):
+    loop = asyncio.new_event_loop()
+    service = ConversionService(converter, **options)
+    ready = threading.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(service.start("127.0.0.1", 0))
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+    return loop, service
+
+
+def burst(workdir, name, latency, clients, requests, distinct, coalesce, queue_size=256, seed=5):
+    stub = StubModel(latency=latency)
+    converter = build_converter(stub, "stub", os.path.join(workdir, f"{name}.db"))
+    converter.fast_path = False  # measure the model path, not the rule engine
+    if not coalesce:
+        converter.model = stub
+    loop, service = start_service(converter, workers=clients, queue_size=queue_size)
+    client = ServiceClient("http://%s:%d" % service.address)
+    rng = random.Random(seed)
+    questions = [f"quarterly revenue breakdown for segment {i}" for i in range(distinct)]
+    workload = [rng.choice(questions) for _ in range(clients * requests)]
+
+    def call(question):
+        started = time.perf_counter()
+        try:
+            client.convert(question)
+        except ServiceError as e:
+            return e.status
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        outcomes = list(executor.map(call, workload))
+    elapsed = time.perf_counter() - started
+    latencies = sorted(value for value in outcomes if isinstance(value, float))
+    asyncio.run_coroutine_threadsafe(service.stop(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    return {
+        "requests": len(workload),
+        "upstream_calls": stub.calls,
+        "rejected_503": sum(1 for value in outcomes if value == 503),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "elapsed_s": round(elapsed, 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=4, help="requests per client")
+    parser.add_argument("--distinct", type=int, default=8, help="distinct questions in the burst")
+    parser.add_argument("--latency", type=float, default=0.2, help="stub model latency in seconds")
+    args = parser.parse_args(argv)
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)  # keep the schema registry's cache dir out of the tree
+        try:
+            report = {
+                "coalesced": burst(workdir, "coalesced", args.latency, args.clients, args.requests,
+                                   args.distinct, coalesce=True),
+                "uncoalesced": burst(workdir, "uncoalesced", args.latency, args.clients, args.requests,
+                                     args.distinct, coalesce=False),
+                "overloaded": burst(workdir, "overloaded", args.latency, args.clients, args.requests,
+                                    args.clients * args.requests, coalesce=True, queue_size=args.clients // 4),
+            }
+        finally:
+            os.chdir(cwd)
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# benchmarks/storage.py
+"""On-disk size of conversion history, before and after normalization.
+
+A database in the previous layout (one ``queries`` row per conversion, with
+its FTS5 index) is filled with synthetic history in which questions and
+their SQL repeat the way they do in practice: the same few hundred
+questions asked again and again. It is then migrated in place by
+querycraft.db.migrate_query_store and measured again:
+    legacy_bytes / normalized_bytes  - file size after a VACUUM, FTS index included
+    migration_rows_per_s             - rows rewritten per second by the migration
+    insert_rows_per_s                - inserts through the ``queries`` view afterwards
+    first_page_ms / search_ms        - history reads through the view
+
+Usage (from "Final Deliverables/The Project"):
+    python benchmarks/storage.py [--rows 200000] [--distinct 500]
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from querycraft.db import migrate_query_store
+from querycraft.history import HistoryStore
+from querycraft.resources import ConnectionPool
+
+WORDS = ("salary department employees orders customers revenue region product month year total "
+         "average count top sales invoice supplier inventory shipped pending refund").split()
+
+LEGACY_SCHEMA = """
+    CREATE TABLE queries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        input_text TEXT NOT NULL,
+        sql_generated TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        ttft_ms REAL,
+        latency_ms REAL,
+        accepted INTEGER NOT NULL DEFAULT 0,
+        user_id TEXT,
+        session_id TEXT
+    );
+    CREATE VIRTUAL TABLE queries_fts USING fts5(
+        input_text, sql_generated, content='queries', content_rowid='id', tokenize='porter unicode61'
+    );
+"""
+
+
+def synthetic_history(rows, distinct, seed=11):
+    rng = random.Random(seed)
+    pairs = []
+    for i in range(distinct):
+        words = rng.choices(WORDS, k=8)
+        question = "show the " + " ".join(words)
+        sql = (f"SQL Query:\n```sql\nSELECT {words[0]}, SUM({words[1]}) AS total_{words[1]}\n"
+               f"FROM {words[2]}\nWHERE {words[3]} > {i}\nGROUP BY {words[0]}\n"
+               f"ORDER BY total_{words[1]} DESC\nLIMIT 10;\n```")
+        pairs.append((question, sql))
+    for i in range(rows):
+        question, sql = rng.choice(pairs)
+        yield question, sql, rng.uniform(50, 2000), f"s{i % 1000}"
+
+
+def file_bytes(path):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.execute("VACUUM")
+    conn.close()
+    return os.path.getsize(path)
+
+
+def run(workdir, rows, distinct):
+    path = os.path.join(workdir, "storage.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.executemany(
+        "INSERT INTO queries (input_text, sql_generated, latency_ms, session_id) VALUES (?, ?, ?, ?)",
+        synthetic_history(rows, distinct),
+    )
+    conn.execute("INSERT INTO queries_fts (queries_fts) VALUES ('rebuild')")
+    conn.commit()
+    conn.close()
+    legacy_bytes = file_bytes(path)
+
+    pool = ConnectionPool(path, size=1)
+    with pool.connection() as conn:
+        started = time.perf_counter()
+        migrate_query_store(conn, vacuum=False)
+        migration_s = time.perf_counter() - started
+    history = HistoryStore(pool)
+    with pool.connection() as conn:
+        extra = list(synthetic_history(10000, distinct, seed=12))
+        started = time.perf_counter()
+        conn.executemany(
+            "INSERT INTO queries (input_text, sql_generated, latency_ms, session_id) VALUES (?, ?, ?, ?)", extra
+        )
+        conn.commit()
+        insert_s = time.perf_counter() - started
+    started = time.perf_counter()
+    for _ in range(100):
+        history.page(5)
+    first_page_ms = (time.perf_counter() - started) * 10
+    started = time.perf_counter()
+    for _ in range(100):
+        history.page(5, search="salary refund")
+    search_ms = (time.perf_counter() - started) * 10
+    pool.close()
+    normalized_bytes = file_bytes(path)
+    return {
+        "rows": rows,
+        "distinct_pairs": distinct,
+        "legacy_bytes": legacy_bytes,
+        "normalized_bytes": normalized_bytes,
+        "size_ratio": round(legacy_bytes / normalized_bytes, 2),
+        "migration_rows_per_s": round(rows / migration_s),
+        "insert_rows_per_s": round(len(extra) / insert_s),
+        "first_page_ms": round(first_page_ms, 3),
+        "search_ms": round(search_ms, 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--distinct", type=int, default=500)
+    args = parser.parse_args(argv)
+    with tempfile.TemporaryDirectory() as workdir:
+        report = run(workdir, args.rows, args.distinct)
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
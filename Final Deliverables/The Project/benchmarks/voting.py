@@ -0,0 +1,167 @@
+# benchmarks/voting.py
+"""Answer quality and cost of execution-based voting over N candidates.
+
+A StubModel stands in for a noisy model: for each call it answers with the
+right query (half the time in a slower, equivalent form), a query that runs
+but returns the wrong rows, or SQL that does not parse, with the
+probabilities given by ``--mix``. The questions run through a Converter
+(no cache, no rule fast path) with ``candidates`` = 1, 3 and 5, executed on
+a synthetic employees/departments database.
+
+Reported per N:
+    accuracy      - share of answers returning the same rows as the reference query
+    chosen_run_ms - mean execution time of the chosen query
+    p50/p95_ms    - wall time per question (the N model calls run in parallel)
+    model_calls   - calls made
+and the history store's per-N ``candidate_stats`` (what the Diagnostics
+panel shows for tuning N).
+
+Usage (from "Final Deliverables/The Project"):
+    python benchmarks/voting.py [--trials 40] [--mix 0.55,0.3,0.15] [--rows 20000]
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from querycraft.dialects import CheckedQuery
+from querycraft.execution import execute_query
+from querycraft.history import HistoryStore
+from querycraft.pipeline import Converter
+from querycraft.resources import ConnectionPool
+from querycraft.stub import StubModel
+from querycraft.voting import result_signature
+
+# question -> (reference, slower equivalent, wrong, broken)
+QUESTIONS = {
+    "average salary per department": (
+        "SELECT d.name, AVG(e.salary) FROM employees e JOIN departments d ON d.id = e.department_id GROUP BY d.name",
+        "SELECT d.name, (SELECT AVG(salary) FROM employees e WHERE e.department_id = d.id) FROM departments d",
+        "SELECT d.name, AVG(e.salary) FROM employees e JOIN departments d ON d.id = e.id GROUP BY d.name",
+        "SELECT d.name, AVG(e.salary FROM employees e JOIN departments d",
+    ),
+    "names of people hired in 2023 earning over 100000": (
+        "SELECT name FROM employees WHERE hired_on BETWEEN '2023-01-01' AND '2023-12-31' AND salary > 100000",
+        "SELECT name FROM employees WHERE strftime('%Y', hired_on) = '2023' AND salary + 0 > 100000",
+        "SELECT name FROM employees WHERE hired_on > '2023-01-01' AND salary > 100000",
+        "SELECT name FROM employees WHERE",
+    ),
+    "number of employees in the largest department": (
+        "SELECT COUNT(*) FROM employees GROUP BY department_id ORDER BY COUNT(*) DESC LIMIT 1",
+        "SELECT MAX(n) FROM (SELECT department_id, COUNT(*) AS n FROM employees GROUP BY department_id)",
+        "SELECT COUNT(*) FROM employees",
+        "SELECT COUNT(* FROM employees",
+    ),
+}
+
+
+def build(path, rows, seed=11):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE departments (id INTEGER PRIMARY KEY, name TEXT);
+        CREATE TABLE employees (id INTEGER PRIMARY KEY, name TEXT, department_id INTEGER, salary REAL,
+                                hired_on TEXT);
+    """)
+    conn.executemany("INSERT INTO departments VALUES (?, ?)", ((i, f"department {i}") for i in range(20)))
+    conn.executemany("INSERT INTO employees VALUES (?, ?, ?, ?, ?)", (
+        (i, f"employee {i}", rng.randrange(20), rng.randrange(30000, 160000),
+         f"{rng.randrange(2015, 2025)}-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}")
+        for i in range(rows)))
+    conn.commit()
+    conn.close()
+
+
+def noisy_responder(mix, seed):
+    rng = random.Random(seed)
+    correct, wrong, _ = mix
+
+    def respond(prompt):
+        reference, slower, wrong_sql, broken = next(
+            answers for question, answers in QUESTIONS.items() if question in prompt)
+        draw = rng.random()
+        if draw < correct:
+            sql = reference if rng.random() < 0.5 else slower
+        elif draw < correct + wrong:
+            sql = wrong_sql
+        else:
+            sql = broken
+        return f"SQL Query:\n{sql};\n"
+
+    return respond
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    index = max(0, min(len(values) - 1, round(pct / 100 * len(values) + 0.5) - 1))
+    return round(values[index], 1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--trials", type=int, default=40, help="conversions per question and N")
+    parser.add_argument("--mix", default="0.55,0.3,0.15", help="probabilities: correct, wrong rows, broken")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--latency", default="lognormal:0.03,0.5")
+    args = parser.parse_args(argv)
+    mix = [float(value) for value in args.mix.split(",")]
+
+    report = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, "company.db")
+        build(db_path, args.rows)
+
+        def connect():
+            return sqlite3.connect(db_path, check_same_thread=False)
+
+        def signature(sql):
+            conn = connect()
+            try:
+                checked = CheckedQuery(sql)
+                result = execute_query(conn, checked)
+                return result_signature(result, checked.tree.args.get("order") is not None), result.elapsed_ms
+            except Exception:
+                return None, None
+            finally:
+                conn.close()
+
+        expected = {question: signature(answers[0])[0] for question, answers in QUESTIONS.items()}
+        history = HistoryStore(ConnectionPool(os.path.join(workdir, "querycraft.db")))
+        for n in (1, 3, 5):
+            model = StubModel(latency=args.latency, responder=noisy_responder(mix, seed=n), seed=n)
+            converter = Converter(model, "stub", history=history, fast_path=False, candidates=n)
+            correct, run_ms, wall_ms = 0, [], []
+            for _ in range(args.trials):
+                for question in QUESTIONS:
+                    started = time.perf_counter()
+                    result = converter.convert(question, sandbox=connect)
+                    wall_ms.append((time.perf_counter() - started) * 1000)
+                    got, elapsed_ms = signature(result.sql)
+                    correct += got == expected[question]
+                    if elapsed_ms is not None:
+                        run_ms.append(elapsed_ms)
+            converter.selector.close()
+            report[f"N={n}"] = {
+                "accuracy": round(correct / (args.trials * len(QUESTIONS)), 3),
+                "chosen_run_ms": round(sum(run_ms) / len(run_ms), 2) if run_ms else None,
+                "p50_ms": percentile(wall_ms, 50),
+                "p95_ms": percentile(wall_ms, 95),
+                "model_calls": model.calls,
+            }
+        report["candidate_stats"] = [
+            dict(zip(("n", "queries", "agreement", "first_agrees", "failure_rate", "generate_ms", "exec_ms"),
+                     [round(value, 3) if isinstance(value, float) else value for value in row]))
+            for row in history.candidate_stats()
+        ]
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
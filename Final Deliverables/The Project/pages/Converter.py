@@ -1,190 +1,586 @@
-# pages/1_Text_to_SQL.py
-from dotenv import load_dotenv
-import streamlit as st
-from streamlit_extras.add_vertical_space import add_vertical_space as avs
-import google.generativeai as genai
-import os
-from PIL import Image
-import pandas as pd
-import sqlite3
-from datetime import datetime
-
-# Set page config early
-st.set_page_config(page_title="Text to SQL Converter", page_icon=":memo:")
-st.title("🧠 Text to SQL Converter")
-
-# Display image
-try:
-    image = Image.open("images/icon1.png")
-    st.image(image, use_container_width=True, caption="Your QueryCraft Conversion Tool")
-except FileNotFoundError:
-    st.warning("Image not found. Make sure it's placed in the 'images/' folder.")
-
-# Load environment variables
-load_dotenv()
-
-# Configure Gemini with API key
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-
-# Initialize the generative model
-model = genai.GenerativeModel('gemini-1.5-flash')
-
-# SQLite setup
-conn = sqlite3.connect("querycraft.db")
-cursor = conn.cursor()
-cursor.execute("""
-    CREATE TABLE IF NOT EXISTS queries (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        input_text TEXT NOT NULL,
-        sql_generated TEXT NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-""")
-conn.commit()
-
-def get_gemini_response(input):
-    response = model.generate_content(input)
-    return response.text
-
-# Prompt template definition
-input_prompt_template = """
-You are an expert SQL developer that converts natural language queries into precise SQL statements.
-Your task is to convert English descriptions into valid, optimized SQL queries.
-
-Guidelines:
-1. Identify all relevant tables
-2. Select only necessary columns
-3. Apply proper filtering conditions
-4. Include sorting/grouping when specified
-5. Use correct SQL syntax and formatting
-
-Examples:
-
-Example 1:
-Input: "Retrieve the names and ages of all employees who are older than 30 years."
-Output: 
-SQL Query:
-SELECT name, age FROM employees
-WHERE age > 30;
-
-Example 2:
-Input: "Get the total sales amount from the orders table."
-Output:
-SQL Query:
-SELECT SUM(amount) AS total_sales FROM orders;
-
-Example 3:
-Input: "Find customers who made purchases in the last month, sorted by purchase date descending."
-Output:
-SQL Query:
-SELECT customer_name FROM purchases
-WHERE purchase_date >= DATE_SUB(CURRENT_DATE(), INTERVAL 1 MONTH)
-ORDER BY purchase_date DESC;
-
-Example 4:
-Input: "Show the average salary by department."
-Output:
-SQL Query:
-SELECT department, AVG(salary) AS avg_salary FROM employees
-GROUP BY department;
-
-Now convert this English description to SQL:
-
-Input: {sql_text}
-
-Important Notes:
-- Always start with "SQL Query:" on its own line
-- Format the query with proper indentation (4 spaces for continuation lines)
-- Use standard SQL functions and syntax
-- Include column aliases for aggregates
-- Correct any typos in the input if necessary
-"""
-
-sql_text = st.text_area("Enter your natural language query:",
-    placeholder="e.g., Show all customers who purchased more than $100 last month",
-    height=150)
-
-submit = st.button("Convert to SQL", type="primary")
-
-if submit and sql_text.strip():
-    try:
-        prompt = input_prompt_template.format(sql_text=sql_text)
-        response = get_gemini_response(prompt)
-
-        # Store in SQLite DB
-        cursor.execute(
-            "INSERT INTO queries (input_text, sql_generated) VALUES (?, ?)",
-            (sql_text, response)
-        )
-        conn.commit()
-
-        with st.expander("🧾 Generated SQL Query", expanded=True):
-            st.code(response, language="sql")
-            st.text_area("Copy SQL", value=response, height=150)
-
-        st.subheader("📊 Sample Output Preview")
-        sample_data = pd.DataFrame({
-            "customer_name": ["Alice", "Bob"],
-            "purchase_amount": [120, 180]
-        })
-        st.dataframe(sample_data)
-
-        st.download_button(
-            label="📥 Download SQL",
-            data=response,
-            file_name="query.sql",
-            mime="text/sql"
-        )
-
-        # Demo in-memory execution
-        st.subheader("⚙️ Run Query on Sample Table")
-        st.info("Running SELECT queries only on a mock 'employees' table.")
-
-        demo_conn = sqlite3.connect(":memory:")
-        demo_cursor = demo_conn.cursor()
-        demo_cursor.execute("""
-            CREATE TABLE employees (
-                id INTEGER PRIMARY KEY,
-                name TEXT,
-                age INTEGER,
-                department TEXT,
-                salary REAL
-            )
-        """)
-        demo_cursor.executemany("INSERT INTO employees (name, age, department, salary) VALUES (?, ?, ?, ?)", [
-            ("Alice", 32, "Sales", 60000),
-            ("Bob", 45, "HR", 75000),
-            ("Carol", 29, "IT", 68000),
-            ("David", 38, "Sales", 72000),
-        ])
-        demo_conn.commit()
-
-        safe_sql = response.strip().lower()
-        if safe_sql.startswith("select"):
-            try:
-                result_df = pd.read_sql_query(response, demo_conn)
-                st.dataframe(result_df, use_container_width=True)
-            except Exception as e:
-                st.error(f"Execution error: {e}")
-        else:
-            st.warning("Only SELECT queries are allowed for security reasons.")
-
-    except Exception as e:
-        st.error(f"An error occurred: {str(e)}")
-elif submit:
-    st.warning("Please enter a query to convert.")
-
-# Sidebar: Display history from SQLite
-with st.sidebar:
-    st.subheader("🕘 Your History (Saved)")
-    cursor.execute("SELECT input_text, created_at FROM queries ORDER BY created_at DESC LIMIT 5")
-    rows = cursor.fetchall()
-    if rows:
-        for idx, (q, created_at) in enumerate(rows):
-            st.markdown(f"**{idx+1}.** {q}  \n*{created_at}*")
-        if st.button("🗑️ Clear All History"):
-            cursor.execute("DELETE FROM queries")
-            conn.commit()
-            st.experimental_rerun()
-    else:
-        st.info("No queries saved yet.")
+# pages/1_Text_to_SQL.py
+import streamlit as st
+from streamlit_extras.add_vertical_space import add_vertical_space as avs
+import os
+import pandas as pd
+import sqlite3
+import uuid
+from datetime import datetime
+from querycraft.analysis import analyze, explain_statements
+from querycraft.cache import ResponseCache
+from querycraft.datasets import SCHEMA_PREFIX, SandboxStore
+from querycraft.db import MigrationRequired
+from querycraft.dialects import DIALECTS, CheckedQuery
+from querycraft.examples import ExampleStore
+from querycraft.execution import ExecutionLimits, QueryExecutor, QueryQueueTimeout, QueryTimeout, UnsafeQueryError
+from querycraft.history import HistoryStore
+from querycraft.client import GeminiContextCache
+from querycraft.pipeline import Conversation, Converter
+from querycraft.prompts import CONVERTER_TEMPLATE
+from querycraft.quota import scheduler_from_env
+from querycraft.resources import ConnectionPool, DemoDatabase
+from querycraft.retention import apply_retention
+from querycraft.routing import Router, router_from_env
+from querycraft.rules import demo_engine
+from querycraft.schema import SchemaRegistry
+from querycraft.service import ServiceClient
+from querycraft.tracing import Tracer, serve_metrics
+
+# Set page config early
+st.set_page_config(page_title="Text to SQL Converter", page_icon=":memo:")
+st.title("🧠 Text to SQL Converter")
+
+MODEL_NAME = 'gemini-1.5-flash'
+SCHEMA_TOP_K = 8  # tables from the target database included in each prompt
+FEW_SHOT_K = 3  # most similar accepted examples included in each prompt
+FEW_SHOT_TOKEN_BUDGET = 300
+HISTORY_PAGE_SIZE = 5
+# Demo runs: 2 s wall-clock, 10k rows / 8 MB kept, shown 50 rows per page
+DEMO_LIMITS = ExecutionLimits(timeout_s=2.0, max_rows=10000, max_bytes=8 * 1024 * 1024, page_size=50)
+SANDBOX_MAX_BYTES = 512 * 1024 * 1024  # uploaded datasets kept on disk, least recently used evicted first
+
+# Streamlit reruns this script on every interaction, so everything expensive
+# below is built once per server process and shared by all sessions.
+@st.cache_resource
+def load_icon():
+    # Raw PNG bytes: st.image sends them as-is, where a PIL image is re-encoded on every rerun
+    try:
+        with open("images/icon1.png", "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+@st.cache_resource
+def get_model():
+    # Reads GOOGLE_API_KEY from the environment / .env; QUERYCRAFT_MODEL_POOL
+    # lists more targets to hedge across and fail over to
+    return router_from_env(MODEL_NAME)
+
+@st.cache_resource
+def get_connection_pool():
+    return ConnectionPool("querycraft.db")
+
+@st.cache_resource
+def get_history():
+    history = HistoryStore(get_connection_pool())
+    if os.getenv("QUERYCRAFT_RETENTION_DAYS"):
+        # Expire old history once per server start, archiving it unless told not to
+        with history.pool.connection() as conn:
+            apply_retention(conn, keep_days=int(os.getenv("QUERYCRAFT_RETENTION_DAYS")),
+                            cold_path=os.getenv("QUERYCRAFT_ARCHIVE_DB", "querycraft-archive.db") or None)
+    return history
+
+@st.cache_resource
+def get_response_cache():
+    return ResponseCache("querycraft.db")
+
+@st.cache_resource
+def get_demo_database():
+    return DemoDatabase()
+
+@st.cache_resource
+def get_query_executor():
+    # Each run gets a private clone of the demo table on a worker thread
+    return QueryExecutor(get_demo_database().clone, max_workers=2, limits=DEMO_LIMITS)
+
+@st.cache_resource
+def get_schema_registry():
+    return SchemaRegistry()
+
+@st.cache_resource
+def get_sandbox_store():
+    # Shared by all sessions and keyed by content hash, so a re-upload is instant. Uploads are attached
+    # on top of the demo table, so one named like it is renamed instead of hidden
+    return SandboxStore(max_bytes=SANDBOX_MAX_BYTES, schemas=get_schema_registry(),
+                        reserved=get_demo_database().table_names())
+
+@st.cache_resource
+def get_tracer():
+    # Off unless QUERYCRAFT_TRACING=1 or enabled from the diagnostics panel
+    tracer = Tracer.from_env()
+    if os.getenv("QUERYCRAFT_METRICS_PORT"):
+        serve_metrics(tracer, int(os.getenv("QUERYCRAFT_METRICS_PORT")))
+    return tracer
+
+@st.cache_resource
+def get_scheduler():
+    # One request/token budget for every session on this server (QUERYCRAFT_RPM, QUERYCRAFT_USER_RPM, ...)
+    return scheduler_from_env(get_connection_pool())
+
+@st.cache_resource
+def get_example_store():
+    store = ExampleStore()
+    store.extend(get_history().accepted_examples())
+    return store
+
+@st.cache_resource
+def get_converter():
+    if os.getenv("QUERYCRAFT_SERVICE_URL"):
+        # Conversions run in the shared service (python -m querycraft.service); no model client here
+        return ServiceClient(os.getenv("QUERYCRAFT_SERVICE_URL"))
+    return Converter(
+        get_model(),
+        MODEL_NAME,
+        cache=get_response_cache(),
+        history=get_history(),
+        examples=get_example_store(),
+        schemas=get_schema_registry(),
+        tracer=get_tracer(),
+        template=CONVERTER_TEMPLATE,
+        schema_k=SCHEMA_TOP_K,
+        examples_k=FEW_SHOT_K,
+        examples_budget=FEW_SHOT_TOKEN_BUDGET,
+        rules=demo_engine(),
+        # Follow-ups reuse the first prompt from Gemini's context cache when it is large enough
+        context_cache=GeminiContextCache(MODEL_NAME),
+        scheduler=get_scheduler(),
+    )
+
+# Display image
+image = load_icon()
+if image is not None:
+    st.image(image, use_container_width=True, caption="Your QueryCraft Conversion Tool")
+else:
+    st.warning("Image not found. Make sure it's placed in the 'images/' folder.")
+
+try:
+    converter = get_converter()
+    history = get_history()
+except MigrationRequired as e:
+    # Rewriting an older history layout is a one-off maintenance step, not part of a page load
+    st.error(str(e))
+    st.stop()
+pool = get_connection_pool()
+response_cache = get_response_cache()
+schema_registry = get_schema_registry()
+sandbox_store = get_sandbox_store()
+example_store = get_example_store()
+tracer = get_tracer()
+scheduler = get_scheduler()
+
+# Scopes this browser session's (and signed-in user's) rows in the shared history
+session_id = st.session_state.setdefault("session_id", uuid.uuid4().hex)
+user_id = st.user.get("email")
+
+def reset_history_pages():
+    st.session_state.history_cursors = [None]
+
+def add_datasets(uploads):
+    loaded = []
+    for upload in uploads:
+        try:
+            dataset = sandbox_store.load(upload, name=upload.name)
+        except (OSError, ValueError, UnicodeDecodeError, sqlite3.Error) as e:
+            st.error(f"Could not load {upload.name}: {e}")
+            continue
+        # One dataset per table name in a session: a new upload replaces the old one
+        st.session_state.datasets = [digest for digest in st.session_state.datasets
+                                     if (sandbox_store.get(digest) or dataset).table != dataset.table]
+        st.session_state.datasets.append(dataset.digest)
+        loaded.append(dataset)
+    return loaded
+
+def new_conversation():
+    st.session_state.conversation = Conversation()
+
+def remove_dataset(digest):
+    st.session_state.datasets.remove(digest)
+
+def older_history_page(cursor):
+    st.session_state.history_cursors.append(cursor)
+
+def newer_history_page():
+    st.session_state.history_cursors.pop()
+
+def clear_history(user_id=None, session_id=None):
+    # Button callbacks run before the fragment redraws, so it shows the emptied history
+    if history.clear(user_id, session_id):
+        # Accepted pairs went with it: re-index the few-shot examples from the ones left
+        example_store.clear()
+        example_store.extend(history.accepted_examples())
+    reset_history_pages()
+
+@st.fragment
+def show_result_pages(result):
+    # Paging reruns only this fragment; just the selected page becomes a DataFrame
+    page = 1
+    if result.page_count > 1:
+        page = st.number_input("Page", min_value=1, max_value=result.page_count, key="demo_page")
+    st.dataframe(result.page(page - 1), use_container_width=True)
+    note = f"{result.row_count} rows in {result.elapsed_ms:.0f} ms"
+    if result.truncated:
+        note += f" · stopped at the {'row' if result.truncated == 'rows' else 'size'} limit"
+    st.caption(note)
+
+def plan_connection(schema_target, datasets):
+    # Plans come from the selected target database, else from what the demo runs on
+    if schema_target != "(none)":
+        return schema_registry.connect(schema_target)
+    if datasets:
+        return sandbox_store.connect([dataset.digest for dataset in datasets], base=get_demo_database().clone)
+    return get_demo_database().clone()
+
+def show_plan_report(report, checked):
+    st.markdown("**🔍 Query plan analysis**")
+    if report.error:
+        st.caption(report.error)
+        return
+    st.code(report.plan_text(), language="text")
+    st.caption(f"~{report.estimated_rows:,} rows examined (estimate)")
+    icons = {"high": "🔴", "medium": "🟠", "low": "🟡"}
+    for finding in report.findings:
+        st.markdown(f"{icons[finding.severity]} {finding.message}")
+        if finding.suggestion and not finding.suggestion.startswith("CREATE INDEX"):
+            st.caption(f"💡 {finding.suggestion}")
+    if not report.findings:
+        st.caption("✅ No full scans, missing join indexes or non-sargable filters found.")
+        return
+    # Index DDL and the EXPLAIN to confirm the plan, per engine
+    explains = explain_statements(checked)
+    for tab, (name, dialect) in zip(st.tabs(list(DIALECTS)), DIALECTS.items()):
+        indexes = "".join(f"{statement};\n" for statement in report.index_statements(dialect))
+        tab.code(indexes + f"-- Plan on {name}:\n" + explains[name], language="sql")
+
+def accept_example(query_id, question, sql):
+    # Runs as a button callback, before the panel's fragment redraws
+    converter.accept(query_id, question, sql)
+    # Shown by the panel itself: elements drawn from a fragment's callback land at the top of the page
+    st.session_state.example_saved = True
+
+def run_conversion(question, conversation, placeholder, trace_id, refine, stream, candidates, bypass_cache,
+                   schema_target, datasets):
+    # Everything a submit computes, kept in session state so later reruns only redraw it
+    schema_targets = ([] if schema_target == "(none)" else [schema_target]) + [
+        dataset.schema_name for dataset in datasets]
+    # What demo queries (and voting candidates) run on: the mock table plus this session's datasets
+    demo_connect = get_demo_database().clone
+    if datasets:
+        digests = [dataset.digest for dataset in datasets]
+        demo_connect = lambda: sandbox_store.connect(digests, base=get_demo_database().clone)
+    # Prompt build, cached model call and history insert; partial SQL streams into the placeholder
+    result = converter.convert(
+        question,
+        schema_target=schema_targets or None,
+        stream=stream and candidates == 1,
+        on_partial=lambda partial: placeholder.code(partial, language="sql"),
+        bypass_cache=bypass_cache,
+        trace_id=trace_id,
+        user_id=user_id,
+        session_id=session_id,
+        candidates=candidates,
+        # A registered database is the user's own: candidates are compared by SQL, not run there
+        sandbox=demo_connect if schema_target == "(none)" else None,
+        conversation=conversation,
+    )
+    last = {"question": question, "result": result, "turn": len(conversation) if refine else None,
+            "tables": [dataset.table for dataset in datasets], "plan_report": None,
+            "demo_result": None, "demo_error": None}
+
+    # Parsed locally: read-only check, and every dialect from this one model call
+    with tracer.span("validate", trace_id):
+        try:
+            last["checked"], last["check_error"] = CheckedQuery(result.sql), None
+        except ValueError as e:
+            last["checked"], last["check_error"] = None, str(e)
+    checked = last["checked"]
+    if checked is None:
+        return last
+    with tracer.span("analyze", trace_id):
+        plan_conn = plan_connection(schema_target, datasets)
+        try:
+            last["plan_report"] = analyze(checked, plan_conn)
+        finally:
+            plan_conn.close()
+    try:
+        with tracer.span("read_sql", trace_id) as span:
+            last["demo_result"] = get_query_executor().run(checked, connect=demo_connect)
+            span.record("rows", len(last["demo_result"]))
+    except UnsafeQueryError as e:
+        last["demo_error"] = ("warning", str(e))
+    except QueryQueueTimeout as e:
+        last["demo_error"] = ("warning", f"⏳ {e} Please try again in a moment.")
+    except QueryTimeout as e:
+        last["demo_error"] = ("warning", f"⏱️ {e} Try a narrower query.")
+    except Exception as e:
+        last["demo_error"] = ("error", f"Execution error: {e}")
+    return last
+
+def show_conversion(last):
+    result = last["result"]
+    if last["turn"] is not None:
+        st.caption(f"💬 Revised the last query ({result.prompt_tokens} prompt tokens, turn {last['turn']})")
+    if result.schema_tables:
+        st.caption("🗂️ Schema context: " + ", ".join(table["name"] for table in result.schema_tables))
+    if result.source == "rules":
+        st.caption(f"⚡ Answered locally by the rule engine in {result.latency_ms:.2f} ms")
+    elif result.source == "fallback":
+        st.warning(f"Gemini is unavailable ({result.error}). Showing a best-effort local query.")
+    elif result.from_cache and result.error:
+        st.info(f"⏳ {result.error}. Showing the cached answer instead of a fresh one.")
+    elif result.from_cache:
+        st.caption("⚡ Served from response cache")
+    elif result.ttft_ms is not None and result.latency_ms is not None:
+        st.caption(
+            f"⏱️ First token {result.ttft_ms:.0f} ms · "
+            f"total {result.latency_ms:.0f} ms"
+        )
+    if result.candidates:
+        chosen = next(candidate for candidate in result.candidates if candidate.chosen)
+        if chosen.outcome != "ok":
+            st.caption(f"🗳️ None of {len(result.candidates)} candidates ran cleanly; showing the first answer")
+        else:
+            ran = f" · chosen query ran in {chosen.exec_ms:.1f} ms" if chosen.exec_ms is not None else ""
+            st.caption(f"🗳️ {chosen.cluster_size} of {len(result.candidates)} candidates agreed{ran}")
+
+    show_sql_panel(last)
+
+    # Demo in-memory execution
+    st.subheader("⚙️ Run Query on Sample Table")
+    if last["tables"]:
+        st.info("Running SELECT queries on your datasets ("
+                + ", ".join(f"'{table}'" for table in last["tables"]) + ") and the mock 'employees' table.")
+    else:
+        st.info("Running SELECT queries only on a mock 'employees' table.")
+    if last["checked"] is None:
+        st.warning(last["check_error"])
+    elif last["demo_error"] is not None:
+        level, message = last["demo_error"]
+        (st.warning if level == "warning" else st.error)(message)
+    else:
+        show_result_pages(last["demo_result"])
+
+@st.fragment
+def show_sql_panel(last):
+    # Copying, downloading, saving an example or switching tabs reruns only this panel
+    result, checked = last["result"], last["checked"]
+    response = result.sql
+    with st.expander("🧾 Generated SQL Query", expanded=True):
+        st.code(response, language="sql")
+        st.text_area("Copy SQL", value=response, height=150)
+        st.button("👍 Use as example", on_click=accept_example, args=(result.query_id, last["question"], response),
+                  help="Good answers are reused as few-shot examples for similar questions.")
+        if st.session_state.pop("example_saved", False):
+            st.toast("Saved as an example for future prompts.")
+        if checked is not None:
+            for tab, dialect_sql in zip(st.tabs(list(DIALECTS)), checked.transpile().values()):
+                tab.code(dialect_sql, language="sql")
+            show_plan_report(last["plan_report"], checked)
+        else:
+            st.warning(f"⚠️ {last['check_error']}")
+        if result.candidates:
+            st.markdown("**🗳️ Candidates**")
+            st.dataframe(pd.DataFrame([{
+                "variant": candidate.variant,
+                "temperature": candidate.temperature,
+                "outcome": candidate.outcome,
+                "agreed": candidate.cluster_size,
+                "model ms": candidate.latency_ms,
+                "run ms": candidate.exec_ms,
+                "chosen": candidate.chosen,
+                "error": candidate.error,
+            } for candidate in result.candidates]), hide_index=True, use_container_width=True)
+
+    st.subheader("📊 Sample Output Preview")
+    sample_data = pd.DataFrame({
+        "customer_name": ["Alice", "Bob"],
+        "purchase_amount": [120, 180]
+    })
+    st.dataframe(sample_data)
+
+    st.download_button(
+        label="📥 Download SQL",
+        data=response,
+        file_name="query.sql",
+        mime="text/sql",
+        on_click="ignore",
+    )
+
+@st.fragment
+def show_history():
+    st.subheader("🕘 Your History (Saved)")
+    history_scope = st.radio("Show", ["All", "This session"] + (["Mine"] if user_id else []),
+                             horizontal=True, key="history_scope", on_change=reset_history_pages)
+    history_search = st.text_input("Search history", placeholder="e.g. salary by department",
+                                   key="history_search", on_change=reset_history_pages)
+    # Keyset pagination: each page starts below the last id of the page before it
+    cursors = st.session_state.setdefault("history_cursors", [None])
+    scope = {
+        "user_id": user_id if history_scope == "Mine" else None,
+        "session_id": session_id if history_scope == "This session" else None,
+    }
+    rows = history.page(HISTORY_PAGE_SIZE, before=cursors[-1], search=history_search.strip() or None, **scope)
+    if rows:
+        offset = (len(cursors) - 1) * HISTORY_PAGE_SIZE
+        for idx, (_, q, _, created_at) in enumerate(rows):
+            st.markdown(f"**{offset+idx+1}.** {q}  \n*{created_at}*")
+        newer_col, older_col = st.columns(2)
+        newer_col.button("‹ Newer", on_click=newer_history_page, disabled=len(cursors) == 1,
+                         use_container_width=True)
+        older_col.button("Older ›", on_click=older_history_page, args=(rows.next_cursor,),
+                         disabled=rows.next_cursor is None, use_container_width=True)
+        label = {"This session": "Clear This Session's History", "Mine": "Clear My History"}
+        st.button(f"🗑️ {label.get(history_scope, 'Clear All History')}", on_click=clear_history, kwargs=scope)
+    elif history_search.strip():
+        st.info("No saved queries match your search.")
+    else:
+        st.info("No queries saved yet.")
+
+@st.fragment
+def show_cache_stats():
+    st.subheader("⚡ Response Cache")
+    stats = response_cache.stats()
+    st.caption(
+        f"{stats['hits']} hits · {stats['misses']} misses · "
+        f"{stats['hit_rate']:.0%} hit rate · {stats['entries']} entries"
+    )
+    st.button("♻️ Clear Response Cache", on_click=response_cache.clear)
+
+@st.fragment
+def show_diagnostics():
+    # Diagnostics: per-stage latency, token and size histograms from the tracer
+    with st.expander("🩺 Diagnostics"):
+        tracer.enabled = st.toggle("Enable stage tracing", value=tracer.enabled,
+                                   help="Applies to every session on this server.")
+        snapshot = tracer.snapshot()
+        if snapshot:
+            st.dataframe(pd.DataFrame(snapshot), hide_index=True, use_container_width=True)
+            st.download_button("📈 Prometheus metrics", data=tracer.to_prometheus(),
+                               file_name="querycraft_metrics.prom", mime="text/plain", on_click="ignore")
+        else:
+            st.caption("No traced conversions yet.")
+        model = getattr(converter, "model", None)
+        if isinstance(model, Router):
+            st.dataframe(pd.DataFrame(model.snapshot()), hide_index=True, use_container_width=True)
+            st.caption(f"{model.hedges} hedged requests · {model.backup_wins} answered by a hedge or failover")
+        voting = history.candidate_stats()
+        if voting:
+            st.markdown("**🗳️ Voting by candidate count**")
+            st.dataframe(pd.DataFrame(voting, columns=[
+                "candidates", "queries", "agreement", "first agrees", "failure rate", "model ms", "run ms",
+            ]), hide_index=True, use_container_width=True)
+            st.caption("When the first candidate alone nearly always agrees, fewer candidates will do.")
+
+@st.fragment
+def show_usage():
+    # Model calls and tokens per user and day, as counted by the shared quota scheduler
+    with st.expander("📊 API usage"):
+        budget = scheduler.snapshot()
+        if budget["requests_left"] is not None:
+            st.caption(f"{budget['requests_left']} of {scheduler.requests.capacity} requests left this minute · "
+                       f"{sum(budget['waiting'].values())} waiting · {budget['rejected']} over budget")
+        rows = scheduler.usage(days=7)
+        if rows:
+            st.dataframe(pd.DataFrame([
+                (day, "you" if user in (user_id, session_id) else user or "(none)", *counts)
+                for day, user, *counts in rows
+            ], columns=["day", "user", "requests", "input tokens", "output tokens", "over budget"]),
+                hide_index=True, use_container_width=True)
+        else:
+            st.caption("No model calls in the last 7 days.")
+
+# Sidebar: target database whose schema is retrieved into prompts
+with st.sidebar:
+    st.subheader("🗂️ Target Database")
+    with st.expander("Register a database"):
+        schema_name = st.text_input("Name", placeholder="e.g. warehouse")
+        schema_db_path = st.text_input("SQLite file path")
+        schema_ddl = st.file_uploader("...or a DDL dump", type=["sql", "ddl", "txt"])
+        if st.button("Register"):
+            try:
+                if schema_ddl is not None:
+                    index = schema_registry.register_ddl(schema_name, schema_ddl.getvalue().decode("utf-8"))
+                elif schema_db_path:
+                    index = schema_registry.register_sqlite(schema_name, schema_db_path)
+                else:
+                    raise ValueError("Provide a SQLite file path or a DDL dump.")
+                st.success(f"Indexed {len(index.tables)} tables.")
+            except (OSError, ValueError, sqlite3.Error) as e:
+                st.error(f"Could not register database: {e}")
+    schema_target = st.selectbox("Schema used in prompts", ["(none)"] + [
+        name for name in schema_registry.names() if not name.startswith(SCHEMA_PREFIX)])
+
+    # Sidebar: this session's uploaded datasets; queries run on them and their schema goes into prompts
+    st.subheader("📥 Your Data")
+    st.session_state.setdefault("datasets", [])
+    uploads = st.file_uploader("CSV or Parquet files", type=["csv", "tsv", "parquet"], accept_multiple_files=True)
+    if uploads and st.button("Load datasets"):
+        for dataset in add_datasets(uploads):
+            st.success(f"{'Reused' if dataset.from_cache else 'Loaded'} `{dataset.table}` "
+                       f"({dataset.rows:,} rows).")
+    datasets = []
+    for digest in list(st.session_state.datasets):
+        dataset = sandbox_store.get(digest)
+        if dataset is None:
+            st.session_state.datasets.remove(digest)
+            st.warning("A dataset was evicted to free space; upload it again to keep using it.")
+        else:
+            datasets.append(dataset)
+    for dataset in datasets:
+        name_col, remove_col = st.columns([4, 1])
+        name_col.markdown(f"`{dataset.table}` · {dataset.rows:,} rows · {len(dataset.columns)} columns")
+        remove_col.button("✖", key=f"remove_{dataset.digest}", on_click=remove_dataset, args=(dataset.digest,),
+                          help=f"Stop using {dataset.source_name}")
+
+# Follow-ups ("now only for 2023") revise the last answer instead of starting over
+conversation = st.session_state.setdefault("conversation", Conversation())
+refine = False
+if conversation.turns:
+    with st.expander(f"💬 Conversation ({len(conversation)} turns)"):
+        for number, (question, _) in enumerate(conversation.turns, start=1):
+            st.markdown(f"**{number}.** {question}")
+        st.code(conversation.turns[-1][1], language="sql")
+    refine_col, new_col = st.columns([3, 1])
+    refine = refine_col.toggle("Refine the last query", key="refine_mode",
+                               help="Treat the next question as a change to the last SQL: only the change and "
+                                    "that SQL are sent, not the full prompt.")
+    new_col.button("🆕 New", on_click=new_conversation, help="Start a new conversation")
+
+sql_text = st.text_area("Describe the change:" if refine else "Enter your natural language query:",
+    placeholder="e.g., now only for 2023, and add the department" if refine
+    else "e.g., Show all customers who purchased more than $100 last month",
+    height=150, key="question_text")
+
+stream_output = st.toggle("Stream SQL as it is generated", value=True)
+candidate_count = st.select_slider(
+    "Candidates to vote on", options=[1, 3, 5], value=1,
+    help="Generate several answers in parallel, run each on the sample data and keep the result most of them "
+         "agree on (ties go to the fastest). Voted answers are not streamed.")
+bypass_cache = st.checkbox("Bypass response cache", help="Always ask Gemini, then refresh the cached answer.")
+submit = st.button("Convert to SQL", type="primary")
+
+if submit and sql_text.strip():
+    trace_id = tracer.new_trace()
+    try:
+        # Partial SQL streams into this placeholder until the full result is rendered below
+        stream_placeholder = st.empty()
+        if not refine:
+            conversation = st.session_state.conversation = Conversation()
+        st.session_state.last_conversion = run_conversion(
+            sql_text, conversation, stream_placeholder, trace_id, refine=refine, stream=stream_output,
+            candidates=candidate_count, bypass_cache=bypass_cache, schema_target=schema_target, datasets=datasets)
+        stream_placeholder.empty()
+        st.session_state.demo_page = 1
+        with tracer.span("render", trace_id):
+            show_conversion(st.session_state.last_conversion)
+
+        if tracer.enabled:
+            with pool.connection() as conn:
+                tracer.flush(conn)
+            if os.getenv("QUERYCRAFT_METRICS_FILE"):
+                tracer.write_prometheus(os.getenv("QUERYCRAFT_METRICS_FILE"))
+
+    except Exception as e:
+        st.error(f"An error occurred: {str(e)}")
+elif submit:
+    st.warning("Please enter a query to convert.")
+elif "last_conversion" in st.session_state:
+    # Any other rerun redraws the last result from session state: no model call, analysis or query run
+    show_conversion(st.session_state.last_conversion)
+
+# Sidebar: history, cache and diagnostics are fragments, so paging, searching or
+# clearing reruns only that section instead of the whole page
+with st.sidebar:
+    show_history()
+    show_cache_stats()
+    show_usage()
+    show_diagnostics()
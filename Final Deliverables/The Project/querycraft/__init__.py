@@ -0,0 +1,54 @@
+# querycraft/__init__.py
+"""Shared QueryCraft helpers used by the Streamlit pages and the Team Lead app.
+
+The core is importable without Streamlit: ``from querycraft import Converter``.
+Names below are resolved lazily on first attribute access, and heavy
+dependencies (google.generativeai, pandas, numpy) only load when used, so
+``import querycraft`` stays cheap for workers and CLIs.
+"""
+import importlib
+
+_EXPORTS = {
+    "Converter": "querycraft.pipeline",
+    "ConversionResult": "querycraft.pipeline",
+    "Conversation": "querycraft.pipeline",
+    "ResponseCache": "querycraft.cache",
+    "HistoryStore": "querycraft.history",
+    "ConnectionPool": "querycraft.resources",
+    "DemoDatabase": "querycraft.resources",
+    "ExampleStore": "querycraft.examples",
+    "SandboxStore": "querycraft.datasets",
+    "SchemaRegistry": "querycraft.schema",
+    "Tracer": "querycraft.tracing",
+    "build_model": "querycraft.client",
+    "build_prompt": "querycraft.prompts",
+    "convert_with_fallback": "querycraft.fallback",
+    "generate_fallback_query": "querycraft.fallback",
+    "run_demo_query": "querycraft.execution",
+    "UnsafeQueryError": "querycraft.execution",
+    "execute_query": "querycraft.execution",
+    "ExecutionLimits": "querycraft.execution",
+    "QueryExecutor": "querycraft.execution",
+    "CandidateSelector": "querycraft.voting",
+    "convert_batch": "querycraft.batch",
+    "QuotaScheduler": "querycraft.quota",
+    "Router": "querycraft.routing",
+    "build_router": "querycraft.routing",
+    "ConversionService": "querycraft.service",
+    "ServiceClient": "querycraft.service",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module 'querycraft' has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
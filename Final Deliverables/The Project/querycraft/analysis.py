@@ -0,0 +1,514 @@
+# querycraft/analysis.py
+"""Query-plan analysis of generated SQL: full scans, join indexes, sargability, cost.
+
+``analyze(checked, conn)`` runs SQLite's EXPLAIN QUERY PLAN for the query on
+a connection holding the target schema (a registered database, a replayed
+DDL dump or a session sandbox) and reads the plan together with the query's
+AST:
+
+- full scans of tables the query filters on, where no index serves the filter;
+- joins whose inner table is scanned, or gets an AUTOMATIC index that SQLite
+  rebuilds on every run, because the join column has no index;
+- non-sargable predicates (a function or arithmetic around the column, a
+  leading-wildcard LIKE), which no plain index can serve, with a rewrite;
+- sorts and groupings of large tables that need a temporary B-tree.
+
+Table sizes come from sqlite_stat1 (ANALYZE), else MAX(rowid); tables
+without rows (DDL-only schemas) are assumed to hold DEFAULT_ROWS. The cost
+is the estimated number of rows the nested loops examine, not a timing.
+Suggested indexes are rendered for every dialect, next to the EXPLAIN
+statement each engine needs for its own plan.
+"""
+import math
+import random
+import re
+import sqlite3
+
+from querycraft.dialects import DIALECTS
+from querycraft.schema import _quote
+
+DEFAULT_ROWS = 1_000_000  # tables without rows or statistics, as SQLite itself assumes
+LARGE_TABLE_ROWS = 10_000  # findings on smaller tables are low severity
+ROWS_PER_KEY = 10  # SQLite's guess for an equality lookup without statistics
+SAMPLE_ROWS = 500  # random rows probed to estimate how selective a filter is
+MAX_INDEX_SELECTIVITY = 0.1  # beyond this share of rows a non-covering index loses to a scan
+
+SEVERITIES = ("high", "medium", "low")
+
+EXPLAIN_TEMPLATES = {
+    "PostgreSQL": "EXPLAIN (FORMAT JSON)\n{sql};",
+    "MySQL": "EXPLAIN FORMAT=JSON\n{sql};",
+    "SQL Server": "SET SHOWPLAN_XML ON;\nGO\n{sql};\nGO\nSET SHOWPLAN_XML OFF;",
+    "SQLite": "EXPLAIN QUERY PLAN\n{sql};",
+}
+
+_STEP = re.compile(r"^(SCAN|SEARCH) (\S+)(?: AS \S+)?(?: USING (.+))?$")
+_STEP_INDEX = re.compile(r"INDEX (\S+)")
+_STEP_TERMS = re.compile(r"\((.*)\)$")
+_TEMP_BTREE = re.compile(r"^USE TEMP B-TREE FOR (.+)$")
+_TERM = re.compile(r"^(<expr>|[^<>=]+)([<>]=?|=)\?$")  # "customer_id=?", "<expr>=?", "total>?"
+
+
+class Finding:
+    """One problem in the plan; ``suggestion`` is a CREATE INDEX statement or a rewrite hint"""
+
+    def __init__(self, kind, severity, table, message, suggestion=None):
+        self.kind = kind
+        self.severity = severity
+        self.table = table
+        self.message = message
+        self.suggestion = suggestion
+
+    def __repr__(self):
+        return f"Finding({self.kind!r}, {self.severity!r}, {self.message!r})"
+
+
+class PlanReport:
+    """EXPLAIN QUERY PLAN rows, findings (worst first) and the rows-examined estimate"""
+
+    def __init__(self, sql, plan=(), findings=(), table_rows=None, estimated_rows=None, error=None):
+        self.sql = sql
+        self.plan = list(plan)
+        self.findings = sorted(findings, key=lambda finding: SEVERITIES.index(finding.severity))
+        self.table_rows = table_rows or {}
+        self.estimated_rows = estimated_rows
+        self.error = error
+
+    @property
+    def indexes(self):
+        """Suggested CREATE INDEX statements (SQLite syntax), without duplicates"""
+        statements = []
+        for finding in self.findings:
+            if finding.suggestion and finding.suggestion.startswith("CREATE INDEX") \
+                    and finding.suggestion not in statements:
+                statements.append(finding.suggestion)
+        return statements
+
+    def index_statements(self, dialect):
+        """The suggested indexes rendered for one sqlglot dialect"""
+        import sqlglot
+        from sqlglot import exp
+
+        rendered = []
+        for statement in self.indexes:
+            # Plain columns: sqlglot would otherwise spell out SQLite's NULL ordering in each dialect
+            tree = sqlglot.parse_one(statement, read="sqlite").transform(
+                lambda node: node.this if isinstance(node, exp.Ordered) else node)
+            rendered.append(tree.sql(dialect=dialect))
+        return rendered
+
+    def plan_text(self):
+        """The plan as an indented tree, like the sqlite3 shell prints it"""
+        depth, lines = {0: -1}, []
+        for step_id, parent, detail in self.plan:
+            depth[step_id] = depth.get(parent, -1) + 1
+            lines.append("  " * depth[step_id] + detail)
+        return "\n".join(lines)
+
+
+def explain_statements(checked, dialects=DIALECTS):
+    """``{display name: EXPLAIN statement}`` for running the query's plan on each engine"""
+    rendered = checked.transpile(dialects)
+    return {name: EXPLAIN_TEMPLATES.get(name, "EXPLAIN\n{sql};").format(sql=sql)
+            for name, sql in rendered.items()}
+
+
+def _table_schema(conn, table):
+    try:
+        row = conn.execute("SELECT schema, type FROM pragma_table_list WHERE name = ?", (table,)).fetchone()
+    except sqlite3.Error:
+        return "main", "table"
+    return row if row is not None else (None, None)
+
+
+def table_rows(conn, table):
+    """``(rows, source)``: source is "stat1", "rowid" or "assumed" """
+    schema, kind = _table_schema(conn, table)
+    if schema is None or kind != "table":
+        return DEFAULT_ROWS, "assumed"
+    try:
+        row = conn.execute(f"SELECT stat FROM {_quote(schema)}.sqlite_stat1 WHERE tbl = ? LIMIT 1",
+                           (table,)).fetchone()
+        if row is not None and row[0]:
+            return int(row[0].split()[0]), "stat1"
+    except sqlite3.Error:
+        pass  # never analyzed
+    try:
+        rows = conn.execute(f"SELECT MAX(rowid) FROM {_quote(schema)}.{_quote(table)}").fetchone()[0]
+    except sqlite3.Error:
+        rows = None  # WITHOUT ROWID
+    if not rows:
+        return DEFAULT_ROWS, "assumed"
+    return rows, "rowid"
+
+
+def _index_columns(conn, table):
+    """Column lists of ``table``'s indexes, the INTEGER PRIMARY KEY counting as one"""
+    schema, _ = _table_schema(conn, table)
+    schema = _quote(schema or "main")
+    indexes = []
+    try:
+        pk = [(name, kind) for _, name, kind, _, _, is_pk in conn.execute(
+            f"PRAGMA {schema}.table_info({_quote(table)})") if is_pk]
+        if len(pk) == 1 and pk[0][1].upper() == "INTEGER":
+            indexes.append([pk[0][0]])
+        for _, index_name, *_ in conn.execute(f"PRAGMA {schema}.index_list({_quote(table)})"):
+            indexes.append([column for _, _, column in conn.execute(
+                f"PRAGMA {schema}.index_info({_quote(index_name)})")])
+    except sqlite3.Error:
+        pass
+    return indexes
+
+
+def _stat_rows_per_key(conn, table, index_name, terms):
+    schema, _ = _table_schema(conn, table)
+    try:
+        row = conn.execute(f"SELECT stat FROM {_quote(schema or 'main')}.sqlite_stat1 WHERE tbl = ? AND idx = ?",
+                           (table, index_name)).fetchone()
+    except sqlite3.Error:
+        return None
+    if row is None:
+        return None
+    numbers = row[0].split()
+    return int(numbers[min(terms, len(numbers) - 1)])
+
+
+def _index_name(table, columns):
+    return "idx_" + re.sub(r"\W+", "_", "_".join([table] + columns)).strip("_").lower()
+
+
+def create_index(table, columns, expression=None):
+    """SQLite CREATE INDEX for ``columns`` (or one ``expression``) of ``table``"""
+    body = expression or ", ".join(_quote(column) if not re.fullmatch(r"\w+", column) else column
+                                   for column in columns)
+    return f"CREATE INDEX {_index_name(table, columns)} ON {table} ({body})"
+
+
+class _Predicates:
+    """Per-table filter columns, join pairs and non-sargable conditions from the AST"""
+
+    def __init__(self, tree, aliases, columns_of):
+        self.filters = {}  # table -> {"eq": [columns], "range": [columns]}
+        self.joins = {}  # table -> [column joined on]
+        self.non_sargable = []  # (table, column, condition node, wrapper node)
+        self.ors = []  # (table, [columns]) for OR across columns of one table
+        self.conditions = {}  # table -> [condition nodes on that table alone]
+        self._aliases = aliases
+        self._columns_of = columns_of
+        self._single = next(iter(set(aliases.values()))) if len(set(aliases.values())) == 1 else None
+        self._collect(tree)
+        # Tables the query filters on in any form
+        self.tables = set(self.filters) | {table for table, *_ in self.non_sargable + self.ors}
+
+    def _collect(self, tree):
+        from sqlglot import exp
+
+        conditions = [where.this for where in tree.find_all(exp.Where)]
+        conditions += [join.args["on"] for join in tree.find_all(exp.Join) if join.args.get("on") is not None]
+        for condition in conditions:
+            for conjunct in condition.flatten() if isinstance(condition, exp.And) else [condition]:
+                self._add(conjunct)
+
+    def table_of(self, column):
+        if column.table:
+            return self._aliases.get(column.table)
+        if self._single is not None:
+            return self._single
+        owners = [table for table in set(self._aliases.values()) if column.name in self._columns_of(table)]
+        return owners[0] if len(owners) == 1 else None
+
+    def _add(self, node):
+        from sqlglot import exp
+
+        if isinstance(node, exp.Paren):
+            node = node.this
+        columns = list(node.find_all(exp.Column))
+        tables = {self.table_of(column) for column in columns}
+        if len(tables) == 1 and None not in tables and node.find(exp.Select) is None:
+            self.conditions.setdefault(next(iter(tables)), []).append(node)
+        if isinstance(node, exp.Or):
+            if len(tables) == 1 and len({column.name for column in columns}) > 1 and None not in tables:
+                self.ors.append((tables.pop(), sorted({column.name for column in columns})))
+            return
+        if not isinstance(node, (exp.EQ, exp.NEQ, exp.GT, exp.GTE, exp.LT, exp.LTE, exp.Like, exp.ILike,
+                                 exp.In, exp.Between, exp.Is)):
+            return
+        left = node.this
+        right = node.expression if not isinstance(node, (exp.In, exp.Between)) else None
+        if isinstance(left, exp.Column) and isinstance(right, exp.Column):
+            left_table, right_table = self.table_of(left), self.table_of(right)
+            if left_table and right_table and left_table != right_table:
+                self.joins.setdefault(left_table, []).append(left.name)
+                self.joins.setdefault(right_table, []).append(right.name)
+            return
+        if right is not None and isinstance(right, exp.Column) and not left.find(exp.Column):
+            left, right = right, left  # 5 < col
+        if right is not None and right.find(exp.Column):
+            return  # columns on both sides of a non-join comparison
+        if isinstance(left, exp.Column):
+            table = self.table_of(left)
+            if table is None or isinstance(node, exp.NEQ):
+                return
+            if isinstance(node, (exp.Like, exp.ILike)):
+                pattern = right.name if isinstance(right, exp.Literal) else ""
+                if pattern.startswith(("%", "_")):
+                    self.non_sargable.append((table, left.name, node, node))
+                    return
+            kind = "eq" if isinstance(node, (exp.EQ, exp.In, exp.Is)) else "range"
+            entry = self.filters.setdefault(table, {"eq": [], "range": []})
+            if left.name not in entry[kind]:
+                entry[kind].append(left.name)
+            return
+        column = left.find(exp.Column)
+        if column is not None and self.table_of(column) is not None:
+            self.non_sargable.append((self.table_of(column), column.name, node, left))
+
+
+def _rewrite_hint(table, column, condition, wrapper):
+    from sqlglot import exp
+
+    if isinstance(condition, (exp.Like, exp.ILike)) and wrapper is condition:
+        return "Anchor the pattern ('abc%'), or search a full-text index instead."
+    if isinstance(wrapper, (exp.Lower, exp.Upper)):
+        expression = wrapper.copy()
+        for node in expression.find_all(exp.Column):
+            node.set("table", None)
+        return create_index(table, [column, wrapper.key], expression.sql(dialect="sqlite"))
+    if isinstance(wrapper, (exp.Add, exp.Sub, exp.Mul, exp.Div)):
+        return f"Move the arithmetic to the other side, so {column} is compared as stored."
+    return (f"Compare the bare column instead of {wrapper.key.upper()}({column}), "
+            f"e.g. a range `{column} >= ... AND {column} < ...` for dates.")
+
+
+def _unqualified(node):
+    from sqlglot import exp
+
+    node = node.copy()
+    for column in node.find_all(exp.Column):
+        column.set("table", None)
+    return node
+
+
+def selectivity(conn, table, conditions, sample_size=SAMPLE_ROWS, seed=0):
+    """Fraction of ``table``'s rows matching all ``conditions`` (sqlglot nodes), or None.
+
+    Estimated from up to ``sample_size`` random rowid lookups, so it costs a
+    few hundred index probes whatever the table size. Tables without rows or
+    without rowids are unknown.
+    """
+    schema, _ = _table_schema(conn, table)
+    if schema is None or not conditions:
+        return None
+    source = f"{_quote(schema)}.{_quote(table)}"
+    try:
+        last = conn.execute(f"SELECT MAX(rowid) FROM {source}").fetchone()[0]
+        if not last:
+            return None
+        rowids = random.Random(seed).sample(range(1, last + 1), min(sample_size, last))
+        condition = " AND ".join(f"({_unqualified(node).sql(dialect='sqlite')})" for node in conditions)
+        sampled, matched = conn.execute(
+            f"SELECT COUNT(*), SUM(CASE WHEN {condition} THEN 1 ELSE 0 END) FROM {source} "
+            f"WHERE rowid IN ({','.join(map(str, rowids))})").fetchone()
+    except sqlite3.Error:
+        return None
+    return matched / sampled if sampled else None
+
+
+def _term(term):
+    """``(column, is_range)`` for one constraint of a plan step"""
+    match = _TERM.match(term)
+    return (match.group(1), match.group(2) != "=") if match else (term, False)
+
+
+def analyze(checked, conn, large_table_rows=LARGE_TABLE_ROWS):
+    """PlanReport for a CheckedQuery on ``conn``; planning errors end up in ``report.error``"""
+    from sqlglot import exp
+
+    sql = checked.to("sqlite", pretty=False)
+    try:
+        plan = conn.execute("EXPLAIN QUERY PLAN " + sql).fetchall()
+    except sqlite3.Error as e:
+        return PlanReport(sql, error=f"Could not plan the query on this schema: {e}")
+    plan = [(step_id, parent, detail) for step_id, parent, _, detail in plan]
+
+    tree = checked.tree
+    cte_names = {cte.alias for cte in tree.find_all(exp.CTE)}
+    aliases = {table.alias_or_name: table.name for table in tree.find_all(exp.Table)
+               if table.name and table.name not in cte_names}
+    sizes, columns_cache, index_cache, selectivities = {}, {}, {}, {}
+
+    def rows_of(table):
+        if table not in sizes:
+            sizes[table] = table_rows(conn, table)
+        return sizes[table][0]
+
+    def columns_of(table):
+        if table not in columns_cache:
+            schema, _ = _table_schema(conn, table)
+            try:
+                columns_cache[table] = {row[1] for row in conn.execute(
+                    f"PRAGMA {_quote(schema or 'main')}.table_info({_quote(table)})")}
+            except sqlite3.Error:
+                columns_cache[table] = set()
+        return columns_cache[table]
+
+    def indexed(table, columns):
+        if table not in index_cache:
+            index_cache[table] = _index_columns(conn, table)
+        return any(existing[:len(columns)] == columns for existing in index_cache[table])
+
+    predicates = _Predicates(tree, aliases, columns_of)
+
+    def matching(table):
+        if table not in selectivities:
+            selectivities[table] = selectivity(conn, table, predicates.conditions.get(table))
+        return selectivities[table]
+
+    def severity(table):
+        return "high" if rows_of(table) >= large_table_rows else "low"
+
+    def covering(table, columns):
+        # Selected columns of ``table`` after the filter columns, if the query names them all
+        if tree.find(exp.Star) is not None or len(set(aliases.values())) != 1:
+            return None
+        selected = [node.name for node in tree.selects for node in node.find_all(exp.Column)]
+        extra = [column for column in dict.fromkeys(selected) if column not in columns and not indexed(table, [column])]
+        return create_index(table, columns + extra) if extra else None
+
+    findings, reported = [], set()
+
+    def filter_finding(table, looked_up_by=None):
+        filters = predicates.filters[table]
+        columns = filters["eq"] + filters["range"][:1]
+        total, fraction = rows_of(table), matching(table)
+        share = ""
+        if fraction is not None:
+            share = f" (~{fraction:.0%} of rows match)" if fraction >= 0.01 else " (under 1% of rows match)"
+        if fraction is not None and fraction > MAX_INDEX_SELECTIVITY:
+            findings.append(Finding(
+                "full_scan", "low", table,
+                f"Full scan of {table} (~{total:,} rows): the filter on {', '.join(columns)}{share} is too broad "
+                f"for an index lookup to beat the scan, unless the index covers the query.",
+                covering(table, columns)))
+        elif looked_up_by is not None:
+            findings.append(Finding(
+                "filter_index", severity(table), table,
+                f"{table} is filtered on {', '.join(columns)}{share} but looked up by {looked_up_by}; "
+                f"no index serves the filter.",
+                create_index(table, columns)))
+        else:
+            findings.append(Finding(
+                "full_scan", severity(table), table,
+                f"Full scan of {table} (~{total:,} rows) although the query filters on "
+                f"{', '.join(columns)}{share}; no index serves that filter.",
+                create_index(table, columns) if not indexed(table, columns) else None))
+
+    # Nested loops: steps sharing a parent run inside one another, in plan order
+    loops, estimated, sorted_in_temp, expression_searches, unfiltered = {}, 0, False, set(), []
+    for step_id, parent, detail in plan:
+        match = _STEP.match(detail)
+        if match is None:
+            temp = _TEMP_BTREE.match(detail)
+            sorted_in_temp = sorted_in_temp or temp is not None
+            tables = set(aliases.values())
+            if temp and len(tables) == 1 and rows_of(next(iter(tables))) >= large_table_rows:
+                table = next(iter(tables))
+                clause = tree.args.get({"ORDER BY": "order", "GROUP BY": "group"}.get(temp.group(1), ""))
+                columns = [node.name for node in (clause.find_all(exp.Column) if clause else ())]
+                findings.append(Finding(
+                    "temp_btree", "medium", table,
+                    f"{temp.group(1)} sorts ~{rows_of(table):,} rows of {table} in a temporary B-tree.",
+                    create_index(table, columns) if columns and not indexed(table, columns) else None))
+            continue
+        operation, name, using = match.group(1), match.group(2), match.group(3) or ""
+        table = aliases.get(name, name if name in aliases.values() else None)
+        if table is None:
+            continue  # a subquery or CTE materialization
+        outer = loops.setdefault(parent, [])
+        total = rows_of(table)
+        terms = _STEP_TERMS.search(using)
+        terms = terms.group(1).split(" AND ") if terms else []
+        term_columns = [_term(term)[0] for term in terms]
+        if "<expr>" in term_columns:
+            expression_searches.add(table)  # an expression index serves a wrapped column
+        if operation == "SCAN":
+            examined = total
+        elif any(_term(term)[1] for term in terms):
+            examined = max(1, round(total * matching(table))) if matching(table) is not None else max(1, total // 4)
+        elif "PRIMARY KEY" in using:
+            examined = 1
+        else:
+            index = _STEP_INDEX.search(using)
+            per_key = _stat_rows_per_key(conn, table, index.group(1), len(terms)) if index else None
+            examined = min(total, per_key or ROWS_PER_KEY)
+        if "AUTOMATIC" in using:
+            estimated += total  # the transient index is built from a full scan first
+        outer.append(examined)
+        product = 1
+        for factor in outer:
+            product *= factor
+        estimated += product
+
+        filters = predicates.filters.get(table)
+        join_columns = [column for column in predicates.joins.get(table, []) if not indexed(table, [column])]
+        if "AUTOMATIC" in using and (table, "join") not in reported:
+            reported.add((table, "join"))
+            findings.append(Finding(
+                "join_index", "high" if total >= large_table_rows else "medium", table,
+                f"No index on {table}({', '.join(term_columns)}): SQLite builds a temporary one from all "
+                f"~{total:,} rows on every run of this join.",
+                create_index(table, term_columns)))
+        elif filters and (table, "filter") not in reported and (
+                operation == "SCAN" and not using
+                or operation == "SEARCH" and not set(term_columns) & set(filters["eq"] + filters["range"])):
+            reported.add((table, "filter"))
+            if operation == "SCAN" or not indexed(table, (filters["eq"] + filters["range"])[:1]):
+                filter_finding(table, None if operation == "SCAN" else ", ".join(term_columns))
+        elif operation == "SCAN" and not using and join_columns and (table, "join") not in reported:
+            reported.add((table, "join"))
+            if len(outer) > 1:
+                message = (f"{table} is scanned in full for every row of the outer loop; "
+                           f"the join column {join_columns[0]} has no index.")
+            else:
+                message = (f"{table} (~{total:,} rows) is read in full to drive the join; with an index on "
+                           f"{table}({join_columns[0]}) SQLite can start from the other side's rows instead.")
+            findings.append(Finding("join_index", severity(table), table, message,
+                                    create_index(table, join_columns[:1])))
+        elif operation == "SCAN" and not using and table not in predicates.tables and total >= large_table_rows \
+                and (table, "filter") not in reported:
+            reported.add((table, "filter"))
+            unfiltered.append(table)
+
+    # LIMIT stops a single streaming loop early
+    limit = tree.args.get("limit")
+    limit = limit.expression if limit is not None else None
+    if isinstance(limit, exp.Literal) and limit.is_int and not sorted_in_temp and len(loops) == 1 \
+            and len(next(iter(loops.values()))) == 1 and estimated:
+        table = next(iter(set(aliases.values())), None)
+        fraction = matching(table) if table in predicates.tables else 1.0
+        if fraction:
+            estimated = min(estimated, math.ceil(int(limit.name) / fraction))
+            unfiltered = []
+    for table in unfiltered:
+        findings.append(Finding(
+            "full_scan", "medium", table,
+            f"Reads all ~{rows_of(table):,} rows of {table}; the query does not filter it."))
+
+    for table, column, condition, wrapper in predicates.non_sargable:
+        if (table, column, "sargable") in reported or table in expression_searches:
+            continue
+        reported.add((table, column, "sargable"))
+        findings.append(Finding(
+            "non_sargable", severity(table), table,
+            f"`{condition.sql(dialect='sqlite')}` cannot use an index on {table}.{column}.",
+            _rewrite_hint(table, column, condition, wrapper)))
+    for table, columns in predicates.ors:
+        if rows_of(table) < large_table_rows:
+            continue
+        findings.append(Finding(
+            "non_sargable", "low", table,
+            f"OR across {', '.join(columns)} of {table} usually needs a full scan.",
+            "Split it into one indexed query per column combined with UNION."))
+
+    table_sizes = {table: sizes.get(table) or table_rows(conn, table) for table in set(aliases.values())}
+    return PlanReport(sql, plan, findings, table_sizes, estimated)
@@ -0,0 +1,249 @@
+# querycraft/batch.py
+"""Headless batch conversion of saved business questions.
+
+Questions are read from CSV or JSONL, fanned out to the model with bounded
+asyncio concurrency behind a token-bucket limiter (or a QuotaScheduler at
+batch priority, which also records token usage), and written to the
+``queries`` table in chunked transactions. A checkpoint file records which
+ids are already stored so an interrupted run can be resumed.
+
+Usage:
+    python -m querycraft.batch questions.csv --concurrency 8 --rpm 60 --tpm 1000000
+    python -m querycraft.batch questions.jsonl --stub --rpm 0   # offline benchmark
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from querycraft.cache import ResponseCache, make_key
+from querycraft.client import build_model
+from querycraft.db import ensure_queries_table
+from querycraft.examples import ExampleStore
+from querycraft.prompts import CONVERTER_TEMPLATE, build_prompt, prompt_version
+from querycraft.quota import QuotaScheduler
+from querycraft.ratelimit import TokenBucket
+from querycraft.resources import ConnectionPool
+from querycraft.schema import SchemaRegistry
+from querycraft.streaming import final_sql
+
+QUESTION_FIELDS = ("question", "input_text", "text")
+
+
+def read_questions(path):
+    """Return ``[(id, question), ...]`` from a CSV or JSONL file.
+
+    Ids come from an ``id`` field when present, otherwise the 1-based row number.
+    """
+    questions = []
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        for number, row in enumerate(rows, start=1):
+            question = next((row[field] for field in QUESTION_FIELDS if row.get(field)), None)
+            if question is None:
+                raise ValueError(f"{path}: row {number} has none of the columns {QUESTION_FIELDS}")
+            qid = row.get("id")
+            questions.append((str(number if qid in (None, "") else qid), question))
+    return questions
+
+
+class Checkpoint:
+    """Append-only file of ids whose results are already committed"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return set()
+        with open(self.path, encoding="utf-8") as f:
+            return {line.strip() for line in f if line.strip()}
+
+    def mark(self, ids):
+        if not self.path:
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(f"{question_id}\n" for question_id in ids)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def backoff_delay(attempt, base=1.0, cap=30.0):
+    """Full-jitter exponential backoff"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+async def run_batch(questions, model, conn, model_name, template=CONVERTER_TEMPLATE,
+                    concurrency=8, requests_per_minute=60, max_retries=3, backoff_base=1.0,
+                    chunk_size=50, checkpoint_path=None, cache=None, schema_index=None,
+                    schema_k=8, example_store=None, examples_k=3, scheduler=None):
+    """Convert ``questions`` and store them in ``conn``; returns a summary dict.
+
+    ``requests_per_minute=0`` disables rate limiting (useful with a stub model).
+    With ``schema_index`` each prompt carries the top ``schema_k`` relevant tables;
+    with ``example_store`` the ``examples_k`` most similar accepted examples.
+    A ``scheduler`` (quota.QuotaScheduler) replaces the ``requests_per_minute``
+    limiter; its calls wait at "batch" priority and their tokens are recorded.
+    """
+    checkpoint = Checkpoint(checkpoint_path)
+    done = checkpoint.load()
+    pending = [(qid, question) for qid, question in questions if qid not in done]
+    bucket = None
+    if scheduler is not None:
+        model = scheduler.bind(model, priority="batch", model_name=model_name)
+    elif requests_per_minute:
+        bucket = TokenBucket.per_minute(requests_per_minute)
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="querycraft-batch")
+    work = asyncio.Queue()
+    for item in pending:
+        work.put_nowait(item)
+    summary = {"total": len(questions), "skipped": len(done), "converted": 0,
+               "cached": 0, "failed": []}
+    buffer = []
+
+    def schema_text(question):
+        return schema_index.describe(question, schema_k) if schema_index is not None else ""
+
+    def flush():
+        if not buffer:
+            return
+        conn.executemany(
+            "INSERT INTO queries (input_text, sql_generated, latency_ms) VALUES (?, ?, ?)",
+            [(question, sql, latency) for _, question, sql, latency in buffer],
+        )
+        conn.commit()
+        checkpoint.mark(qid for qid, *_ in buffer)
+        buffer.clear()
+
+    async def convert(question, schema, examples):
+        prompt = build_prompt(question, schema, template, examples=examples)
+        for attempt in range(max_retries + 1):
+            if bucket is not None:
+                await bucket.acquire_async()
+            try:
+                response = await loop.run_in_executor(executor, model.generate_content, prompt)
+                return final_sql(response.text)
+            except Exception:
+                if attempt == max_retries:
+                    raise
+                await asyncio.sleep(backoff_delay(attempt, backoff_base))
+
+    async def worker():
+        while True:
+            try:
+                qid, question = work.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            started = time.perf_counter()
+            schema = schema_text(question)
+            examples = example_store.select(question, k=examples_k) if example_store is not None else None
+            try:
+                if cache is not None:
+                    key = make_key(question, prompt_version(schema, template, examples), model_name)
+                    sql = cache.get(key)
+                    if sql is not None:
+                        summary["cached"] += 1
+                    else:
+                        sql = await convert(question, schema, examples)
+                        cache.set(key, sql)
+                else:
+                    sql = await convert(question, schema, examples)
+            except Exception as e:
+                summary["failed"].append({"id": qid, "error": str(e)})
+                continue
+            buffer.append((qid, question, sql, (time.perf_counter() - started) * 1000))
+            summary["converted"] += 1
+            if len(buffer) >= chunk_size:
+                flush()
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    finally:
+        flush()
+        executor.shutdown(wait=False)
+    elapsed = time.perf_counter() - started
+    summary["elapsed_s"] = round(elapsed, 3)
+    summary["throughput_qps"] = round(summary["converted"] / elapsed, 2) if elapsed else 0.0
+    return summary
+
+
+def convert_batch(questions, model, db_path="querycraft.db", model_name="gemini-1.5-flash", **options):
+    """Synchronous entry point around :func:`run_batch`"""
+    conn = sqlite3.connect(db_path)
+    try:
+        ensure_queries_table(conn)
+        return asyncio.run(run_batch(questions, model, conn, model_name, **options))
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert a file of natural language questions to SQL.")
+    parser.add_argument("input", help="CSV (with a 'question' column) or JSONL file")
+    parser.add_argument("--db", default="querycraft.db")
+    parser.add_argument("--model", default="gemini-1.5-flash")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rpm", type=int, default=60, help="requests per minute; 0 disables the limiter")
+    parser.add_argument("--tpm", type=int, default=0, help="tokens per minute; 0 for no token budget")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--chunk-size", type=int, default=50)
+    parser.add_argument("--checkpoint", help="resume file; defaults to <input>.done")
+    parser.add_argument("--schema", help="name of a registered target database (see querycraft.schema)")
+    parser.add_argument("--dynamic-examples", action="store_true",
+                        help="pick few-shot examples from accepted history instead of the fixed four")
+    parser.add_argument("--no-cache", action="store_true", help="skip the shared response cache")
+    parser.add_argument("--stub", action="store_true", help="use the offline stub model")
+    parser.add_argument("--stub-latency", type=float, default=0.05)
+    args = parser.parse_args(argv)
+
+    if args.stub:
+        from querycraft.stub import StubModel
+        model = StubModel(latency=args.stub_latency)
+    else:
+        model = build_model(args.model)
+    cache = None if args.no_cache else ResponseCache(args.db)
+    # Usage goes into the same querycraft.db the pages report from
+    scheduler = QuotaScheduler(requests_per_minute=args.rpm or None, tokens_per_minute=args.tpm or None,
+                               pool=ConnectionPool(args.db))
+    schema_index = SchemaRegistry().get(args.schema) if args.schema else None
+    example_store = None
+    if args.dynamic_examples:
+        example_store = ExampleStore()
+        with sqlite3.connect(args.db) as conn:
+            ensure_queries_table(conn)
+            example_store.load_accepted(conn)
+
+    summary = convert_batch(
+        read_questions(args.input),
+        model,
+        db_path=args.db,
+        model_name=args.model,
+        concurrency=args.concurrency,
+        requests_per_minute=args.rpm,
+        max_retries=args.retries,
+        chunk_size=args.chunk_size,
+        checkpoint_path=args.checkpoint or f"{args.input}.done",
+        cache=cache,
+        schema_index=schema_index,
+        example_store=example_store,
+        scheduler=scheduler,
+    )
+    scheduler.flush()
+    json.dump(summary, sys.stdout, indent=2)
+    print()
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
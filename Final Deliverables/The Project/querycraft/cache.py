@@ -0,0 +1,224 @@
+# querycraft/cache.py
+"""Persistent prompt -> SQL response cache.
+
+Entries live in a ``response_cache`` table inside querycraft.db and are keyed
+on a SHA-256 of the normalized input text, the prompt template version, the
+model name and the generation config. A small in-process LRU sits in front of
+SQLite so repeated questions within one server process skip the disk as well.
+"""
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+# A quoted literal opens and closes at a word boundary, so "What's" is not one
+_QUOTED = re.compile(r"""(?<!\w)(['"`])(.*?)\1(?!\w)""", re.DOTALL)
+_SPACE = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    """Lower-case and collapse whitespace so trivial edits share a cache entry.
+
+    Quoted literals are kept verbatim: "status 'Paid'" and "status 'paid'"
+    ask for different rows.
+    """
+    parts, start = [], 0
+    for match in _QUOTED.finditer(text):
+        parts.append(_SPACE.sub(" ", text[start:match.start()].lower()))
+        parts.append(match.group(0))
+        start = match.end()
+    parts.append(_SPACE.sub(" ", text[start:].lower()))
+    return "".join(parts).strip()
+
+
+def template_version(template):
+    """Short fingerprint of a prompt template; changes whenever the template does"""
+    return hashlib.sha256(template.encode("utf-8")).hexdigest()[:12]
+
+
+def make_key(input_text, template_ver, model_name, generation_config=None):
+    payload = json.dumps(
+        [normalize_text(input_text), template_ver, model_name, generation_config or {}],
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Two-tier (memory + SQLite) cache with TTL and LRU/size-bounded eviction.
+
+    Hits on the memory tier write ``last_access`` through to SQLite in
+    batches of ``touch_batch``, and always before the disk tier evicts, so
+    the most-used entries are not the first ones evicted.
+    """
+
+    def __init__(self, db_path="querycraft.db", ttl=7 * 24 * 3600, max_entries=5000,
+                 max_bytes=20 * 1024 * 1024, hot_size=256, touch_batch=64):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hot_size = hot_size
+        self.touch_batch = touch_batch
+        self.hits = 0
+        self.hot_hits = 0
+        self.misses = 0
+        self._hot = OrderedDict()
+        self._touched = {}  # key -> last hot-tier hit not yet written to SQLite
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS response_cache (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_response_cache_last_access "
+            "ON response_cache (last_access)"
+        )
+        self._conn.commit()
+
+    def _expired(self, created_at, now):
+        return self.ttl is not None and now - created_at > self.ttl
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._hot.get(key)
+            if entry is not None:
+                response, created_at = entry
+                if not self._expired(created_at, now):
+                    self._hot.move_to_end(key)
+                    self._touched[key] = now
+                    if len(self._touched) >= self.touch_batch:
+                        self._write_touches()
+                        self._conn.commit()
+                    self.hits += 1
+                    self.hot_hits += 1
+                    return response
+                del self._hot[key]
+                self._touched.pop(key, None)
+
+            row = self._conn.execute(
+                "SELECT response, created_at FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or self._expired(row[1], now):
+                if row is not None:
+                    self._conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE response_cache SET last_access = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self._remember(key, row[0], row[1])
+            self.hits += 1
+            return row[0]
+
+    def set(self, key, response):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, response, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, response, len(response.encode("utf-8")), now, now),
+            )
+            self._touched.pop(key, None)
+            self._write_touches()
+            self._evict(now)
+            self._conn.commit()
+            self._remember(key, response, now)
+
+    def get_or_compute(self, input_text, compute, model_name, template_ver,
+                       generation_config=None, bypass=False):
+        """Return ``(response, cached)``; ``compute()`` runs only on a miss or bypass.
+
+        Exceptions raised by ``compute`` propagate and nothing is stored.
+        """
+        key = make_key(input_text, template_ver, model_name, generation_config)
+        if not bypass:
+            response = self.get(key)
+            if response is not None:
+                return response, True
+        response = compute()
+        self.set(key, response)
+        return response, False
+
+    def invalidate(self, input_text, model_name, template_ver, generation_config=None):
+        key = make_key(input_text, template_ver, model_name, generation_config)
+        with self._lock:
+            self._hot.pop(key, None)
+            self._touched.pop(key, None)
+            self._conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._hot.clear()
+            self._touched.clear()
+            self._conn.execute("DELETE FROM response_cache")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries, total_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM response_cache"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "hot_hits": self.hot_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": total_bytes,
+        }
+
+    def _remember(self, key, response, created_at):
+        self._hot[key] = (response, created_at)
+        self._hot.move_to_end(key)
+        while len(self._hot) > self.hot_size:
+            self._hot.popitem(last=False)
+
+    def _write_touches(self):
+        # Caller holds the lock; commit happens in the caller
+        if self._touched:
+            self._conn.executemany("UPDATE response_cache SET last_access = ? WHERE key = ?",
+                                   [(at, key) for key, at in self._touched.items()])
+            self._touched.clear()
+
+    def _evict(self, now):
+        # Caller holds the lock; commit happens in the caller
+        if self.ttl is not None:
+            self._conn.execute(
+                "DELETE FROM response_cache WHERE created_at < ?", (now - self.ttl,)
+            )
+        entries, total_bytes = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM response_cache"
+        ).fetchone()
+        if entries <= self.max_entries and total_bytes <= self.max_bytes:
+            return
+        # Drop least recently used rows until both bounds hold again
+        freed_entries, freed_bytes = 0, 0
+        victims = []
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM response_cache ORDER BY last_access ASC"
+        ):
+            if entries - freed_entries <= self.max_entries and total_bytes - freed_bytes <= self.max_bytes:
+                break
+            victims.append((key,))
+            freed_entries += 1
+            freed_bytes += size
+        self._conn.executemany("DELETE FROM response_cache WHERE key = ?", victims)
+        for (key,) in victims:
+            self._hot.pop(key, None)
@@ -0,0 +1,72 @@
+# querycraft/client.py
+"""Gemini model client. The SDK is imported only when a model is built."""
+import datetime
+import hashlib
+import os
+import threading
+import time
+
+
+def build_model(model_name, api_key=None, **configure_options):
+    """Configure google.generativeai and return a ``GenerativeModel``.
+
+    ``api_key`` defaults to ``GOOGLE_API_KEY`` from the environment or ``.env``;
+    extra keyword arguments (``transport``, ``client_options``) go to ``genai.configure``.
+    """
+    from dotenv import load_dotenv
+    import google.generativeai as genai
+
+    load_dotenv()
+    genai.configure(api_key=api_key or os.getenv("GOOGLE_API_KEY"), **configure_options)
+    return genai.GenerativeModel(model_name)
+
+
+# Gemini only caches contents of at least this many tokens (1.5 models)
+MIN_CACHED_TOKENS = 32768
+
+
+class GeminiContextCache:
+    """Keeps a conversation's first prompt in Gemini context caching for its follow-ups.
+
+    ``model_for(prefix)`` returns a ``GenerativeModel`` bound to the cached
+    prefix, creating the cache entry (``ttl_s`` seconds) on first use, or
+    None when the prefix is below the provider's minimum or caching is
+    unavailable; the caller then sends the follow-up stand-alone. Context
+    caching needs an explicit model version such as ``gemini-1.5-flash-001``.
+    """
+
+    def __init__(self, model_name, ttl_s=600, min_tokens=MIN_CACHED_TOKENS):
+        self.model_name = model_name if model_name.startswith("models/") else f"models/{model_name}"
+        self.ttl_s = ttl_s
+        self.min_tokens = min_tokens
+        self.available = True
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def model_for(self, prefix):
+        from querycraft.prompts import estimate_tokens
+
+        if not self.available or estimate_tokens(prefix) < self.min_tokens:
+            return None
+        key = hashlib.blake2b(prefix.encode("utf-8"), digest_size=16).digest()
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                return entry[0]
+        try:
+            import google.generativeai as genai
+            from google.generativeai import caching
+
+            cached = caching.CachedContent.create(
+                model=self.model_name, contents=[prefix], ttl=datetime.timedelta(seconds=self.ttl_s))
+            model = genai.GenerativeModel.from_cached_content(cached_content=cached)
+        except Exception:
+            # Unsupported model or SDK: stop paying a failed round trip on every follow-up
+            self.available = False
+            return None
+        now = time.monotonic()
+        with self._lock:
+            self._models = {k: v for k, v in self._models.items() if v[1] > now}
+            # Stop using the entry a little before the provider expires it
+            self._models[key] = (model, now + self.ttl_s * 0.9)
+        return model
@@ -0,0 +1,424 @@
+# querycraft/datasets.py
+"""User datasets (CSV / Parquet) loaded into SQLite sandboxes the demo runs against.
+
+Each upload is hashed (SHA-256 of its bytes, memory-mapped for files on disk)
+and loaded once into ``<root>/<hash>.db`` with chunked ``executemany`` inserts
+in a single transaction, so re-uploading the same file is a hash and a lookup.
+Column types are inferred from a sample of rows; SQLite's column affinity then
+converts every CSV cell on insert, so rows go in as read. Parquet is read batch
+by batch with pyarrow, memory-mapped when it comes from a path.
+
+Sandboxes are shared by all sessions and evicted least-recently-used once
+their total size passes ``max_bytes``. A session queries its own selection:
+``connect(hashes)`` attaches those files to a fresh, query-only connection. Each
+dataset is also registered with the SchemaRegistry (``dataset-<hash>``) so its
+table reaches the prompt like any other schema.
+"""
+import csv
+import hashlib
+import io
+import itertools
+import json
+import mmap
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from querycraft.schema import _quote
+
+DEFAULT_ROOT = os.path.join(".querycraft", "sandboxes")
+SCHEMA_PREFIX = "dataset-"
+MAX_ATTACHED = 8  # SQLite allows 10 attached databases by default
+
+_IDENTIFIER = re.compile(r"[^0-9a-zA-Z_]+")
+_INTEGER = re.compile(r"[+-]?(0|[1-9]\d*)")
+_REAL = re.compile(r"[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?")
+
+
+def identifier(name, fallback="data"):
+    """Lower-case SQL identifier from a file or column name"""
+    name = _IDENTIFIER.sub("_", name.strip()).strip("_").lower()
+    if not name:
+        return fallback
+    return f"_{name}" if name[0].isdigit() else name
+
+
+def _column_names(header):
+    names, seen = [], set()
+    for i, raw in enumerate(header):
+        name = base = identifier(raw, f"col_{i + 1}")
+        suffix = 2
+        while name in seen:
+            name, suffix = f"{base}_{suffix}", suffix + 1
+        seen.add(name)
+        names.append(name)
+    return names
+
+
+def infer_type(values):
+    """INTEGER, REAL or TEXT for a column sample; empty cells are ignored.
+
+    Numbers with leading zeros (zip codes, ids) stay TEXT so they keep them.
+    """
+    kind = None
+    for value in values:
+        value = value.strip() if value else value
+        if not value:
+            continue
+        if _INTEGER.fullmatch(value):
+            kind = kind or "INTEGER"
+        elif _REAL.fullmatch(value) and not (len(value) > 1 and value[0] == "0" and value[1] != "."):
+            kind = "REAL"
+        else:
+            return "TEXT"
+    return kind or "TEXT"
+
+
+def content_hash(source):
+    """SHA-256 of a path's contents (memory-mapped) or of an uploaded file's buffer"""
+    digest = hashlib.sha256()
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            if os.fstat(f.fileno()).st_size:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    digest.update(mapped)
+    elif hasattr(source, "getbuffer"):
+        digest.update(source.getbuffer())
+    else:
+        digest.update(source.read())
+        source.seek(0)
+    return digest.hexdigest()
+
+
+def _create_table(conn, table, columns, types, placeholder="?"):
+    definition = ", ".join(f"{_quote(name)} {kind}" for name, kind in zip(columns, types))
+    conn.execute(f"CREATE TABLE {_quote(table)} ({definition})")
+    placeholders = ", ".join([placeholder] * len(columns))
+    return f"INSERT INTO {_quote(table)} VALUES ({placeholders})"
+
+
+def load_csv(conn, table, source, chunk_size=10000, sample_size=1000):
+    """Bulk-load CSV text from a path or binary file object into ``table``; returns the row count"""
+    if isinstance(source, (str, os.PathLike)):
+        handle = open(source, encoding="utf-8-sig", newline="", buffering=1024 * 1024)
+    else:
+        source.seek(0)
+        handle = io.TextIOWrapper(source, encoding="utf-8-sig", newline="")
+    try:
+        head = handle.read(64 * 1024)
+        try:
+            dialect = csv.Sniffer().sniff(head, delimiters=",;\t|")
+        except csv.Error:
+            dialect = csv.excel
+        handle.seek(0)
+        reader = csv.reader(handle, dialect)
+        header = next(reader, None)
+        if not header:
+            raise ValueError("The CSV file is empty.")
+        columns = _column_names(header)
+        width = len(columns)
+
+        def rows():
+            for row in reader:
+                if len(row) != width:
+                    if not any(row):
+                        continue
+                    row = (row + [""] * width)[:width]
+                yield row
+
+        stream = rows()
+        sample = list(itertools.islice(stream, sample_size))
+        types = [infer_type(values) for values in zip(*sample)] if sample else ["TEXT"] * width
+        # Empty cells become NULL in SQLite rather than in a per-cell Python loop
+        insert = _create_table(conn, table, columns, types, placeholder="NULLIF(?, '')")
+        conn.executemany(insert, sample)
+        count = len(sample)
+        while True:
+            chunk = list(itertools.islice(stream, chunk_size))
+            if not chunk:
+                break
+            conn.executemany(insert, chunk)
+            count += len(chunk)
+        return count
+    finally:
+        if isinstance(source, (str, os.PathLike)):
+            handle.close()
+        else:
+            handle.detach()  # leave the caller's file object open
+
+
+def _sqlite_type(arrow_type):
+    import pyarrow.types as pat
+
+    if pat.is_integer(arrow_type) or pat.is_boolean(arrow_type):
+        return "INTEGER"
+    if pat.is_floating(arrow_type) or pat.is_decimal(arrow_type):
+        return "REAL"
+    if pat.is_binary(arrow_type) or pat.is_large_binary(arrow_type):
+        return "BLOB"
+    return "TEXT"
+
+
+def load_parquet(conn, table, source, chunk_size=10000):
+    """Bulk-load a Parquet path or binary file object into ``table``; returns the row count"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Loading Parquet files needs pyarrow (pip install pyarrow).") from None
+
+    if isinstance(source, (str, os.PathLike)):
+        parquet = pq.ParquetFile(source, memory_map=True)
+    else:
+        source.seek(0)
+        parquet = pq.ParquetFile(source)
+    schema = parquet.schema_arrow
+    columns = _column_names(schema.names)
+    types = []
+    for field in schema:
+        value_type = field.type.value_type if pa.types.is_dictionary(field.type) else field.type
+        types.append(_sqlite_type(value_type))
+    insert = _create_table(conn, table, columns, types)
+    count = 0
+    for batch in parquet.iter_batches(batch_size=chunk_size):
+        arrays = []
+        for array, kind in zip(batch.columns, types):
+            if pa.types.is_dictionary(array.type):
+                array = array.dictionary_decode()
+            if pa.types.is_decimal(array.type):
+                array = array.cast(pa.float64())
+            elif pa.types.is_nested(array.type):
+                arrays.append([None if value is None else json.dumps(value, default=str)
+                               for value in array.to_pylist()])
+                continue
+            elif kind == "TEXT" and not (pa.types.is_string(array.type) or pa.types.is_large_string(array.type)):
+                array = array.cast(pa.string())  # dates and timestamps as ISO text
+            arrays.append(array.to_pylist())
+        conn.executemany(insert, zip(*arrays))
+        count += batch.num_rows
+    return count
+
+
+LOADERS = {".csv": load_csv, ".tsv": load_csv, ".txt": load_csv, ".parquet": load_parquet, ".pq": load_parquet}
+
+
+class Dataset:
+    """One loaded sandbox: ``table`` in ``path``, ``rows`` rows, ``bytes`` on disk"""
+
+    def __init__(self, digest, table, source_name, rows, columns, size, loaded_at, last_used):
+        self.digest = digest
+        self.table = table
+        self.source_name = source_name
+        self.rows = rows
+        self.columns = columns
+        self.bytes = size
+        self.loaded_at = loaded_at
+        self.last_used = last_used
+        self.path = None
+        self.from_cache = False
+
+    @property
+    def schema_name(self):
+        return SCHEMA_PREFIX + self.digest[:16]
+
+    def to_dict(self):
+        return {"table": self.table, "source_name": self.source_name, "rows": self.rows,
+                "columns": self.columns, "bytes": self.bytes, "loaded_at": self.loaded_at,
+                "last_used": self.last_used}
+
+
+class SandboxStore:
+    """Content-addressed dataset sandboxes under ``root``, bounded by ``max_bytes`` in total.
+
+    ``schemas`` (a SchemaRegistry) gets each dataset registered on load and
+    removed on eviction. ``from_cache`` on the returned Dataset tells whether
+    the upload was already loaded. ``reserved`` are the table names of the
+    base database datasets are attached to; an upload named like one of them
+    gets an ``_upload`` suffix, since the base table would otherwise hide it.
+    """
+
+    def __init__(self, root=DEFAULT_ROOT, max_bytes=512 * 1024 * 1024, schemas=None, chunk_size=10000,
+                 reserved=()):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.schemas = schemas
+        self.chunk_size = chunk_size
+        self.reserved = frozenset(name.lower() for name in reserved)
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._loading = {}
+        os.makedirs(root, exist_ok=True)
+        self._manifest_path = os.path.join(root, "manifest.json")
+        self._datasets = {}
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path, encoding="utf-8") as f:
+                for digest, entry in json.load(f).items():
+                    dataset = self._dataset(digest, entry)
+                    if not os.path.exists(dataset.path):
+                        continue
+                    if dataset.table in self.reserved:
+                        os.remove(dataset.path)  # loaded under a name that is now taken; reloaded on upload
+                        continue
+                    self._datasets[digest] = dataset
+        if schemas is not None:
+            registered = set(schemas.names())
+            for dataset in self._datasets.values():
+                if dataset.schema_name not in registered:
+                    schemas.register_sqlite(dataset.schema_name, dataset.path)
+
+    def _dataset(self, digest, entry):
+        dataset = Dataset(digest, entry["table"], entry["source_name"], entry["rows"], entry["columns"],
+                          entry["bytes"], entry["loaded_at"], entry["last_used"])
+        dataset.path = os.path.join(self.root, f"{digest}.db")
+        return dataset
+
+    def _save_manifest(self):
+        temporary = self._manifest_path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump({digest: dataset.to_dict() for digest, dataset in self._datasets.items()}, f)
+        os.replace(temporary, self._manifest_path)
+
+    def __len__(self):
+        return len(self._datasets)
+
+    @property
+    def total_bytes(self):
+        return sum(dataset.bytes for dataset in self._datasets.values())
+
+    def datasets(self):
+        """Every loaded dataset, most recently used first"""
+        with self._lock:
+            return sorted(self._datasets.values(), key=lambda dataset: dataset.last_used, reverse=True)
+
+    def get(self, digest):
+        """The Dataset for ``digest`` (marked as used), or None once evicted"""
+        with self._lock:
+            dataset = self._datasets.get(digest)
+            if dataset is not None:
+                dataset.last_used = time.time()
+            return dataset
+
+    def load(self, source, name=None):
+        """Load a CSV/Parquet path or uploaded file (``name`` picks the loader and table name).
+
+        Returns the Dataset, with ``from_cache`` set when the same bytes were loaded before.
+        """
+        name = name or getattr(source, "name", None) or os.fspath(source)
+        extension = os.path.splitext(name)[1].lower()
+        loader = LOADERS.get(extension)
+        if loader is None:
+            raise ValueError(f"Unsupported file type {extension or name!r}; use CSV or Parquet.")
+        digest = content_hash(source)
+        while True:
+            with self._lock:
+                dataset = self._datasets.get(digest)
+                if dataset is not None:
+                    dataset.last_used = time.time()
+                    dataset.from_cache = True
+                    return dataset
+                pending = self._loading.get(digest)
+                if pending is None:
+                    pending = self._loading[digest] = threading.Event()
+                    break
+            pending.wait()  # the same file is being loaded by another session
+
+        try:
+            dataset = self._load(digest, loader, source, name)
+        finally:
+            with self._lock:
+                self._loading.pop(digest).set()
+        dataset.from_cache = False
+        return dataset
+
+    def _load(self, digest, loader, source, name):
+        table = identifier(os.path.splitext(os.path.basename(name))[0])
+        if table in self.reserved:
+            table += "_upload"
+        path = os.path.join(self.root, f"{digest}.db")
+        temporary = path + ".tmp"
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        conn = sqlite3.connect(temporary)
+        try:
+            # A scratch file until the rename below: no journal, no fsync
+            conn.execute("PRAGMA journal_mode=OFF")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute("BEGIN")
+            rows = loader(conn, table, source, chunk_size=self.chunk_size)
+            conn.commit()
+            conn.execute("ANALYZE")  # row counts in sqlite_stat1 for query-plan analysis
+            columns = [[column, kind] for _, column, kind, *_ in conn.execute(f"PRAGMA table_info({_quote(table)})")]
+        except Exception:
+            conn.close()
+            os.remove(temporary)
+            raise
+        conn.close()
+        os.replace(temporary, path)
+
+        now = time.time()
+        dataset = self._dataset(digest, {"table": table, "source_name": os.path.basename(name), "rows": rows,
+                                         "columns": columns, "bytes": os.path.getsize(path),
+                                         "loaded_at": now, "last_used": now})
+        with self._lock:
+            self._datasets[digest] = dataset
+            evicted = self._evict(keep=digest)
+            self._save_manifest()
+        if self.schemas is not None:
+            for old in evicted:
+                self.schemas.remove(old.schema_name)
+            self.schemas.register_sqlite(dataset.schema_name, path)
+        return dataset
+
+    def _evict(self, keep=None):
+        evicted = []
+        total = self.total_bytes
+        for dataset in sorted(self._datasets.values(), key=lambda dataset: dataset.last_used):
+            if total <= self.max_bytes:
+                break
+            if dataset.digest == keep:
+                continue
+            del self._datasets[dataset.digest]
+            os.remove(dataset.path)
+            total -= dataset.bytes
+            self.evictions += 1
+            evicted.append(dataset)
+        return evicted
+
+    def remove(self, digest):
+        with self._lock:
+            dataset = self._datasets.pop(digest, None)
+            if dataset is None:
+                return
+            os.remove(dataset.path)
+            self._save_manifest()
+        if self.schemas is not None:
+            self.schemas.remove(dataset.schema_name)
+
+    def connect(self, digests, base=None):
+        """Connection with the given datasets attached read-only (on ``base()`` if given).
+
+        Tables are queried by their plain names; evicted datasets are skipped.
+        Raises ValueError when a dataset's table name is already taken, by the
+        base or by an earlier dataset, as it would be hidden behind that table.
+        """
+        conn = base() if base is not None else sqlite3.connect(":memory:", check_same_thread=False)
+        tables = {name.lower() for name, in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'view')")}
+        now = time.time()
+        with self._lock:
+            # Under the lock so eviction cannot delete a file between the check and ATTACH
+            for i, digest in enumerate(digests[:MAX_ATTACHED]):
+                dataset = self._datasets.get(digest)
+                if dataset is None:
+                    continue
+                if dataset.table in tables:
+                    conn.close()
+                    raise ValueError(f"Dataset {dataset.source_name!r}: a table named {dataset.table!r} "
+                                     "already exists")
+                tables.add(dataset.table)
+                dataset.last_used = now
+                conn.execute(f"ATTACH DATABASE ? AS ds{i}", (os.path.abspath(dataset.path),))
+        conn.execute("PRAGMA query_only=ON")
+        return conn
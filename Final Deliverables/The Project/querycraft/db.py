@@ -0,0 +1,451 @@
+# querycraft/db.py
+"""Schema helpers for querycraft.db.
+
+Conversions are stored normalized. Every distinct question and SQL body is
+kept once, in ``query_texts`` and ``query_sql``, keyed by a content hash;
+SQL bodies are zlib-compressed when that makes them smaller. Each
+conversion is a thin ``query_events`` row pointing at both; when several
+candidates were generated (querycraft.voting), each one is a
+``query_candidates`` row under that event. ``queries`` is a view with the
+original columns, and INSTEAD OF triggers let code keep inserting, updating
+and deleting through it.
+
+The view and triggers call the ``qc_*`` SQL functions, so every connection
+that touches them must go through :func:`register_functions` first
+(``ConnectionPool`` and :func:`ensure_queries_table` do this). Other
+clients can still read the tables: ``query_texts.body`` is plain text and
+``query_sql.body`` is TEXT or a zlib stream.
+
+Databases in an older layout are rewritten by a one-off maintenance step,
+never on the request path::
+
+    python -m querycraft.db querycraft.db
+"""
+import argparse
+import hashlib
+import json
+import sqlite3
+import zlib
+
+from querycraft.streaming import strip_preamble
+
+# Columns of the pre-normalization ``queries`` table added after it was first created
+QUERIES_EXTRA_COLUMNS = {
+    "ttft_ms": "REAL",
+    "latency_ms": "REAL",
+    "accepted": "INTEGER NOT NULL DEFAULT 0",
+    "user_id": "TEXT",
+    "session_id": "TEXT",
+}
+
+QUERY_STORE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS query_texts (
+        id INTEGER PRIMARY KEY,
+        hash BLOB NOT NULL UNIQUE,
+        body TEXT NOT NULL
+    );
+    -- body is zlib-compressed UTF-8 (BLOB), or TEXT when compression would not save space
+    CREATE TABLE IF NOT EXISTS query_sql (
+        id INTEGER PRIMARY KEY,
+        hash BLOB NOT NULL UNIQUE,
+        body NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS query_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        question_id INTEGER NOT NULL REFERENCES query_texts (id),
+        sql_id INTEGER NOT NULL REFERENCES query_sql (id),
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        ttft_ms REAL,
+        latency_ms REAL,
+        accepted INTEGER NOT NULL DEFAULT 0,
+        user_id TEXT,
+        session_id TEXT
+    );
+    -- outcome: ok / invalid / error / timeout / failed; signature hashes the rows the SQL returned
+    CREATE TABLE IF NOT EXISTS query_candidates (
+        query_id INTEGER NOT NULL REFERENCES query_events (id),
+        idx INTEGER NOT NULL,
+        sql_id INTEGER REFERENCES query_sql (id),
+        variant TEXT NOT NULL,
+        temperature REAL,
+        latency_ms REAL,
+        exec_ms REAL,
+        outcome TEXT NOT NULL,
+        signature TEXT,
+        cluster_size INTEGER NOT NULL DEFAULT 0,
+        chosen INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (query_id, idx)
+    ) WITHOUT ROWID;
+    CREATE TRIGGER IF NOT EXISTS query_events_candidates AFTER DELETE ON query_events BEGIN
+        DELETE FROM query_candidates WHERE query_id = OLD.id;
+    END;
+    CREATE VIEW IF NOT EXISTS queries AS
+        SELECT e.id, t.body AS input_text, qc_unpack(s.body) AS sql_generated, e.created_at,
+               e.ttft_ms, e.latency_ms, e.accepted, e.user_id, e.session_id
+        FROM query_events e
+        JOIN query_texts t ON t.id = e.question_id
+        JOIN query_sql s ON s.id = e.sql_id;
+"""
+
+# History is browsed newest-first by id (keyset pagination), optionally per user/session
+QUERIES_INDEXES = {
+    "idx_query_events_created_at": "query_events (created_at)",
+    "idx_query_events_user": "query_events (user_id, id)",
+    "idx_query_events_session": "query_events (session_id, id)",
+    "idx_query_events_accepted": "query_events (id) WHERE accepted = 1",
+    "idx_query_events_question": "query_events (question_id)",
+    "idx_query_events_sql": "query_events (sql_id)",
+    "idx_query_candidates_sql": "query_candidates (sql_id)",
+}
+
+# External-content FTS5 index over the ``queries`` view, kept in sync by its triggers
+QUERIES_FTS = """
+    CREATE VIRTUAL TABLE queries_fts USING fts5(
+        input_text, sql_generated, content='queries', content_rowid='id', tokenize='porter unicode61'
+    )
+"""
+
+_INTERN_TEXTS = """
+        INSERT OR IGNORE INTO query_texts (hash, body) VALUES (qc_hash(NEW.input_text), NEW.input_text);
+        INSERT OR IGNORE INTO query_sql (hash, body)
+        VALUES (qc_hash(qc_clean(NEW.sql_generated)), qc_pack(qc_clean(NEW.sql_generated)));"""
+_QUESTION_ID = "(SELECT id FROM query_texts WHERE hash = qc_hash(NEW.input_text))"
+_SQL_ID = "(SELECT id FROM query_sql WHERE hash = qc_hash(qc_clean(NEW.sql_generated)))"
+_FTS_DELETE = """
+        INSERT INTO queries_fts (queries_fts, rowid, input_text, sql_generated)
+        VALUES ('delete', OLD.id, OLD.input_text, OLD.sql_generated);"""
+_FTS_INSERT = """
+        INSERT INTO queries_fts (rowid, input_text, sql_generated)
+        VALUES ({rowid}, NEW.input_text, qc_clean(NEW.sql_generated));"""
+
+
+def _view_triggers(fts):
+    return f"""
+    CREATE TRIGGER IF NOT EXISTS queries_insert INSTEAD OF INSERT ON queries BEGIN{_INTERN_TEXTS}
+        INSERT INTO query_events (id, question_id, sql_id, created_at, ttft_ms, latency_ms, accepted,
+                                  user_id, session_id)
+        VALUES (NEW.id, {_QUESTION_ID}, {_SQL_ID}, COALESCE(NEW.created_at, CURRENT_TIMESTAMP),
+                NEW.ttft_ms, NEW.latency_ms, COALESCE(NEW.accepted, 0), NEW.user_id, NEW.session_id);
+        {_FTS_INSERT.format(rowid="last_insert_rowid()") if fts else ""}
+    END;
+    CREATE TRIGGER IF NOT EXISTS queries_update INSTEAD OF UPDATE ON queries BEGIN{_INTERN_TEXTS}
+        {_FTS_DELETE if fts else ""}
+        UPDATE query_events
+        SET question_id = {_QUESTION_ID}, sql_id = {_SQL_ID}, created_at = NEW.created_at,
+            ttft_ms = NEW.ttft_ms, latency_ms = NEW.latency_ms, accepted = NEW.accepted,
+            user_id = NEW.user_id, session_id = NEW.session_id
+        WHERE id = OLD.id;
+        {_FTS_INSERT.format(rowid="OLD.id") if fts else ""}
+    END;
+    CREATE TRIGGER IF NOT EXISTS queries_delete INSTEAD OF DELETE ON queries BEGIN
+        {_FTS_DELETE if fts else ""}
+        DELETE FROM query_events WHERE id = OLD.id;
+    END;
+"""
+
+
+def content_hash(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def clean_sql(text):
+    """The SQL as stored: without the "SQL Query:" preamble and fences the prompt asks for"""
+    return strip_preamble(text)
+
+
+def pack_sql(text):
+    raw = text.encode("utf-8")
+    packed = zlib.compress(raw, 9)
+    return packed if len(packed) < len(raw) else text
+
+
+def unpack_sql(body):
+    return zlib.decompress(body).decode("utf-8") if isinstance(body, bytes) else body
+
+
+def register_functions(conn):
+    """Register the ``qc_*`` SQL functions used by the ``queries`` view and its triggers"""
+    try:
+        conn.execute("SELECT qc_unpack(NULL)").fetchall()
+        return  # already registered; redefining fails while another statement is open
+    except sqlite3.OperationalError:
+        pass
+    conn.create_function("qc_hash", 1, content_hash, deterministic=True)
+    conn.create_function("qc_clean", 1, clean_sql, deterministic=True)
+    conn.create_function("qc_pack", 1, pack_sql, deterministic=True)
+    conn.create_function("qc_unpack", 1, unpack_sql, deterministic=True)
+
+
+class MigrationRequired(RuntimeError):
+    """Raised when querycraft.db holds an older history layout that has not been migrated yet"""
+
+
+def _object_type(conn, name, schema="main"):
+    row = conn.execute(f"SELECT type FROM {schema}.sqlite_master WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else None
+
+
+def _needs_migration(conn):
+    if _object_type(conn, "queries") == "table" or _object_type(conn, "queries_legacy") == "table":
+        return True
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(query_texts)")}
+    return bool(columns) and "hash" not in columns  # plain unique bodies from an earlier layout
+
+
+def ensure_queries_table(conn):
+    """Create the query store, or check that an existing one is in the current layout.
+
+    Cheap enough for the request path: an older layout is not rewritten here
+    but reported with MigrationRequired, see :func:`migrate_query_store`.
+    """
+    register_functions(conn)
+    if conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchall()[0][0] == 0:
+        # Only takes effect before the first table is created
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    if _needs_migration(conn):
+        raise MigrationRequired("The query history is in an older layout; migrate it once with "
+                                "`python -m querycraft.db <path to querycraft.db>`.")
+    _create_store(conn)
+
+
+def _create_store(conn):
+    conn.executescript(QUERY_STORE_SCHEMA)
+    for name, definition in QUERIES_INDEXES.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}")
+    conn.commit()
+    fts = ensure_queries_fts(conn)
+    conn.executescript(_view_triggers(fts))
+    conn.commit()
+
+
+def migrate_query_store(conn, chunk_size=5000, vacuum=True):
+    """Bring an older history layout up to date; a maintenance step, not for the request path.
+
+    The original ``queries`` table is rewritten into the normalized layout in
+    chunks of ``chunk_size`` rows, one transaction per chunk; an interrupted
+    migration resumes where it stopped. Bodies stored as plain unique text
+    get their hash keys back and SQL is compressed. With ``vacuum`` the file
+    ends with a VACUUM that turns on incremental vacuuming, unless it already
+    has it. Returns ``{"migrated", "vacuumed"}``.
+    """
+    register_functions(conn)
+    summary = {"migrated": _needs_migration(conn), "vacuumed": False}
+    if _object_type(conn, "queries") == "table":
+        _detach_legacy_table(conn)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(query_texts)")}
+    if columns and "hash" not in columns:
+        _add_hash_keys(conn)
+    _create_store(conn)
+    if _object_type(conn, "queries_legacy") == "table":
+        _copy_legacy_rows(conn, chunk_size)
+    if vacuum and conn.execute("PRAGMA auto_vacuum").fetchall()[0][0] != 2:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        summary["vacuumed"] = True
+    return summary
+
+
+def _detach_legacy_table(conn):
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(queries)")}
+    for column, column_type in QUERIES_EXTRA_COLUMNS.items():
+        if column not in existing:
+            conn.execute(f"ALTER TABLE queries ADD COLUMN {column} {column_type}")
+    # The old full-text index pointed at the table; it is rebuilt over the view
+    for trigger in ("queries_fts_insert", "queries_fts_delete", "queries_fts_update"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    conn.execute("DROP TABLE IF EXISTS queries_fts")
+    conn.execute("ALTER TABLE queries RENAME TO queries_legacy")
+    conn.commit()
+
+
+def _add_hash_keys(conn):
+    """Rewrite bodies stored as plain unique text by an earlier layout: hash-keyed, SQL compressed"""
+    # The view and triggers are recreated over the new tables
+    for trigger in ("queries_insert", "queries_update", "queries_delete"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    conn.execute("DROP VIEW IF EXISTS queries")
+    for table, pack in (("query_texts", str), ("query_sql", pack_sql)):
+        conn.execute(f"CREATE TABLE {table}_hashed (id INTEGER PRIMARY KEY, hash BLOB NOT NULL UNIQUE,"
+                     f" body NOT NULL)")
+        conn.executemany(f"INSERT INTO {table}_hashed (id, hash, body) VALUES (?, ?, ?)",
+                         ((row_id, content_hash(body), pack(body))
+                          for row_id, body in conn.execute(f"SELECT id, body FROM {table}").fetchall()))
+        conn.execute(f"DROP TABLE {table}")
+        conn.execute(f"ALTER TABLE {table}_hashed RENAME TO {table}")
+    conn.commit()
+
+
+def _copy_legacy_rows(conn, chunk_size):
+    last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM query_events").fetchone()[0]
+    while True:
+        rows = conn.execute(
+            "SELECT id, input_text, sql_generated, created_at, ttft_ms, latency_ms, accepted, user_id, session_id"
+            " FROM queries_legacy WHERE id > ? ORDER BY id LIMIT ?",
+            (last_id, chunk_size),
+        ).fetchall()
+        if not rows:
+            break
+        for query_id, input_text, sql_generated, *event in rows:
+            _store_event(conn, input_text, sql_generated, (query_id, *event))
+        conn.commit()
+        last_id = rows[-1][0]
+    conn.execute("DROP TABLE queries_legacy")
+    conn.commit()
+
+
+def _intern(conn, table, body):
+    digest = content_hash(body)
+    lookup = f"SELECT id FROM {table} WHERE hash = ?"
+    row = conn.execute(lookup, (digest,)).fetchone()
+    if row is not None:
+        return row[0]
+    # Another connection may have stored the same body since the lookup
+    stored = pack_sql(body) if table == "query_sql" else body
+    conn.execute(f"INSERT OR IGNORE INTO {table} (hash, body) VALUES (?, ?)", (digest, stored))
+    return conn.execute(lookup, (digest,)).fetchone()[0]
+
+
+def _store_event(conn, input_text, sql_generated, event):
+    """Insert one event; ``event`` is ``(id, created_at, ttft_ms, latency_ms, accepted, user_id, session_id)``"""
+    sql_generated = clean_sql(sql_generated)
+    question_id = _intern(conn, "query_texts", input_text)
+    sql_id = _intern(conn, "query_sql", sql_generated)
+    query_id, created_at, ttft_ms, latency_ms, accepted, user_id, session_id = event
+    return conn.execute(
+        "INSERT INTO query_events (id, question_id, sql_id, created_at, ttft_ms, latency_ms, accepted,"
+        " user_id, session_id) VALUES (?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), ?, ?, ?, ?, ?)",
+        (query_id, question_id, sql_id, created_at, ttft_ms, latency_ms, accepted or 0, user_id, session_id),
+    ).lastrowid
+
+
+def has_queries_fts(conn):
+    return _object_type(conn, "queries_fts") is not None
+
+
+def ensure_queries_fts(conn):
+    """Create the full-text index; returns False when FTS5 is unavailable.
+
+    A new index over existing history is filled once with FTS5's 'rebuild'.
+    """
+    if not has_queries_fts(conn):
+        try:
+            conn.execute(QUERIES_FTS)
+        except sqlite3.OperationalError:
+            return False
+        conn.execute("INSERT INTO queries_fts (queries_fts) VALUES ('rebuild')")
+        conn.commit()
+    return True
+
+
+def insert_query(conn, input_text, sql_generated, ttft_ms=None, latency_ms=None, user_id=None,
+                 session_id=None):
+    """Record one conversion and return its row id"""
+    query_id = _store_event(conn, input_text, sql_generated,
+                            (None, None, ttft_ms, latency_ms, 0, user_id, session_id))
+    if has_queries_fts(conn):
+        conn.execute(
+            "INSERT INTO queries_fts (rowid, input_text, sql_generated) VALUES (?, ?, ?)",
+            (query_id, input_text, clean_sql(sql_generated)),
+        )
+    conn.commit()
+    return query_id
+
+
+def insert_candidates(conn, query_id, candidates):
+    """Record the voting candidates (querycraft.voting.Candidate) behind conversion ``query_id``"""
+    rows = []
+    for candidate in candidates:
+        sql_id = None
+        if candidate.text is not None:
+            sql_id = _intern(conn, "query_sql", clean_sql(candidate.text))
+        rows.append((query_id, candidate.index, sql_id, candidate.variant, candidate.temperature,
+                     candidate.latency_ms, candidate.exec_ms, candidate.outcome, candidate.signature,
+                     candidate.cluster_size, int(candidate.chosen)))
+    conn.executemany(
+        "INSERT OR REPLACE INTO query_candidates (query_id, idx, sql_id, variant, temperature, latency_ms,"
+        " exec_ms, outcome, signature, cluster_size, chosen) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        rows,
+    )
+    conn.commit()
+
+
+def collect_garbage(conn):
+    """Delete questions and SQL bodies nothing refers to any more; returns the count"""
+    removed = conn.execute(
+        "DELETE FROM query_texts WHERE NOT EXISTS"
+        " (SELECT 1 FROM query_events WHERE question_id = query_texts.id)"
+    ).rowcount
+    removed += conn.execute(
+        "DELETE FROM query_sql WHERE NOT EXISTS (SELECT 1 FROM query_events WHERE sql_id = query_sql.id)"
+        " AND NOT EXISTS (SELECT 1 FROM query_candidates WHERE sql_id = query_sql.id)"
+    ).rowcount
+    conn.commit()
+    return removed
+
+
+def ensure_metrics_table(conn):
+    """Raw per-stage samples written by querycraft.tracing"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS metrics (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            recorded_at REAL NOT NULL,
+            trace_id TEXT,
+            stage TEXT NOT NULL,
+            metric TEXT NOT NULL,
+            value REAL NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_metrics_stage ON metrics (stage, metric, recorded_at)")
+
+
+def ensure_usage_table(conn):
+    """Model calls and tokens per day, user, model and priority, added up by querycraft.quota"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS api_usage (
+            day TEXT NOT NULL,
+            user_id TEXT NOT NULL DEFAULT '',
+            model_name TEXT NOT NULL DEFAULT '',
+            priority TEXT NOT NULL,
+            requests INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            rejected INTEGER NOT NULL DEFAULT 0,
+            input_tokens INTEGER NOT NULL DEFAULT 0,
+            output_tokens INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, user_id, model_name, priority)
+        ) WITHOUT ROWID
+    """)
+
+
+def add_usage(conn, rows):
+    """Add ``(day, user_id, model_name, priority, requests, failed, rejected, input_tokens, output_tokens)`` rows"""
+    conn.executemany("""
+        INSERT INTO api_usage (day, user_id, model_name, priority, requests, failed, rejected, input_tokens,
+                               output_tokens)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (day, user_id, model_name, priority) DO UPDATE SET
+            requests = requests + excluded.requests,
+            failed = failed + excluded.failed,
+            rejected = rejected + excluded.rejected,
+            input_tokens = input_tokens + excluded.input_tokens,
+            output_tokens = output_tokens + excluded.output_tokens
+    """, rows)
+    conn.commit()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migrate QueryCraft history to the current storage layout.")
+    parser.add_argument("db", nargs="?", default="querycraft.db")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--no-vacuum", action="store_true", help="skip the final VACUUM")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        summary = migrate_query_store(conn, args.chunk_size, vacuum=not args.no_vacuum)
+    finally:
+        conn.close()
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
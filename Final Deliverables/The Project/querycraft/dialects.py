@@ -0,0 +1,195 @@
+# querycraft/dialects.py
+"""Local post-processing of generated SQL: extract, parse, check, transpile.
+
+One model answer is parsed into a sqlglot AST, rejected structurally unless
+it is a single read-only query, and rendered for every dialect the README
+promises, so a multi-dialect request costs one model call instead of four.
+sqlglot is imported on first use.
+"""
+import re
+
+from querycraft.execution import UnsafeQueryError
+from querycraft.streaming import strip_preamble
+
+# Display name -> sqlglot dialect
+DIALECTS = {
+    "PostgreSQL": "postgres",
+    "MySQL": "mysql",
+    "SQL Server": "tsql",
+    "SQLite": "sqlite",
+}
+
+# The model writes "standard SQL" (see CONVERTER_TEMPLATE); sqlglot's default dialect reads that
+SOURCE_DIALECT = None
+
+_STATEMENT_START = re.compile(
+    r"^[ \t]*(?:select|with|values|insert|update|delete|merge|replace|upsert|create|drop|alter|"
+    r"truncate|grant|revoke|attach|detach|pragma|vacuum|exec|execute|call|copy)\b(?P<rest>[^\n]*)$",
+    re.IGNORECASE | re.MULTILINE,
+)
+# After the keyword a statement goes on with an identifier, "*", "(" or a new line; a lead-in such as
+# "Select all employees older than 30:" ends in punctuation instead
+_SQL_CONTINUATION = re.compile(r"[ \t]*(?:$|[*(\"`\[]|[A-Za-z_])")
+_FENCED = re.compile(r"```[a-zA-Z]*\n(.*?)```", re.DOTALL)
+# Lines that start an explanation after the query rather than continue it
+_PROSE = re.compile(r"^[ \t]*(?:this|these|the|it|here|note|explanation)\b[^\n]*$", re.IGNORECASE | re.MULTILINE)
+
+
+class InvalidSQLError(ValueError):
+    """Raised when the response holds no parseable SQL statement"""
+
+
+def extract_sql(text):
+    """Pull the SQL statement out of a model response.
+
+    Handles the "SQL Query:" preamble, markdown fences anywhere in the text,
+    leading prose such as "Here is the query:" and an explanation after the
+    first statement's ``;``. A second statement is kept, for parse_sql to refuse.
+    """
+    fenced = _FENCED.search(text)
+    body = fenced.group(1) if fenced else strip_preamble(text)
+    start = _statement_start(body)
+    if start is not None:
+        body = body[start:]
+    end = _statement_end(body)
+    if end is not None and _statement_start(body[end:].lstrip()) != 0:
+        body = body[:end]
+    return body.strip()
+
+
+def _statement_start(text):
+    """Offset of the first line that reads as the start of a SQL statement, or None"""
+    for match in _STATEMENT_START.finditer(text):
+        rest = match.group("rest").rstrip()
+        if _SQL_CONTINUATION.match(rest) and not rest.endswith((":", ".")):
+            return match.start()
+    return None
+
+
+def _statement_end(sql):
+    """Index just past the first ``;`` outside quotes and comments, or None"""
+    i, quote = 0, None
+    while i < len(sql):
+        char = sql[i]
+        if quote is not None:
+            if char == quote:
+                quote = None
+        elif char in "'\"`":
+            quote = char
+        elif char == "[":
+            quote = "]"
+        elif sql.startswith("--", i):
+            newline = sql.find("\n", i)
+            i = len(sql) if newline == -1 else newline
+            continue
+        elif sql.startswith("/*", i):
+            close = sql.find("*/", i + 2)
+            i = len(sql) if close == -1 else close + 2
+            continue
+        elif char == ";":
+            return i + 1
+        i += 1
+    return None
+
+
+def _unsafe_nodes():
+    from sqlglot import exp
+
+    # DML/DDL anywhere in the tree (e.g. a data-modifying CTE), SELECT ... INTO,
+    # and statements sqlglot only understands as opaque commands
+    return (exp.DML, exp.DDL, exp.Into, exp.Command, exp.Pragma, exp.Transaction, exp.Set, exp.Use)
+
+
+def _date_arithmetic(tree):
+    """Rewrite ``<date> +/- INTERVAL ...`` as DATE_ADD so each dialect renders its own form
+
+    sqlglot passes ``CURRENT_DATE - INTERVAL '1' MONTH`` through unchanged, which
+    neither SQL Server nor SQLite accept; as a DateAdd it renders as DATEADD(...)
+    and date(..., '-1 MONTH') respectively.
+    """
+    from sqlglot import exp
+
+    def rewrite(node):
+        if not isinstance(node, (exp.Add, exp.Sub)) or not isinstance(node.expression, exp.Interval):
+            return node
+        interval = node.expression
+        amount = interval.this
+        if interval.unit is None or amount is None:
+            return node
+        if isinstance(amount, exp.Literal) and re.fullmatch(r"-?\d+(?:\.\d+)?", amount.name):
+            value = amount.name
+            if isinstance(node, exp.Sub):
+                value = value[1:] if value.startswith("-") else "-" + value
+            amount = exp.Literal.number(value)
+        elif isinstance(node, exp.Sub):
+            amount = exp.Neg(this=amount.copy())
+        return exp.DateAdd(this=node.this.copy(), expression=amount, unit=interval.unit.copy())
+
+    return tree.transform(rewrite)
+
+
+def parse_sql(sql, dialect=SOURCE_DIALECT):
+    """Parse ``sql`` into exactly one read-only sqlglot expression"""
+    import sqlglot
+    from sqlglot import exp
+    from sqlglot.errors import ParseError, TokenError
+
+    try:
+        statements = [tree for tree in sqlglot.parse(sql, read=dialect) if tree is not None]
+    except ParseError as e:
+        error = e.errors[0] if e.errors else {}
+        where = f" (line {error['line']}, column {error['col']})" if error.get("line") else ""
+        raise InvalidSQLError(f"Could not parse the generated SQL: {error.get('description', e)}{where}") from None
+    except TokenError as e:
+        raise InvalidSQLError(f"Could not parse the generated SQL: {e}") from None
+    if not statements:
+        raise InvalidSQLError("The response does not contain a SQL statement.")
+    if len(statements) > 1:
+        raise UnsafeQueryError("Only a single SELECT statement is allowed.")
+    tree = statements[0]
+    if not isinstance(tree, exp.Query) or tree.find(*_unsafe_nodes()) is not None:
+        raise UnsafeQueryError("Only SELECT queries are allowed for security reasons.")
+    return tree
+
+
+class CheckedQuery:
+    """A parsed, read-only query with per-dialect renderings"""
+
+    def __init__(self, text, dialect=SOURCE_DIALECT):
+        self.sql = extract_sql(text)
+        try:
+            self.tree = parse_sql(self.sql, dialect)
+        except InvalidSQLError:
+            # No ";" before an explanation: retry without it, from the first line that reads as prose
+            prose = _PROSE.search(self.sql, 1)
+            if prose is None:
+                raise
+            self.sql = self.sql[:prose.start()].strip()
+            self.tree = parse_sql(self.sql, dialect)
+        self.tree = _date_arithmetic(self.tree)
+        self._rendered = {}
+
+    def to(self, dialect, pretty=True):
+        """Render for one sqlglot dialect name (``"postgres"``, ``"tsql"``, ...)"""
+        key = (dialect, pretty)
+        if key not in self._rendered:
+            self._rendered[key] = self.tree.sql(dialect=dialect, pretty=pretty)
+        return self._rendered[key]
+
+    def transpile(self, dialects=DIALECTS):
+        """``{display name: SQL}``; a dialect that cannot express the query maps to an error comment
+
+        Each rendering is parsed back with the target dialect, so SQL that only
+        the source dialect understands is reported rather than shown as valid.
+        """
+        import sqlglot
+        from sqlglot.errors import SqlglotError
+
+        rendered = {}
+        for name, dialect in dialects.items():
+            try:
+                rendered[name] = self.to(dialect)
+                sqlglot.parse_one(rendered[name], read=dialect)
+            except SqlglotError as e:
+                rendered[name] = f"-- Could not transpile to {name}: {e}"
+        return rendered
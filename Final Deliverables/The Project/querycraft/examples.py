@@ -0,0 +1,112 @@
+# querycraft/examples.py
+"""Dynamic few-shot example selection from accepted query history.
+
+Accepted NL -> SQL pairs from the ``queries`` table are embedded as hashed
+word + character-trigram vectors in a NumPy matrix. New pairs are appended
+without re-indexing anything else. Each prompt gets only the k most similar
+examples that fit within a token budget, instead of a fixed list.
+
+NumPy is imported on first use so that importing this module stays cheap.
+"""
+import threading
+import zlib
+
+from querycraft.cache import normalize_text
+from querycraft.prompts import DEFAULT_EXAMPLES, estimate_tokens, format_examples
+
+
+def _features(text):
+    normalized = normalize_text(text).lower()
+    padded = f" {normalized} "
+    return normalized.split() + [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def vectorize(text, dim):
+    """L2-normalized hashed n-gram vector with sublinear term frequency"""
+    import numpy as np
+
+    vector = np.zeros(dim, dtype=np.float32)
+    for feature in _features(text):
+        vector[zlib.crc32(feature.encode("utf-8")) % dim] += 1.0
+    np.log1p(vector, out=vector)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class ExampleStore:
+    """In-memory similarity index over accepted ``(question, sql)`` pairs"""
+
+    def __init__(self, dim=1024, seed_examples=DEFAULT_EXAMPLES):
+        self.dim = dim
+        self._examples = []
+        self._positions = {}
+        self._matrix = None
+        self._lock = threading.Lock()
+        self.extend(seed_examples)
+
+    def __len__(self):
+        return len(self._examples)
+
+    def load_accepted(self, conn):
+        """Index every accepted pair already stored in ``queries``"""
+        self.extend(conn.execute(
+            "SELECT input_text, sql_generated FROM queries WHERE accepted = 1 ORDER BY id"
+        ))
+
+    def extend(self, examples):
+        for question, sql in examples:
+            self.add(question, sql)
+
+    def add(self, question, sql):
+        """Insert or replace the example for ``question`` (latest SQL wins)"""
+        import numpy as np
+
+        key = normalize_text(question)
+        vector = vectorize(question, self.dim)
+        with self._lock:
+            position = self._positions.get(key)
+            if position is None:
+                position = len(self._examples)
+                if self._matrix is None:
+                    self._matrix = np.zeros((64, self.dim), dtype=np.float32)
+                elif position == len(self._matrix):
+                    grown = np.zeros((len(self._matrix) * 2, self.dim), dtype=np.float32)
+                    grown[:position] = self._matrix
+                    self._matrix = grown
+                self._examples.append((question, sql))
+                self._positions[key] = position
+            else:
+                self._examples[position] = (question, sql)
+            self._matrix[position] = vector
+
+    def clear(self, seed_examples=DEFAULT_EXAMPLES):
+        with self._lock:
+            self._examples = []
+            self._positions = {}
+            self._matrix = None
+        self.extend(seed_examples)
+
+    def select(self, question, k=3, token_budget=300):
+        """Return up to ``k`` most similar examples whose formatted size fits ``token_budget``"""
+        import numpy as np
+
+        query = vectorize(question, self.dim)
+        with self._lock:
+            count = len(self._examples)
+            if count == 0:
+                return []
+            scores = self._matrix[:count] @ query
+            examples = self._examples
+        candidates = min(count, k * 4)
+        top = np.argpartition(-scores, candidates - 1)[:candidates]
+        selected, used = [], 0
+        for position in top[np.argsort(-scores[top])]:
+            example = examples[position]
+            cost = estimate_tokens(format_examples([example]))
+            if used + cost > token_budget:
+                continue
+            selected.append(example)
+            used += cost
+            if len(selected) == k:
+                break
+        return selected
@@ -0,0 +1,210 @@
+# querycraft/execution.py
+"""Running generated SQL against the demo database, within limits.
+
+A generated cross join or an unbounded SELECT must not hang the Streamlit
+worker or exhaust its memory, so every run is bounded:
+
+- wall-clock: SQLite's progress handler interrupts the statement once the
+  deadline passes, including while it is still computing its first row;
+- size: rows are pulled with ``fetchmany`` and the run stops at a row or
+  byte cap, marking the result as truncated instead of materializing it all;
+- shape: results are kept as columnar page chunks, and only the page being
+  shown is turned into a DataFrame;
+- threads: QueryExecutor runs queries on a small worker pool, each on a
+  fresh connection, so the caller can give up and interrupt a stuck query.
+"""
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+
+class UnsafeQueryError(ValueError):
+    """Raised for statements other than SELECT"""
+
+
+class QueryTimeout(TimeoutError):
+    """The query ran past its deadline and was interrupted"""
+
+
+class QueryQueueTimeout(QueryTimeout):
+    """The query never started: every worker stayed busy for the queue wait limit"""
+
+
+class ExecutionLimits:
+    """Per-query budget: ``timeout_s`` of wall-clock, at most ``max_rows`` / ``max_bytes`` kept.
+
+    ``page_size`` rows are fetched (and later rendered) at a time. The
+    deadline is checked every ``check_every`` SQLite VM instructions.
+    """
+
+    def __init__(self, timeout_s=2.0, max_rows=10000, max_bytes=8 * 1024 * 1024, page_size=200,
+                 check_every=1000):
+        self.timeout_s = timeout_s
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.page_size = page_size
+        self.check_every = check_every
+
+
+DEFAULT_LIMITS = ExecutionLimits()
+
+
+def _row_bytes(row):
+    size = 0
+    for value in row:
+        if isinstance(value, str):
+            size += len(value.encode("utf-8"))
+        elif isinstance(value, bytes):
+            size += len(value)
+        else:
+            size += 8
+    return size
+
+
+class ResultSet:
+    """Query output as columnar pages: ``pages[i]`` maps column name -> list of values.
+
+    ``truncated`` is None, "rows" or "bytes" when a cap cut the result short.
+    """
+
+    def __init__(self, columns, page_size):
+        self.columns = columns
+        self.page_size = page_size
+        self.pages = []
+        self.row_count = 0
+        self.bytes = 0
+        self.truncated = None
+        self.elapsed_ms = None
+
+    def __len__(self):
+        return self.row_count
+
+    @property
+    def page_count(self):
+        return len(self.pages)
+
+    def _append(self, rows):
+        self.pages.append({column: list(values) for column, values in zip(self.columns, zip(*rows))})
+        self.row_count += len(rows)
+
+    def page(self, index):
+        """DataFrame of page ``index`` (0-based)"""
+        import pandas as pd
+
+        if not self.pages:
+            return pd.DataFrame(columns=self.columns)
+        return pd.DataFrame(self.pages[index], columns=self.columns)
+
+    def to_frame(self):
+        """Every kept row as one DataFrame"""
+        import pandas as pd
+
+        merged = {column: [value for page in self.pages for value in page[column]] for column in self.columns}
+        return pd.DataFrame(merged, columns=self.columns)
+
+
+def execute_query(conn, sql, limits=DEFAULT_LIMITS):
+    """Run a read-only query on ``conn`` within ``limits`` and return a ResultSet.
+
+    ``sql`` is a model response or a ``CheckedQuery``; it is validated
+    structurally and run as its SQLite rendering. Raises QueryTimeout when
+    the deadline passes.
+    """
+    from querycraft.dialects import CheckedQuery
+
+    checked = sql if isinstance(sql, CheckedQuery) else CheckedQuery(sql)
+    started = time.monotonic()
+    deadline = started + limits.timeout_s
+    conn.set_progress_handler(lambda: time.monotonic() > deadline, limits.check_every)
+    cursor = None
+    try:
+        cursor = conn.execute(checked.to("sqlite", pretty=False))
+        result = ResultSet([description[0] for description in cursor.description or ()], limits.page_size)
+        while result.truncated is None:
+            rows = cursor.fetchmany(limits.page_size)
+            if not rows:
+                break
+            kept = []
+            for row in rows:
+                if result.row_count + len(kept) >= limits.max_rows:
+                    result.truncated = "rows"
+                    break
+                size = _row_bytes(row)
+                if result.bytes + size > limits.max_bytes:
+                    result.truncated = "bytes"
+                    break
+                result.bytes += size
+                kept.append(row)
+            if kept:
+                result._append(kept)
+    except sqlite3.OperationalError as e:
+        if "interrupt" in str(e):
+            raise QueryTimeout(f"Query stopped after {limits.timeout_s:g}s (time limit).") from None
+        raise
+    finally:
+        if cursor is not None:
+            cursor.close()
+        conn.set_progress_handler(None, 0)
+    result.elapsed_ms = (time.monotonic() - started) * 1000
+    return result
+
+
+def run_demo_query(demo_conn, sql, limits=DEFAULT_LIMITS):
+    """Execute a read-only query on ``demo_conn`` and return the (capped) result as a DataFrame"""
+    return execute_query(demo_conn, sql, limits).to_frame()
+
+
+class QueryExecutor:
+    """Runs :func:`execute_query` on a worker pool, each query on its own ``connect()``.
+
+    A query waits up to ``queue_timeout_s`` for a free worker, then gives up
+    with QueryQueueTimeout. Once it starts, the caller waits at most its
+    timeout plus ``grace_s``; a worker that is still busy then (stuck
+    outside the SQLite VM) is interrupted. ``run``/``submit`` take their own
+    ``connect`` for per-session databases.
+    """
+
+    def __init__(self, connect, max_workers=2, limits=DEFAULT_LIMITS, grace_s=1.0, queue_timeout_s=10.0):
+        self.connect = connect
+        self.limits = limits
+        self.grace_s = grace_s
+        self.queue_timeout_s = queue_timeout_s
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="querycraft-exec")
+        self._running = {}
+        self._lock = threading.Lock()
+
+    def _run(self, token, sql, limits, connect):
+        token.set()  # started: run() measures the time limit from here
+        conn = connect()
+        with self._lock:
+            self._running[token] = conn
+        try:
+            return execute_query(conn, sql, limits)
+        finally:
+            with self._lock:
+                self._running.pop(token, None)
+            conn.close()
+
+    def submit(self, sql, limits=None, connect=None):
+        token = threading.Event()
+        return token, self._executor.submit(self._run, token, sql, limits or self.limits, connect or self.connect)
+
+    def run(self, sql, limits=None, connect=None):
+        limits = limits or self.limits
+        token, future = self.submit(sql, limits, connect)
+        if not token.wait(self.queue_timeout_s) and future.cancel():
+            raise QueryQueueTimeout(f"Query not started: the query runners were busy for {self.queue_timeout_s:g}s.")
+        try:
+            return future.result(timeout=limits.timeout_s + self.grace_s)
+        except FutureTimeout:
+            with self._lock:
+                conn = self._running.get(token)
+            if conn is not None:
+                conn.interrupt()
+            future.cancel()
+            raise QueryTimeout(f"Query stopped after {limits.timeout_s:g}s (time limit).") from None
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,51 @@
+# querycraft/fallback.py
+"""Conversion path of the Team Lead app: rule-based fast path, cached model call, local fallback."""
+from querycraft.prompts import (
+    TEAM_LEAD_GENERATION_CONFIG,
+    TEAM_LEAD_TEMPLATE,
+    TEAM_LEAD_TEMPLATE_VERSION,
+)
+from querycraft.rules import demo_engine
+
+
+def generate_fallback_query(input_text, rules=None):
+    """Generate a basic SQL query when API fails"""
+    sql = (rules or demo_engine()).convert(input_text, strict=False)
+    if sql is None:
+        sql = "-- No table or column in the request matched the known schema"
+    return f"""-- Generated fallback query
+{sql}
+-- Original request: {input_text[:200]}..."""
+
+
+def convert_with_fallback(model, cache, input_text, model_name, bypass_cache=False, rules=None,
+                          scheduler=None, user_id=None):
+    """Answer simple requests with ``rules``, otherwise ask the model (through ``cache``).
+
+    On API errors, or when ``scheduler`` (quota.QuotaScheduler) has no budget
+    left for ``user_id``, the rule engine's best-effort query is returned instead.
+    Only successful API answers are cached; the fallback never is.
+    """
+    rules = rules or demo_engine()
+    sql = rules.convert(input_text)
+    if sql is not None:
+        return sql
+
+    if not model:
+        return "Error: Model not initialized properly"
+
+    if scheduler is not None:
+        model = scheduler.bind(model, user_id, model_name=model_name)
+    prompt = TEAM_LEAD_TEMPLATE.format(query_text=input_text)
+    try:
+        response, _ = cache.get_or_compute(
+            input_text,
+            lambda: model.generate_content(prompt, generation_config=TEAM_LEAD_GENERATION_CONFIG).text,
+            model_name=model_name,
+            template_ver=TEAM_LEAD_TEMPLATE_VERSION,
+            generation_config=TEAM_LEAD_GENERATION_CONFIG,
+            bypass=bypass_cache,
+        )
+        return response
+    except Exception as e:
+        return f"API Error: {str(e)}\n\nHere's a suggested query:\n{generate_fallback_query(input_text, rules)}"
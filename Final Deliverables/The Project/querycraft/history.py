@@ -0,0 +1,157 @@
+# querycraft/history.py
+"""Saved conversions in the ``queries`` table.
+
+History is browsed newest-first with keyset pagination: a page is "the next
+``limit`` rows with an id below the cursor", answered from the rowid or from
+the ``(user_id, id)`` / ``(session_id, id)`` indexes, so the cost of a page
+does not grow with the table. Search goes through the ``queries_fts`` FTS5
+index, walked in rowid order the same way.
+"""
+import re
+
+from querycraft.db import collect_garbage, ensure_queries_table, has_queries_fts, insert_candidates, insert_query
+
+_SEARCH_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+def fts_query(text):
+    """Turn free text into an FTS5 query in which every word must match.
+
+    Words are matched whole after Porter stemming ("salaries" finds "salary").
+    Prefix queries are avoided: they expand to every indexed term with that
+    prefix, and their cost grows with the table.
+    """
+    return " ".join(f'"{term}"' for term in _SEARCH_TERM.findall(text))
+
+
+class HistoryPage:
+    """One page of ``(id, input_text, sql_generated, created_at)`` rows, newest first.
+
+    ``next_cursor`` is passed as ``before`` to get the following page; None on the last page.
+    """
+
+    def __init__(self, rows, next_cursor):
+        self.rows = rows
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+
+class HistoryStore:
+    """Reads and writes conversion history through a ConnectionPool"""
+
+    def __init__(self, pool):
+        self.pool = pool
+        with pool.connection() as conn:
+            ensure_queries_table(conn)
+            self.searchable = has_queries_fts(conn)
+
+    def record(self, input_text, sql_generated, ttft_ms=None, latency_ms=None, user_id=None, session_id=None):
+        with self.pool.connection() as conn:
+            return insert_query(conn, input_text, sql_generated, ttft_ms, latency_ms, user_id, session_id)
+
+    def record_candidates(self, query_id, candidates):
+        with self.pool.connection() as conn:
+            insert_candidates(conn, query_id, candidates)
+
+    def candidate_stats(self):
+        """Per candidate count N: how often voting agreed, and what it cost.
+
+        Rows are ``(n, queries, agreement, first_agrees, failure_rate, generate_ms, exec_ms)``:
+        the chosen cluster's share of the N candidates, how often the first
+        (baseline) candidate alone would have given the chosen result, the
+        share of candidates that failed or did not run, the slowest model
+        call (the wall time of a parallel round) and the chosen run's time.
+        When ``first_agrees`` stays near 1 for some N, fewer candidates do.
+        """
+        with self.pool.connection() as conn:
+            return conn.execute("""
+                SELECT n, COUNT(*), AVG(1.0 * agreed / n), AVG(first_agrees), AVG(1.0 * failed / n),
+                       AVG(generate_ms), AVG(exec_ms)
+                FROM (
+                    SELECT COUNT(*) AS n,
+                           MAX(CASE WHEN chosen = 1 THEN cluster_size END) AS agreed,
+                           MAX(CASE WHEN idx = 0 THEN signature END)
+                               IS MAX(CASE WHEN chosen = 1 THEN signature END) AS first_agrees,
+                           SUM(outcome != 'ok') AS failed,
+                           MAX(latency_ms) AS generate_ms,
+                           MAX(CASE WHEN chosen = 1 THEN exec_ms END) AS exec_ms
+                    FROM query_candidates GROUP BY query_id
+                )
+                GROUP BY n ORDER BY n
+            """).fetchall()
+
+    @staticmethod
+    def _scope(user_id, session_id, prefix="q."):
+        clauses, params = [], []
+        if user_id is not None:
+            clauses.append(f"{prefix}user_id = ?")
+            params.append(user_id)
+        if session_id is not None:
+            clauses.append(f"{prefix}session_id = ?")
+            params.append(session_id)
+        return clauses, params
+
+    def page(self, limit=5, before=None, user_id=None, session_id=None, search=None):
+        """Newest conversions with an id below ``before``, optionally full-text filtered"""
+        clauses, params = self._scope(user_id, session_id)
+        match = fts_query(search) if search else ""
+        if match and self.searchable:
+            source = "queries_fts JOIN queries q ON q.id = queries_fts.rowid"
+            clauses.insert(0, "queries_fts MATCH ?")
+            params.insert(0, match)
+            key = "queries_fts.rowid"
+        else:
+            source = "queries q"
+            key = "q.id"
+            if search:
+                # No FTS5 in this SQLite build: substring match, still paged by id
+                clauses.append("(q.input_text LIKE ? OR q.sql_generated LIKE ?)")
+                params += [f"%{search}%"] * 2
+        if before is not None:
+            clauses.append(f"{key} < ?")
+            params.append(before)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                f"SELECT q.id, q.input_text, q.sql_generated, q.created_at FROM {source} {where}"
+                f" ORDER BY {key} DESC LIMIT ?",
+                params + [limit + 1],
+            ).fetchall()
+        next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+        return HistoryPage(rows[:limit], next_cursor)
+
+    def accept(self, query_id):
+        """Mark a conversion as a good answer, reusable as a few-shot example"""
+        with self.pool.connection() as conn:
+            conn.execute("UPDATE query_events SET accepted = 1 WHERE id = ?", (query_id,))
+            conn.commit()
+
+    def accepted_examples(self):
+        with self.pool.connection() as conn:
+            return conn.execute(
+                "SELECT input_text, sql_generated FROM queries WHERE accepted = 1 ORDER BY id"
+            ).fetchall()
+
+    def clear(self, user_id=None, session_id=None):
+        """Delete all history, or only one user's / session's; returns how many accepted conversions went"""
+        clauses, params = self._scope(user_id, session_id, prefix="")
+        with self.pool.connection() as conn:
+            accepted = conn.execute(
+                f"SELECT COUNT(*) FROM query_events WHERE {' AND '.join(['accepted = 1', *clauses])}", params
+            ).fetchone()[0]
+            if clauses:
+                # Through the view, so its triggers keep the full-text index in sync
+                conn.execute(f"DELETE FROM queries WHERE {' AND '.join(clauses)}", params)
+                conn.commit()
+            else:
+                conn.execute("DELETE FROM query_events")
+                if self.searchable:
+                    conn.execute("INSERT INTO queries_fts (queries_fts) VALUES ('delete-all')")
+                conn.commit()
+            collect_garbage(conn)
+        return accepted
@@ -0,0 +1,304 @@
+# querycraft/pipeline.py
+"""The Converter page's conversion pipeline, usable without Streamlit.
+
+rule-based fast path -> prompt build (schema + few-shot examples) -> cached,
+optionally streamed model call -> history insert, each stage traced. When
+the model call fails, the rule engine's best-effort query is used instead.
+With ``candidates`` > 1 the model call is several parallel calls settled by
+execution-based voting (querycraft.voting). Within a Conversation, follow-up
+questions are sent as a short refinement of the previous SQL. With a
+QuotaScheduler, model calls are budgeted per user; when the budget runs out
+the answer comes from the cache or the rule engine.
+"""
+import time
+import weakref
+
+from querycraft.cache import make_key, template_version
+from querycraft.dialects import CheckedQuery
+from querycraft.prompts import (CONVERTER_TEMPLATE, build_prompt, build_refine_prompt, estimate_tokens,
+                                prompt_version)
+from querycraft.quota import QuotaExceeded
+from querycraft.rules import RuleEngine
+from querycraft.schema import format_tables
+from querycraft.streaming import StreamedResponse, final_sql
+from querycraft.tracing import Tracer
+from querycraft.voting import CandidateSelector
+
+
+class ConversionResult:
+    """``source`` is "rules", "cache", "model" or "fallback" (rules after a failed model call).
+
+    ``candidates`` holds the voting candidates (querycraft.voting.Candidate) when there were several.
+    """
+
+    def __init__(self, question, sql, query_id=None, from_cache=False, ttft_ms=None, latency_ms=None,
+                 schema_tables=(), prompt_tokens=0, source="model", error=None, candidates=()):
+        self.question = question
+        self.sql = sql
+        self.query_id = query_id
+        self.from_cache = from_cache
+        self.ttft_ms = ttft_ms
+        self.latency_ms = latency_ms
+        self.schema_tables = list(schema_tables)
+        self.prompt_tokens = prompt_tokens
+        self.source = source
+        self.error = error
+        self.candidates = list(candidates)
+
+
+class Conversation:
+    """One multi-turn refinement thread, e.g. kept in ``st.session_state``.
+
+    ``turns`` are the ``(question, sql)`` pairs answered so far. ``prefix`` is
+    the first turn's full prompt, which a context cache can keep on the
+    provider's side for the follow-ups.
+    """
+
+    def __init__(self, turns=(), prefix=None):
+        self.turns = list(turns)
+        self.prefix = prefix
+
+    def __len__(self):
+        return len(self.turns)
+
+    def add(self, question, sql, prompt=None):
+        if not self.turns:
+            self.prefix = prompt
+        self.turns.append((question, sql))
+
+
+class Converter:
+    """Natural language -> SQL with every optional collaborator left pluggable.
+
+    ``cache``, ``history``, ``examples`` (ExampleStore) and ``schemas``
+    (SchemaRegistry) may each be None to skip that step. ``schema_target``
+    names one registered schema or is a list of them (e.g. a session's
+    uploaded datasets), retrieved from as one. ``rules`` is the
+    RuleEngine for questions without a target schema; registered schemas get
+    their own engine. ``fast_path=False`` always asks the model. ``deadline``
+    (seconds) is passed to the model as ``request_options={"timeout": ...}``;
+    a routing.Router spreads it over its hedges and failovers. ``candidates``
+    is the default number of answers to generate and vote on (1: no voting).
+    ``context_cache`` (e.g. client.GeminiContextCache) returns a model with a
+    conversation's first prompt cached provider-side, or None; follow-ups then
+    leave the schema out. ``refine_schema_k`` extra tables are retrieved for a follow-up.
+    ``scheduler`` (quota.QuotaScheduler) budgets and counts every model call.
+    """
+
+    def __init__(self, model, model_name, cache=None, history=None, examples=None, schemas=None,
+                 tracer=None, template=CONVERTER_TEMPLATE, schema_k=8, examples_k=3, examples_budget=300,
+                 rules=None, fast_path=True, deadline=None, candidates=1, context_cache=None,
+                 refine_schema_k=2, scheduler=None):
+        self.model = model
+        self.model_name = model_name
+        self.cache = cache
+        self.history = history
+        self.examples = examples
+        self.schemas = schemas
+        self.tracer = tracer or Tracer()
+        self.template = template
+        self.schema_k = schema_k
+        self.examples_k = examples_k
+        self.examples_budget = examples_budget
+        self.rules = rules
+        self.fast_path = fast_path
+        self.deadline = deadline
+        self.candidates = candidates
+        self.context_cache = context_cache
+        self.refine_schema_k = refine_schema_k
+        self.scheduler = scheduler
+        self._selector = None
+        self._schema_rules = weakref.WeakKeyDictionary()
+
+    @property
+    def selector(self):
+        """The CandidateSelector used for voting, created on first use"""
+        if self._selector is None:
+            self._selector = CandidateSelector(self.model)
+        return self._selector
+
+    def rules_for(self, schema_target=None):
+        """RuleEngine for ``schema_target`` (rebuilt only when its schema index changes)"""
+        if not schema_target or self.schemas is None:
+            return self.rules
+        index = self._schema_index(schema_target)
+        engine = self._schema_rules.get(index)
+        if engine is None:
+            engine = self._schema_rules[index] = RuleEngine.from_index(index)
+        return engine
+
+    def _schema_index(self, schema_target):
+        if isinstance(schema_target, str):
+            return self.schemas.get(schema_target)
+        return self.schemas.combined(schema_target)
+
+    def _record(self, question, sql, timings, trace_id, user_id=None, session_id=None):
+        if self.history is None:
+            return None
+        with self.tracer.span("db_insert", trace_id):
+            return self.history.record(question, sql, timings.get("ttft_ms"), timings.get("latency_ms"),
+                                       user_id, session_id)
+
+    def prompt_for(self, question, schema_target=None):
+        """Return ``(prompt, schema_text, schema_tables, examples)`` for ``question``"""
+        schema_tables = []
+        if schema_target and self.schemas is not None:
+            schema_tables = self._schema_index(schema_target).relevant_tables(question, k=self.schema_k)
+        schema_text = format_tables(schema_tables)
+        examples = None
+        if self.examples is not None:
+            examples = self.examples.select(question, k=self.examples_k, token_budget=self.examples_budget)
+        prompt = build_prompt(question, schema_text, self.template, examples=examples)
+        return prompt, schema_text, schema_tables, examples
+
+    def refine_prompt_for(self, question, conversation, schema_target=None, with_schema=True):
+        """Return ``(prompt, schema_text, schema_tables)`` for a follow-up in ``conversation``.
+
+        The schema is cut down to the tables the current SQL reads plus the
+        few that best match the change.
+        """
+        schema_tables = []
+        if with_schema and schema_target and self.schemas is not None:
+            index = self._schema_index(schema_target)
+            by_name = {name.lower(): table for name, table in index.tables.items()}
+            try:
+                from sqlglot import exp
+
+                tree = CheckedQuery(conversation.turns[-1][1]).tree
+                names = [table.name.lower() for table in tree.find_all(exp.Table)]
+            except ValueError:
+                names = []
+            schema_tables = [by_name[name] for name in dict.fromkeys(names) if name in by_name]
+            for table in index.relevant_tables(question, k=self.refine_schema_k):
+                if table not in schema_tables:
+                    schema_tables.append(table)
+        schema_text = format_tables(schema_tables)
+        return build_refine_prompt(question, conversation.turns, schema_text), schema_text, schema_tables
+
+    def convert(self, question, schema_target=None, stream=False, on_partial=None, bypass_cache=False,
+                trace_id=None, user_id=None, session_id=None, candidates=None, sandbox=None, conversation=None,
+                priority="interactive"):
+        """Convert one question; ``on_partial(text)`` sees the cleaned SQL while it streams.
+
+        ``user_id`` and ``session_id`` are stored with the history row for scoped browsing;
+        the scheduler budgets the user (else the session) at ``priority``.
+        ``candidates`` overrides the Converter's count for this call; voted
+        answers are not streamed. ``sandbox()`` opens the database candidates
+        are executed on; without it they are compared by their SQL. With a
+        ``conversation`` that already has turns, ``question`` is a change to its
+        last SQL; each answer is added to the conversation.
+        """
+        candidates = self.candidates if candidates is None else candidates
+        refining = conversation is not None and len(conversation) > 0
+        engine = self.rules_for(schema_target)
+        if self.fast_path and engine is not None and not refining:
+            with self.tracer.span("rules", trace_id):
+                started = time.perf_counter()
+                sql = engine.convert(question)
+                elapsed_ms = (time.perf_counter() - started) * 1000
+            if sql is not None:
+                timings = {"ttft_ms": elapsed_ms, "latency_ms": elapsed_ms}
+                query_id = self._record(question, sql, timings, trace_id, user_id, session_id)
+                if conversation is not None:
+                    conversation.add(question, sql)
+                return ConversionResult(question, sql, query_id, ttft_ms=elapsed_ms, latency_ms=elapsed_ms,
+                                        source="rules")
+
+        model = self.model
+        with self.tracer.span("prompt_format", trace_id) as span:
+            if refining:
+                cached_model = None
+                if self.context_cache is not None and conversation.prefix:
+                    cached_model = self.context_cache.model_for(conversation.prefix)
+                model = cached_model or model
+                prompt, schema_text, schema_tables = self.refine_prompt_for(
+                    question, conversation, schema_target, with_schema=cached_model is None)
+                template_ver = template_version(prompt)
+                span.record("cached_prefix_tokens",
+                            0 if cached_model is None else estimate_tokens(conversation.prefix))
+            else:
+                prompt, schema_text, schema_tables, examples = self.prompt_for(question, schema_target)
+                template_ver = prompt_version(schema_text, self.template, examples)
+            prompt_tokens = estimate_tokens(prompt)
+            span.record("prompt_tokens", prompt_tokens)
+        if self.scheduler is not None:
+            model = self.scheduler.bind(model, user_id if user_id is not None else session_id, priority,
+                                        self.model_name)
+        if candidates > 1:
+            template_ver += f"+vote{candidates}"
+        timings = {}
+        call_options = {} if self.deadline is None else {"request_options": {"timeout": self.deadline}}
+        selection = None
+
+        def generate():
+            nonlocal selection
+            if candidates > 1:
+                started = time.perf_counter()
+                selection = self.selector.select(prompt, candidates, connect=sandbox, deadline=self.deadline,
+                                                 model=model)
+                timings["ttft_ms"] = timings["latency_ms"] = (time.perf_counter() - started) * 1000
+                return final_sql(selection.text)
+            if not stream:
+                started = time.perf_counter()
+                text = model.generate_content(prompt, **call_options).text
+                timings["ttft_ms"] = timings["latency_ms"] = (time.perf_counter() - started) * 1000
+                # Cached and stored the same way as a streamed answer (StreamedResponse.text)
+                return final_sql(text)
+            streamed = StreamedResponse(lambda: model.generate_content(prompt, stream=True, **call_options))
+            for partial in streamed:
+                if on_partial is not None:
+                    on_partial(partial)
+            timings["ttft_ms"] = streamed.ttft_ms
+            timings["latency_ms"] = streamed.latency_ms
+            return streamed.text
+
+        error = None
+        try:
+            with self.tracer.span("model_call", trace_id) as span:
+                if self.cache is None:
+                    sql, from_cache = generate(), False
+                else:
+                    sql, from_cache = self.cache.get_or_compute(
+                        question,
+                        generate,
+                        model_name=self.model_name,
+                        template_ver=template_ver,
+                        bypass=bypass_cache,
+                    )
+                if selection is not None:
+                    span.record("candidates", len(selection.candidates))
+                    span.record("agreement", selection.agreement)
+                span.record("output_tokens", estimate_tokens(sql))
+                span.record("response_bytes", len(sql.encode("utf-8")))
+            source = "cache" if from_cache else "model"
+        except Exception as e:
+            sql = None
+            if isinstance(e, QuotaExceeded) and bypass_cache and self.cache is not None:
+                # Out of budget: the answer the user wanted refreshed still beats a guess
+                sql = self.cache.get(make_key(question, template_ver, self.model_name))
+            if sql is not None:
+                from_cache, source, error = True, "cache", str(e)
+            else:
+                # API errors and exhausted quota: best-effort local answer, never cached. A follow-up
+                # such as "now only for 2023" means nothing to the rule engine on its own.
+                sql = engine.convert(question, strict=False) if engine is not None and not refining else None
+                if sql is None:
+                    raise
+                from_cache, source, error = False, "fallback", str(e)
+
+        query_id = self._record(question, sql, timings, trace_id, user_id, session_id)
+        if selection is not None and source == "model" and query_id is not None:
+            with self.tracer.span("db_insert", trace_id):
+                self.history.record_candidates(query_id, selection.candidates)
+        if conversation is not None:
+            conversation.add(question, sql, prompt)
+        return ConversionResult(question, sql, query_id, from_cache, timings.get("ttft_ms"),
+                                timings.get("latency_ms"), schema_tables, prompt_tokens, source, error,
+                                selection.candidates if selection is not None else ())
+
+    def accept(self, query_id, question, sql):
+        """Keep a good answer as a few-shot example for similar questions"""
+        if self.history is not None:
+            self.history.accept(query_id)
+        if self.examples is not None:
+            self.examples.add(question, sql)
@@ -0,0 +1,153 @@
+# querycraft/prompts.py
+"""Prompt templates shared by the Streamlit pages and headless tools."""
+import math
+
+from querycraft.cache import template_version
+from querycraft.streaming import strip_preamble
+
+# Few-shot template used by pages/Converter.py; fill it in with build_prompt()
+CONVERTER_TEMPLATE = """
+You are an expert SQL developer that converts natural language queries into precise SQL statements.
+Your task is to convert English descriptions into valid, optimized SQL queries.
+
+Guidelines:
+1. Identify all relevant tables
+2. Select only necessary columns
+3. Apply proper filtering conditions
+4. Include sorting/grouping when specified
+5. Use correct SQL syntax and formatting
+
+Examples:
+
+{examples}
+{schema_section}Now convert this English description to SQL:
+
+Input: {sql_text}
+
+Important Notes:
+- Always start with "SQL Query:" on its own line
+- Format the query with proper indentation (4 spaces for continuation lines)
+- Use standard SQL functions and syntax
+- Include column aliases for aggregates
+- Correct any typos in the input if necessary
+"""
+CONVERTER_TEMPLATE_VERSION = template_version(CONVERTER_TEMPLATE)
+
+# Seed few-shot examples; used as-is when no example store is available
+DEFAULT_EXAMPLES = [
+    ("Retrieve the names and ages of all employees who are older than 30 years.",
+     "SELECT name, age FROM employees\nWHERE age > 30;"),
+    ("Get the total sales amount from the orders table.",
+     "SELECT SUM(amount) AS total_sales FROM orders;"),
+    ("Find customers who made purchases in the last month, sorted by purchase date descending.",
+     "SELECT customer_name FROM purchases\n"
+     "WHERE purchase_date >= CURRENT_DATE - INTERVAL '1' MONTH\n"
+     "ORDER BY purchase_date DESC;"),
+    ("Show the average salary by department.",
+     "SELECT department, AVG(salary) AS avg_salary FROM employees\nGROUP BY department;"),
+]
+
+SCHEMA_SECTION = """Database schema (use only these tables and columns):
+{schema}
+
+"""
+
+
+def estimate_tokens(text):
+    """Rough Gemini token estimate (about four characters per token)"""
+    return math.ceil(len(text) / 4)
+
+
+def format_examples(examples):
+    return "\n".join(
+        f'Example {number}:\nInput: "{question}"\nOutput:\nSQL Query:\n{strip_preamble(sql)}\n'
+        for number, (question, sql) in enumerate(examples, start=1)
+    )
+
+
+def build_prompt(sql_text, schema_text="", template=CONVERTER_TEMPLATE, examples=None):
+    """Fill in the template, adding the schema section only when there is one.
+
+    ``examples`` is a list of ``(question, sql)`` pairs; defaults to DEFAULT_EXAMPLES.
+    """
+    schema_section = SCHEMA_SECTION.format(schema=schema_text) if schema_text else ""
+    return template.format(
+        sql_text=sql_text,
+        schema_section=schema_section,
+        examples=format_examples(DEFAULT_EXAMPLES if examples is None else examples),
+    )
+
+
+# Follow-up turn of a conversation: the change and the SQL it applies to, without the
+# guidelines and few-shot examples the first turn already carried
+REFINE_TEMPLATE = """
+Revise the SQL query below.
+
+{schema_section}Requests so far:
+{requests}
+
+Current SQL:
+{previous_sql}
+
+Change: {sql_text}
+
+Return the complete revised query, starting with "SQL Query:" on its own line.
+"""
+REFINE_MAX_REQUESTS = 6  # earlier requests listed in a follow-up prompt, most recent last
+
+
+def build_refine_prompt(sql_text, turns, schema_text="", template=REFINE_TEMPLATE):
+    """Prompt for a follow-up; ``turns`` are the conversation's ``(question, sql)`` pairs so far"""
+    schema_section = SCHEMA_SECTION.format(schema=schema_text) if schema_text else ""
+    return template.format(
+        sql_text=sql_text,
+        schema_section=schema_section,
+        requests="\n".join(f"- {question}" for question, _ in turns[-REFINE_MAX_REQUESTS:]),
+        previous_sql=strip_preamble(turns[-1][1]),
+    )
+
+
+def prompt_version(schema_text="", template=CONVERTER_TEMPLATE, examples=None):
+    """Cache-key version covering the template, the schema context and the few-shot examples.
+
+    ``examples`` as passed to build_prompt; None (the defaults) keeps the
+    version of the template alone, so accepting an example changes the key
+    only for questions whose selected examples change.
+    """
+    context = schema_text
+    if examples is not None:
+        context += format_examples(examples)
+    if not context:
+        return template_version(template)
+    return template_version(template + context)
+
+
+# Template used by the Team Lead app (Assignments/Team Lead/app.py); expects {query_text}
+TEAM_LEAD_TEMPLATE = """
+You are an expert SQL developer. Convert this natural language query to perfect SQL:
+
+Follow these rules:
+1. Use standard SQL-92 syntax
+2. Assume reasonable table/column names if not specified
+3. Format for readability
+4. Include all requested fields
+5. Add comments for complex logic
+
+Example Input: "Show me customers who spent over $100 last month"
+Example Output: 
+-- Query for high-value customers last month
+SELECT customer_name, total_spent 
+FROM customers 
+WHERE total_spent > 100 
+AND purchase_date >= DATE_SUB(CURRENT_DATE(), INTERVAL 1 MONTH)
+ORDER BY total_spent DESC;
+
+Now convert this:
+{query_text}
+"""
+TEAM_LEAD_TEMPLATE_VERSION = template_version(TEAM_LEAD_TEMPLATE)
+
+TEAM_LEAD_GENERATION_CONFIG = {
+    "temperature": 0.3,  # More deterministic output
+    "max_output_tokens": 1000,
+}
@@ -0,0 +1,382 @@
+# querycraft/quota.py
+"""Shared request and token budgets for model calls, with usage accounting.
+
+One QuotaScheduler per process (``st.cache_resource`` on the pages, one in
+the service) sits between every session and the API key they share. Each
+model call takes one request and its estimated tokens from the global
+buckets and from its user's, so a single heavy user cannot drain the key
+for everybody else. Calls that cannot go right away wait in priority
+order: "interactive" before "batch", then first come, first served. When an
+interactive call would wait too long it raises QuotaExceeded, and the
+Converter answers from the response cache or the rule engine instead.
+
+Input and output tokens of every call are counted (the provider's
+``usage_metadata`` when the response has it, else estimated) and added up
+per day, user, model and priority in the ``api_usage`` table. Optional
+daily token budgets, in all and per user, are checked against those totals,
+so they hold across restarts.
+
+Configured from the environment by :func:`scheduler_from_env`::
+
+    QUERYCRAFT_RPM=60 QUERYCRAFT_TPM=1000000 QUERYCRAFT_USER_RPM=20 QUERYCRAFT_USER_TPM=200000
+    QUERYCRAFT_TPD=50000000 QUERYCRAFT_USER_TPD=2000000
+"""
+import datetime
+import itertools
+import os
+import sqlite3
+import threading
+import time
+
+from querycraft.db import add_usage, ensure_usage_table
+from querycraft.prompts import estimate_tokens
+from querycraft.ratelimit import TokenBucket
+
+# Served in this order when calls are waiting for budget
+PRIORITIES = ("interactive", "batch")
+
+
+class QuotaExceeded(RuntimeError):
+    """No budget for a call within its wait limit; ``retry_after`` is a hint in seconds, if known"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def token_counts(prompt, text, response=None):
+    """``(input_tokens, output_tokens)`` of one call: the provider's counts when ``response`` has them"""
+    metadata = getattr(response, "usage_metadata", None)
+    if metadata is not None and getattr(metadata, "prompt_token_count", None):
+        return metadata.prompt_token_count, getattr(metadata, "candidates_token_count", None) or 0
+    return estimate_tokens(prompt), estimate_tokens(text)
+
+
+def _per_minute(amount):
+    # A minute's worth may be spent at once, then it refills evenly
+    return TokenBucket(amount / 60.0, capacity=amount) if amount else None
+
+
+class Grant:
+    """Budget taken by :meth:`QuotaScheduler.acquire`, settled once the call is done"""
+
+    def __init__(self, user, priority, model_name, requests, tokens, token_buckets, waited_s, day=None):
+        self.user = user
+        self.priority = priority
+        self.model_name = model_name
+        self.requests = requests
+        self.tokens = tokens
+        self.token_buckets = token_buckets
+        self.waited_s = waited_s
+        self.day = day
+
+
+class QuotaScheduler:
+    """Process-wide request/token buckets, global and per user, shared by every session.
+
+    ``requests_per_minute`` / ``tokens_per_minute`` bound all calls together,
+    ``user_*`` each user's; None leaves that budget out. A call reserves its
+    prompt's estimated tokens plus ``output_reserve``, and the difference to
+    the real count is charged or returned when it settles. A call held back
+    only by its own user's budget does not hold up anybody else.
+    Interactive calls wait at most ``max_wait_s``, batch calls
+    ``batch_max_wait_s`` (None: as long as it takes), before QuotaExceeded.
+    ``tokens_per_day`` / ``user_tokens_per_day`` cap the tokens of a calendar
+    day; a call that would go over raises QuotaExceeded right away.
+
+    With a ConnectionPool, usage is added to ``api_usage`` at most every
+    ``flush_interval_s`` seconds, and on :meth:`flush`.
+    """
+
+    def __init__(self, requests_per_minute=60, tokens_per_minute=None, user_requests_per_minute=None,
+                 user_tokens_per_minute=None, max_wait_s=5.0, batch_max_wait_s=None, output_reserve=256,
+                 pool=None, flush_interval_s=5.0, max_users=10000, tokens_per_day=None, user_tokens_per_day=None):
+        self.requests = _per_minute(requests_per_minute)
+        self.tokens = _per_minute(tokens_per_minute)
+        self.user_requests_per_minute = user_requests_per_minute
+        self.user_tokens_per_minute = user_tokens_per_minute
+        self.max_wait_s = max_wait_s
+        self.batch_max_wait_s = batch_max_wait_s
+        self.output_reserve = output_reserve
+        self.pool = pool
+        self.flush_interval_s = flush_interval_s
+        self.max_users = max_users
+        self.tokens_per_day = tokens_per_day
+        self.user_tokens_per_day = user_tokens_per_day
+        self.rejected = 0
+        self._users = {}
+        self._waiting = {}
+        self._order = itertools.count()
+        self._cond = threading.Condition()
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._flushed = time.monotonic()
+        self._day = None
+        self._day_tokens = {}  # user -> tokens reserved or used today; None is everybody's
+        if pool is not None:
+            with pool.connection() as conn:
+                ensure_usage_table(conn)
+                conn.commit()
+
+    def _user_buckets(self, user):
+        # Caller holds the condition's lock; calls without a user only count against the global budget
+        if user is None:
+            return None, None
+        buckets = self._users.get(user)
+        if buckets is None:
+            if len(self._users) >= self.max_users:
+                # Users with full buckets have been idle for a minute or more; they start over full
+                self._users = {key: value for key, value in self._users.items()
+                               if any(b is not None and b.available < b.capacity for b in value)}
+            buckets = self._users[user] = (_per_minute(self.user_requests_per_minute),
+                                           _per_minute(self.user_tokens_per_minute))
+        return buckets
+
+    def acquire(self, user=None, tokens=0, requests=1, priority="interactive", model_name=""):
+        """Take budget for a call, waiting in priority order; returns a Grant for :meth:`settle`.
+
+        Raises QuotaExceeded when the call cannot be served within its wait
+        limit, or could never be (it needs more than a bucket holds).
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"priority must be one of {PRIORITIES}, not {priority!r}")
+        limit = self.max_wait_s if priority == "interactive" else self.batch_max_wait_s
+        started = time.monotonic()
+        with self._cond:
+            user_requests, user_tokens = self._user_buckets(user)
+            mine = [(bucket, amount) for bucket, amount in ((user_requests, requests), (user_tokens, tokens))
+                    if bucket is not None]
+            needs = mine + [(bucket, amount) for bucket, amount in ((self.requests, requests), (self.tokens, tokens))
+                            if bucket is not None]
+            if any(amount > bucket.capacity for bucket, amount in needs):
+                self._reject(user, priority, model_name)
+                raise QuotaExceeded(f"a call of {tokens} tokens is larger than the token budget")
+            day = self._today()
+            if self._over_daily_budget(user, tokens):
+                self._reject(user, priority, model_name)
+                tomorrow = datetime.datetime.combine(datetime.date.today() + datetime.timedelta(days=1),
+                                                     datetime.time())
+                raise QuotaExceeded("daily token budget used up",
+                                    retry_after=(tomorrow - datetime.datetime.now()).total_seconds())
+            key = (PRIORITIES.index(priority), next(self._order))
+            self._waiting[key] = mine
+            try:
+                while True:
+                    delay = max(bucket.delay_for(amount) for bucket, amount in needs) if needs else 0.0
+                    # Someone earlier in line goes first, unless only their own user budget holds them back
+                    ahead = any(other < key and all(b.delay_for(a) == 0 for b, a in theirs)
+                                for other, theirs in self._waiting.items())
+                    if delay == 0 and not ahead:
+                        for bucket, amount in needs:
+                            bucket.charge(amount)
+                        self._add_day_tokens(user, tokens, day)
+                        break
+                    remaining = None if limit is None else limit - (time.monotonic() - started)
+                    if remaining is not None and (remaining <= 0 or delay > remaining):
+                        self._reject(user, priority, model_name)
+                        raise QuotaExceeded(f"API budget exhausted; retry in {delay:.1f} s", retry_after=delay)
+                    pause = max(delay, 0.01)
+                    self._cond.wait(pause if remaining is None else min(pause, remaining))
+            finally:
+                del self._waiting[key]
+                self._cond.notify_all()
+        token_buckets = [bucket for bucket in (user_tokens, self.tokens) if bucket is not None]
+        return Grant(user, priority, model_name, requests, tokens, token_buckets, time.monotonic() - started, day)
+
+    def settle(self, grant, input_tokens, output_tokens, failed=False):
+        """Correct the reserved tokens to the real count and record the call's usage"""
+        extra = input_tokens + output_tokens - grant.tokens
+        if extra:
+            with self._cond:
+                for bucket in grant.token_buckets:
+                    bucket.charge(extra)
+                self._add_day_tokens(grant.user, extra, grant.day)
+                self._cond.notify_all()
+        self._count(grant.user, grant.model_name, grant.priority,
+                    (grant.requests, int(failed), 0, input_tokens, output_tokens))
+
+    def bind(self, model, user=None, priority="interactive", model_name=None):
+        """``model`` with its ``generate_content`` calls scheduled as ``user`` at ``priority``.
+
+        A wrapper that does not map one call to one upstream request
+        (service.CoalescingModel shares one between callers, routing.Router
+        hedges and fails over) has a ``rebind(wrap)`` method returning a view of itself with ``wrap``
+        applied to what it calls; the budget is then taken per upstream request.
+        """
+        def wrap(inner):
+            rebind = getattr(inner, "rebind", None)
+            if rebind is not None:
+                return rebind(wrap)
+            return ScheduledModel(self, inner, user, priority, model_name)
+
+        return wrap(model)
+
+    # --- daily budgets (caller holds the condition's lock) ---
+
+    def _today(self):
+        today = datetime.date.today().isoformat()
+        if today != self._day:
+            self._day = today
+            self._day_tokens = {}
+            if self.pool is not None and (self.tokens_per_day or self.user_tokens_per_day):
+                self._load_day_tokens(today)
+        return today
+
+    def _load_day_tokens(self, day):
+        # What earlier processes (and this one, before the last flush) already used today
+        self.flush()
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT user_id, SUM(input_tokens + output_tokens) FROM api_usage WHERE day = ? GROUP BY user_id",
+                (day,),
+            ).fetchall()
+        for user, used in rows:
+            self._day_tokens[user or None] = self._day_tokens.get(user or None, 0) + used
+            if user:
+                self._day_tokens[None] = self._day_tokens.get(None, 0) + used
+
+    def _over_daily_budget(self, user, tokens):
+        if self.tokens_per_day and self._day_tokens.get(None, 0) + tokens > self.tokens_per_day:
+            return True
+        return bool(user is not None and self.user_tokens_per_day
+                    and self._day_tokens.get(user, 0) + tokens > self.user_tokens_per_day)
+
+    def _add_day_tokens(self, user, tokens, day):
+        if day != self._day:
+            return  # reserved yesterday; today's count started over
+        self._day_tokens[None] = self._day_tokens.get(None, 0) + tokens
+        if user is not None:
+            self._day_tokens[user] = self._day_tokens.get(user, 0) + tokens
+
+    # --- usage accounting ---
+
+    def _reject(self, user, priority, model_name):
+        self.rejected += 1
+        self._count(user, model_name, priority, (0, 0, 1, 0, 0))
+
+    def _count(self, user, model_name, priority, values):
+        key = (datetime.date.today().isoformat(), user or "", model_name or "", priority)
+        with self._pending_lock:
+            totals = self._pending.get(key, (0, 0, 0, 0, 0))
+            self._pending[key] = tuple(a + b for a, b in zip(totals, values))
+        if self.pool is not None and time.monotonic() - self._flushed >= self.flush_interval_s:
+            try:
+                self.flush()
+            except sqlite3.Error:
+                pass  # kept in memory and retried with the next flush
+
+    def flush(self):
+        """Add buffered usage to ``api_usage``; returns the number of rows written"""
+        if self.pool is None:
+            return 0
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+            self._flushed = time.monotonic()
+        if not pending:
+            return 0
+        try:
+            with self.pool.connection() as conn:
+                add_usage(conn, [key + values for key, values in pending.items()])
+        except sqlite3.Error:
+            with self._pending_lock:
+                for key, values in pending.items():
+                    totals = self._pending.get(key, (0, 0, 0, 0, 0))
+                    self._pending[key] = tuple(a + b for a, b in zip(totals, values))
+            raise
+        return len(pending)
+
+    def usage(self, days=7, user=None):
+        """Per day and user, newest day first: ``(day, user, requests, input_tokens, output_tokens, rejected)``"""
+        self.flush()
+        since = (datetime.date.today() - datetime.timedelta(days=days - 1)).isoformat()
+        params = [since]
+        where = "day >= ?"
+        if user is not None:
+            where += " AND user_id = ?"
+            params.append(user)
+        with self.pool.connection() as conn:
+            return conn.execute(f"""
+                SELECT day, user_id, SUM(requests), SUM(input_tokens), SUM(output_tokens), SUM(rejected)
+                FROM api_usage WHERE {where}
+                GROUP BY day, user_id
+                ORDER BY day DESC, SUM(input_tokens + output_tokens) DESC
+            """, params).fetchall()
+
+    def snapshot(self):
+        """Budget left right now and calls waiting for it, for the diagnostics panel"""
+        with self._cond:
+            waiting = [PRIORITIES[rank] for rank, _ in self._waiting]
+        return {
+            "requests_left": None if self.requests is None else int(self.requests.available),
+            "tokens_left": None if self.tokens is None else int(self.tokens.available),
+            "waiting": {priority: waiting.count(priority) for priority in PRIORITIES},
+            "rejected": self.rejected,
+        }
+
+
+class ScheduledModel:
+    """``generate_content`` of ``model`` through a QuotaScheduler, for one user and priority.
+
+    A stream settles once it has been read to the end (or closed).
+    """
+
+    def __init__(self, scheduler, model, user=None, priority="interactive", model_name=None):
+        self.scheduler = scheduler
+        self.model = model
+        self.user = user
+        self.priority = priority
+        self.model_name = model_name or getattr(model, "model_name", "") or ""
+
+    def generate_content(self, prompt, stream=False, **options):
+        grant = self.scheduler.acquire(self.user, estimate_tokens(prompt) + self.scheduler.output_reserve,
+                                       priority=self.priority, model_name=self.model_name)
+        try:
+            if stream:
+                response = self.model.generate_content(prompt, stream=True, **options)
+            else:
+                response = self.model.generate_content(prompt, **options)
+        except Exception:
+            self.scheduler.settle(grant, 0, 0, failed=True)
+            raise
+        if stream:
+            return self._stream(response, prompt, grant)
+        try:
+            text = response.text
+        except ValueError:
+            text = ""  # blocked answer; the caller sees the error when it reads .text
+        self.scheduler.settle(grant, *token_counts(prompt, text, response))
+        return response
+
+    def _stream(self, chunks, prompt, grant):
+        text, last, failed = "", None, True
+        try:
+            for chunk in chunks:
+                text += chunk.text
+                last = chunk
+                yield chunk
+            failed = False
+        finally:
+            self.scheduler.settle(grant, *token_counts(prompt, text, last), failed=failed)
+
+
+def scheduler_from_env(pool=None, **options):
+    """QuotaScheduler configured by the ``QUERYCRAFT_*`` variables above; 0 turns a budget off.
+
+    Defaults: 60 requests per minute in all, 20 per user, no token budgets (per minute or per day),
+    and interactive calls wait up to ``QUERYCRAFT_QUOTA_WAIT_S`` = 5 seconds.
+    """
+    def limit(name, default=None):
+        value = int(os.getenv(name, default or 0))
+        return value or None
+
+    return QuotaScheduler(
+        requests_per_minute=limit("QUERYCRAFT_RPM", 60),
+        tokens_per_minute=limit("QUERYCRAFT_TPM"),
+        user_requests_per_minute=limit("QUERYCRAFT_USER_RPM", 20),
+        user_tokens_per_minute=limit("QUERYCRAFT_USER_TPM"),
+        tokens_per_day=limit("QUERYCRAFT_TPD"),
+        user_tokens_per_day=limit("QUERYCRAFT_USER_TPD"),
+        max_wait_s=float(os.getenv("QUERYCRAFT_QUOTA_WAIT_S", 5.0)),
+        pool=pool,
+        **options,
+    )
@@ -0,0 +1,64 @@
+# querycraft/ratelimit.py
+"""Token-bucket rate limiting for calls to the Gemini API."""
+import threading
+import time
+
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens per second, up to ``capacity`` banked"""
+
+    def __init__(self, rate, capacity=1, clock=time.monotonic):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, requests_per_minute, burst=1):
+        return cls(requests_per_minute / 60.0, capacity=burst)
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens=1):
+        """Take ``tokens`` if available right now; never blocks"""
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def charge(self, tokens):
+        """Take ``tokens`` that were already spent, going into debt if need be; negative returns them"""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens - tokens)
+
+    @property
+    def available(self):
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+    def delay_for(self, tokens=1):
+        """Seconds until ``tokens`` could be taken, assuming nobody else takes any"""
+        with self._lock:
+            self._refill()
+            return max(0.0, (tokens - self._tokens) / self.rate)
+
+    def acquire(self, tokens=1):
+        while not self.try_acquire(tokens):
+            time.sleep(self.delay_for(tokens))
+
+    async def acquire_async(self, tokens=1):
+        import asyncio
+
+        while not self.try_acquire(tokens):
+            await asyncio.sleep(self.delay_for(tokens))
@@ -0,0 +1,126 @@
+# querycraft/resources.py
+"""Long-lived resources shared across Streamlit reruns and sessions.
+
+The pages wrap these in ``st.cache_resource`` so each one is built once per
+server process instead of on every widget interaction.
+"""
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from querycraft.db import register_functions
+
+# Applied to every pooled connection; auto_vacuum and journal_mode=WAL persist in
+# the file (auto_vacuum only when it comes first, on a brand-new database)
+CONNECTION_PRAGMAS = (
+    "PRAGMA auto_vacuum=INCREMENTAL",
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",
+)
+
+
+class PoolExhausted(TimeoutError):
+    """Every pooled connection stayed checked out for the pool's timeout"""
+
+
+class ConnectionPool:
+    """Small thread-safe pool of SQLite connections to one database file"""
+
+    def __init__(self, db_path, size=4, timeout=10.0):
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        register_functions(conn)
+        return conn
+
+    def _checkout(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return self._connect()
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise PoolExhausted(
+                f"No free connection to {self.db_path} after {self.timeout:g}s ({self.size} in use)."
+            ) from None
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; uncommitted work is rolled back on error"""
+        conn = self._checkout()
+        try:
+            yield conn
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+DEMO_EMPLOYEES_DDL = """
+    CREATE TABLE employees (
+        id INTEGER PRIMARY KEY,
+        name TEXT,
+        age INTEGER,
+        department TEXT,
+        salary REAL
+    )
+"""
+
+DEMO_EMPLOYEES = [
+    ("Alice", 32, "Sales", 60000),
+    ("Bob", 45, "HR", 75000),
+    ("Carol", 29, "IT", 68000),
+    ("David", 38, "Sales", 72000),
+]
+
+
+class DemoDatabase:
+    """Prebuilt in-memory ``employees`` table that is cloned for each demo run.
+
+    Cloning with the backup API copies pages directly, which is cheaper than
+    re-running the DDL and inserts, and gives every caller a private copy.
+    """
+
+    def __init__(self, rows=DEMO_EMPLOYEES):
+        self._template = sqlite3.connect(":memory:", check_same_thread=False)
+        self._template.execute(DEMO_EMPLOYEES_DDL)
+        self._template.executemany(
+            "INSERT INTO employees (name, age, department, salary) VALUES (?, ?, ?, ?)", rows
+        )
+        self._template.commit()
+        self._lock = threading.Lock()
+
+    def table_names(self):
+        with self._lock:
+            return [name for name, in self._template.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+
+    def clone(self):
+        conn = sqlite3.connect(":memory:", check_same_thread=False)
+        with self._lock:
+            self._template.backup(conn)
+        return conn
@@ -0,0 +1,141 @@
+# querycraft/retention.py
+"""Age out old conversion history.
+
+Events older than ``keep_days`` (or beyond the newest ``max_events``) are
+deleted in chunks, each chunk in its own short transaction so the app's
+writers are never blocked for long. Accepted conversions are kept: they
+feed the few-shot examples. With ``cold_path`` the rows are first copied to
+an archive database, keyed by content hash so that the archive stays
+deduplicated too. Questions and SQL bodies no event uses any more are then
+dropped, and the freed pages returned to the filesystem with
+``PRAGMA incremental_vacuum``.
+
+Run it from cron, or let the Converter page do it at startup by setting
+``QUERYCRAFT_RETENTION_DAYS``::
+
+    python -m querycraft.retention querycraft.db --keep-days 90 --archive querycraft-archive.db
+"""
+import argparse
+import json
+import sqlite3
+
+from querycraft.db import collect_garbage, ensure_queries_table
+
+COLD_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS cold.query_texts (hash BLOB PRIMARY KEY, body TEXT NOT NULL UNIQUE) WITHOUT ROWID;
+    -- SQL is archived decompressed, so the archive reads without QueryCraft's SQL functions
+    CREATE TABLE IF NOT EXISTS cold.query_sql (hash BLOB PRIMARY KEY, body TEXT NOT NULL UNIQUE) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS cold.query_events (
+        id INTEGER PRIMARY KEY,
+        question_hash BLOB NOT NULL,
+        sql_hash BLOB NOT NULL,
+        created_at TIMESTAMP NOT NULL,
+        ttft_ms REAL,
+        latency_ms REAL,
+        accepted INTEGER NOT NULL DEFAULT 0,
+        user_id TEXT,
+        session_id TEXT
+    );
+"""
+
+_ARCHIVE_CHUNK = [
+    """INSERT OR IGNORE INTO cold.query_texts (hash, body)
+       SELECT t.hash, t.body FROM temp.expired x
+       JOIN query_events e ON e.id = x.id JOIN query_texts t ON t.id = e.question_id""",
+    """INSERT OR IGNORE INTO cold.query_sql (hash, body)
+       SELECT s.hash, qc_unpack(s.body) FROM temp.expired x
+       JOIN query_events e ON e.id = x.id JOIN query_sql s ON s.id = e.sql_id""",
+    """INSERT OR REPLACE INTO cold.query_events
+       SELECT e.id, t.hash, s.hash, e.created_at, e.ttft_ms, e.latency_ms, e.accepted, e.user_id, e.session_id
+       FROM temp.expired x JOIN query_events e ON e.id = x.id
+       JOIN query_texts t ON t.id = e.question_id JOIN query_sql s ON s.id = e.sql_id""",
+]
+
+
+def _expired_ids(conn, keep_days, max_events):
+    clauses, params = ["accepted = 0"], []
+    cutoffs = []
+    if keep_days is not None:
+        cutoffs.append("created_at < datetime('now', ?)")
+        params.append(f"-{keep_days} days")
+    if max_events is not None:
+        cutoffs.append("id <= (SELECT id FROM query_events ORDER BY id DESC LIMIT 1 OFFSET ?)")
+        params.append(max_events)
+    if not cutoffs:
+        return []
+    clauses.append(f"({' OR '.join(cutoffs)})")
+    return [row[0] for row in conn.execute(
+        f"SELECT id FROM query_events WHERE {' AND '.join(clauses)} ORDER BY id", params
+    )]
+
+
+def apply_retention(conn, keep_days=90, max_events=None, cold_path=None, chunk_size=5000, vacuum_pages=None):
+    """Expire old, non-accepted history; returns ``{"expired", "archived", "collected", "freed_pages"}``"""
+    ensure_queries_table(conn)
+    expired = _expired_ids(conn, keep_days, max_events)
+    summary = {"expired": 0, "archived": 0, "collected": 0, "freed_pages": 0}
+    if not expired:
+        return summary
+    if cold_path is not None:
+        conn.execute("ATTACH DATABASE ? AS cold", (cold_path,))
+        conn.executescript(COLD_SCHEMA)
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS expired (id INTEGER PRIMARY KEY)")
+    try:
+        for start in range(0, len(expired), chunk_size):
+            chunk = expired[start:start + chunk_size]
+            conn.execute("DELETE FROM temp.expired")
+            conn.executemany("INSERT INTO temp.expired (id) VALUES (?)", ((query_id,) for query_id in chunk))
+            if cold_path is not None:
+                for statement in _ARCHIVE_CHUNK:
+                    conn.execute(statement)
+                summary["archived"] += len(chunk)
+            # Through the view, so its triggers keep the full-text index in sync
+            conn.execute("DELETE FROM queries WHERE id IN (SELECT id FROM temp.expired)")
+            conn.commit()
+            summary["expired"] += len(chunk)
+    finally:
+        conn.execute("DROP TABLE IF EXISTS temp.expired")
+        if cold_path is not None:
+            conn.commit()
+            conn.execute("DETACH DATABASE cold")
+    summary["collected"] = collect_garbage(conn)
+    before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    pages = "" if vacuum_pages is None else f"({int(vacuum_pages)})"
+    # executescript steps the pragma to completion; execute() would free a single page
+    conn.executescript(f"PRAGMA incremental_vacuum{pages}")
+    summary["freed_pages"] = before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return summary
+
+
+def storage_stats(conn):
+    """Row counts and file size of the query store"""
+    stats = {
+        table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        for table in ("query_events", "query_texts", "query_sql")
+    }
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    stats["bytes"] = page_size * conn.execute("PRAGMA page_count").fetchone()[0]
+    stats["free_bytes"] = page_size * conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Expire old QueryCraft history.")
+    parser.add_argument("db", nargs="?", default="querycraft.db")
+    parser.add_argument("--keep-days", type=int, default=90)
+    parser.add_argument("--max-events", type=int, help="also keep no more than this many recent events")
+    parser.add_argument("--archive", help="copy expired rows to this SQLite file before deleting them")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        summary = apply_retention(conn, args.keep_days, args.max_events, args.archive, args.chunk_size)
+        summary.update(storage_stats(conn))
+    finally:
+        conn.close()
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,443 @@
+# querycraft/routing.py
+"""Route model calls over a pool of interchangeable targets to cut tail latency.
+
+``Router`` has the same ``generate_content`` method as ``genai.GenerativeModel``,
+so it drops into Converter, ResponseCache and the batch CLI unchanged. Per call it:
+
+- ranks the targets by an EWMA of their latency, penalized by their EWMA
+  error rate, skipping targets whose circuit breaker is open;
+- sends the request to the best one and, if no answer has arrived after
+  that target's recent p95 latency, sends a hedged copy to the next best.
+  The first success wins,
+  and the loser is cancelled: queued attempts never start, streams are
+  closed, and blocking calls are left to time out on their own deadline;
+- fails over to the next target immediately when an attempt errors;
+- carries one deadline across all of it. Each attempt gets the remaining
+  budget as ``request_options={"timeout": ...}``, and the call raises
+  DeadlineExceeded once the budget is spent.
+
+Under a ``quota.QuotaScheduler`` every attempt, hedges and failovers
+included, takes its own request from the budget (see :meth:`Router.rebind`).
+An attempt refused for lack of budget says nothing about its target and is
+not failed over.
+
+Targets are model names (built with ``client.build_model``) or ``http://``
+URLs of a ``stub.StubServer``, which makes the whole thing testable offline::
+
+    QUERYCRAFT_MODEL_POOL=gemini-1.5-flash,gemini-1.5-flash-8b
+    QUERYCRAFT_MODEL_POOL=http://127.0.0.1:8001,http://127.0.0.1:8002
+
+Hedges and failovers only go to a distinct target, so a one-target pool
+sends each call once. ``QUERYCRAFT_HEDGING=self`` also lets a target be
+hedged against itself (another connection, likely another replica), at the
+cost of up to ``max_attempts`` requests per call on the same key.
+"""
+import copy
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from querycraft.quota import QuotaExceeded
+
+DEFAULT_DEADLINE_S = 30.0
+
+
+class DeadlineExceeded(TimeoutError):
+    """No target answered within the call's deadline"""
+
+
+class NoTargetAvailable(RuntimeError):
+    """Every target's circuit breaker is open"""
+
+
+class Deadline:
+    """A fixed point in time that budgets are measured against"""
+
+    def __init__(self, seconds, clock=time.monotonic):
+        self._clock = clock
+        self.expires_at = clock() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires_at - self._clock())
+
+    @property
+    def expired(self):
+        return self.remaining() <= 0.0
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures.
+
+    While open, calls are refused for ``reset_after`` seconds. After that,
+    one probe call at a time is let through (half-open): its success closes
+    the breaker, and its failure opens it again.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+    def __init__(self, failure_threshold=5, reset_after=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self._clock = clock
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_after:
+                return self.HALF_OPEN
+            return self._state
+
+    def available(self):
+        """Whether a call could go through now (does not reserve the probe)"""
+        state = self.state
+        return state == self.CLOSED or (state == self.HALF_OPEN and not self._probing)
+
+    def allow(self):
+        """Reserve a call; False while open or while a half-open probe is in flight"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._clock() - self._opened_at < self.reset_after or self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+            self._probing = False
+
+    def release(self):
+        """Give back a reserved call whose outcome says nothing about the target"""
+        with self._lock:
+            self._probing = False
+
+
+class TargetStats:
+    """EWMA latency and error rate, plus a window of recent latencies for quantiles.
+
+    The error rate also decays with a ``half_life`` in seconds, so a target
+    that stopped getting traffic after a bad spell is eventually tried again.
+    """
+
+    def __init__(self, alpha=0.2, window=200, half_life=30.0, clock=time.monotonic):
+        self.alpha = alpha
+        self.half_life = half_life
+        self._clock = clock
+        self._updated = clock()
+        self.latency_s = None
+        self.error_rate = 0.0
+        self.calls = 0
+        self.failures = 0
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, latency_s, ok):
+        with self._lock:
+            self.calls += 1
+            self.error_rate = self.current_error_rate()
+            self.error_rate += self.alpha * ((0.0 if ok else 1.0) - self.error_rate)
+            self._updated = self._clock()
+            if ok:
+                self._recent.append(latency_s)
+                if self.latency_s is None:
+                    self.latency_s = latency_s
+                else:
+                    self.latency_s += self.alpha * (latency_s - self.latency_s)
+            else:
+                self.failures += 1
+
+    def quantile(self, q, min_samples=20):
+        """Latency quantile over the window; None until ``min_samples`` successes were seen"""
+        with self._lock:
+            if len(self._recent) < min_samples:
+                return None
+            ordered = sorted(self._recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def current_error_rate(self):
+        return self.error_rate * 0.5 ** ((self._clock() - self._updated) / self.half_life)
+
+    def score(self):
+        """Lower is better; unmeasured targets score 0 so they get tried"""
+        latency = self.latency_s or 0.0
+        error_rate = self.current_error_rate()
+        return latency * (1.0 + 10.0 * error_rate) + error_rate
+
+
+class Target:
+    """One model endpoint in the pool, with its own breaker and statistics"""
+
+    def __init__(self, name, model, breaker=None, stats=None):
+        self.name = name
+        self.model = model
+        self.breaker = breaker or CircuitBreaker()
+        self.stats = stats or TargetStats()
+
+
+class _Attempt:
+    __slots__ = ("target", "cancelled", "started")
+
+    def __init__(self, target):
+        self.target = target
+        self.cancelled = threading.Event()
+        self.started = time.perf_counter()
+
+
+class Router:
+    """``generate_content`` over ``targets`` with hedging, failover, breakers and a deadline.
+
+    ``hedge_delay`` is used until a target has enough samples for its
+    ``hedge_quantile``; the adaptive delay is then clamped to
+    ``[min_hedge_delay, max_hedge_delay]``. ``max_attempts`` bounds the
+    hedges and failovers of one call together. With ``self_hedge`` a target
+    already tried can be tried again when no other one is available. ``hedges`` counts hedged
+    requests sent, and ``backup_wins`` the calls answered by a hedge or failover.
+    """
+
+    def __init__(self, targets, hedge=True, hedge_quantile=0.95, hedge_delay=2.0, min_hedge_delay=0.05,
+                 max_hedge_delay=10.0, deadline=DEFAULT_DEADLINE_S, max_attempts=3, max_workers=16,
+                 self_hedge=False):
+        if not targets:
+            raise ValueError("Router needs at least one target")
+        self.targets = list(targets)
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_delay = hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.max_hedge_delay = max_hedge_delay
+        self.deadline = deadline
+        self.max_attempts = max_attempts
+        self.self_hedge = self_hedge
+        self.hedges = 0
+        self.backup_wins = 0
+        self._owner = self  # whose counters views made by rebind() add to
+        self._counter_lock = threading.Lock()  # concurrent calls update hedges / backup_wins
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="querycraft-route")
+
+    @property
+    def model_name(self):
+        return self.targets[0].name
+
+    def rebind(self, wrap):
+        """A view of this router whose attempts call ``wrap(target.model)``.
+
+        Breakers, statistics, counters and threads stay shared with this
+        router. QuotaScheduler.bind uses it to charge every attempt.
+        """
+        view = copy.copy(self)
+        view.targets = [Target(target.name, wrap(target.model), target.breaker, target.stats)
+                        for target in self.targets]
+        return view
+
+    def ranked(self):
+        """Targets that can take a call now, best first"""
+        available = [target for target in self.targets if target.breaker.available()]
+        return sorted(available, key=lambda target: target.stats.score())
+
+    def delay_for(self, target):
+        """Seconds to wait on ``target`` before hedging"""
+        observed = target.stats.quantile(self.hedge_quantile)
+        if observed is None:
+            return self.hedge_delay
+        return min(self.max_hedge_delay, max(self.min_hedge_delay, observed))
+
+    def _next_target(self, used):
+        ranked = self.ranked()
+        for target in ranked:
+            if target not in used and target.breaker.allow():
+                return target
+        if self.self_hedge:
+            # Opted in: a single healthy target is hedged against itself
+            for target in ranked:
+                if target.breaker.allow():
+                    return target
+        return None
+
+    def _run(self, attempt, prompt, generation_config, stream, timeout):
+        target = attempt.target
+        try:
+            response = target.model.generate_content(
+                prompt, generation_config=generation_config, stream=stream, request_options={"timeout": timeout}
+            )
+            if stream:
+                # Race on the first chunk; the winner's iterator is then drained by the caller
+                chunks = iter(response)
+                first = next(chunks, None)
+                response = (first, chunks)
+        except Exception as e:
+            if attempt.cancelled.is_set() or isinstance(e, QuotaExceeded):
+                target.breaker.release()
+            else:
+                target.stats.observe(time.perf_counter() - attempt.started, ok=False)
+                target.breaker.record_failure()
+            raise
+        target.stats.observe(time.perf_counter() - attempt.started, ok=True)
+        target.breaker.record_success()
+        if stream and attempt.cancelled.is_set():
+            _close_chunks(response[1])
+        return response
+
+    def generate_content(self, prompt, generation_config=None, stream=False, request_options=None):
+        budget = (request_options or {}).get("timeout") or self.deadline
+        deadline = Deadline(budget)
+        hedging = self.hedge
+        pending = {}
+        used = []
+        errors = []
+
+        def launch():
+            target = self._next_target(used)
+            if target is None:
+                return False
+            attempt = _Attempt(target)
+            used.append(target)
+            future = self._executor.submit(
+                self._run, attempt, prompt, generation_config, stream, deadline.remaining()
+            )
+            pending[future] = attempt
+            return True
+
+        def cancel_rest():
+            for future, attempt in pending.items():
+                attempt.cancelled.set()
+                if future.cancel():
+                    attempt.target.breaker.release()
+                elif stream:
+                    future.add_done_callback(_close_stream)
+            pending.clear()
+
+        if not launch():
+            raise NoTargetAvailable("every model target's circuit breaker is open")
+        first_attempt = next(iter(pending.values()))
+        while pending:
+            timeout = deadline.remaining()
+            if hedging and len(used) < self.max_attempts:
+                primary = next(iter(pending.values())).target
+                timeout = min(timeout, self.delay_for(primary))
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                if deadline.expired:
+                    cancel_rest()
+                    raise DeadlineExceeded(f"no model answer within {budget}s")
+                if launch():
+                    self._count("hedges")
+                else:
+                    hedging = False
+                continue
+            for future in done:
+                attempt = pending.pop(future)
+                if future.exception() is None:
+                    if attempt is not first_attempt:
+                        self._count("backup_wins")
+                    cancel_rest()
+                    return self._response(future.result(), stream)
+                errors.append(future.exception())
+            if (not pending and len(used) < self.max_attempts and not deadline.expired
+                    and not isinstance(errors[-1], QuotaExceeded)):
+                # Fail over straight away instead of waiting for a hedge delay
+                launch()
+        if deadline.expired:
+            raise DeadlineExceeded(f"no model answer within {budget}s")
+        raise errors[-1] if errors else NoTargetAvailable("every model target's circuit breaker is open")
+
+    def _count(self, counter):
+        with self._counter_lock:
+            setattr(self._owner, counter, getattr(self._owner, counter) + 1)
+
+    @staticmethod
+    def _response(result, stream):
+        if not stream:
+            return result
+        first, chunks = result
+
+        def relay():
+            if first is None:
+                return
+            yield first
+            yield from chunks
+
+        return relay()
+
+    def snapshot(self):
+        """``[{target, state, calls, error_rate, ewma_ms, p95_ms}, ...]`` in pool order"""
+        rows = []
+        for target in self.targets:
+            p95 = target.stats.quantile(0.95, min_samples=1)
+            rows.append({
+                "target": target.name,
+                "state": target.breaker.state,
+                "calls": target.stats.calls,
+                "error_rate": round(target.stats.current_error_rate(), 3),
+                "ewma_ms": round(target.stats.latency_s * 1000, 1) if target.stats.latency_s else None,
+                "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            })
+        return rows
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _close_chunks(chunks):
+    if hasattr(chunks, "close"):
+        chunks.close()
+
+
+def _close_stream(future):
+    """Done-callback that closes a losing stream once its first chunk arrives"""
+    if not future.cancelled() and future.exception() is None:
+        _close_chunks(future.result()[1])
+
+
+def build_target(spec, **configure_options):
+    """``http://host:port`` -> RemoteStubModel; anything else is a Gemini model name"""
+    if spec.startswith(("http://", "https://")):
+        from querycraft.stub import RemoteStubModel
+        return Target(spec, RemoteStubModel(spec, model_name=spec))
+    from querycraft.client import build_model
+    return Target(spec, build_model(spec, **configure_options))
+
+
+def build_router(pool, api_key=None, **options):
+    """Router over a comma-separated ``pool`` of targets.
+
+    ``api_key`` and ``transport`` / ``client_options`` are passed to
+    ``build_model`` for Gemini targets. Any other keyword argument goes to Router.
+    """
+    configure_options = {key: options.pop(key) for key in ("transport", "client_options") if key in options}
+    if api_key is not None:
+        configure_options["api_key"] = api_key
+    specs = [spec.strip() for spec in pool.split(",") if spec.strip()]
+    return Router([build_target(spec, **configure_options) for spec in specs], **options)
+
+
+def router_from_env(default_pool, **configure_options):
+    """Router configured by ``QUERYCRAFT_MODEL_POOL``, ``QUERYCRAFT_DEADLINE_S`` and ``QUERYCRAFT_HEDGING``.
+
+    ``QUERYCRAFT_HEDGING`` is 1 (default: hedge across distinct targets), 0
+    (never hedge) or ``self`` (also hedge a target against itself).
+    """
+    hedging = os.getenv("QUERYCRAFT_HEDGING", "1").lower()
+    return build_router(
+        os.getenv("QUERYCRAFT_MODEL_POOL", default_pool),
+        deadline=float(os.getenv("QUERYCRAFT_DEADLINE_S", DEFAULT_DEADLINE_S)),
+        hedge=hedging not in ("0", "false", "no"),
+        self_hedge=hedging == "self",
+        **configure_options,
+    )
@@ -0,0 +1,380 @@
+# querycraft/rules.py
+"""Rule-based NL -> SQL for simple single-table questions.
+
+Questions such as "count rows in orders", "average salary by department" or
+"top 5 employees by salary" are parsed by a small keyword grammar over the
+vocabulary of a schema (table and column names). Every word of the question
+has to be accounted for - a keyword, a table, a column, a value or a filler
+word - otherwise the engine declines and the question goes to the model.
+Parsing a question is a dictionary walk over its words, well under a
+millisecond.
+
+With ``strict=False`` unknown words are skipped instead, which makes the
+engine a best-effort fallback when the model API is unavailable. Strict
+parsing also declines phrasings whose words it recognizes but cannot turn
+into a clause, such as ordering by an aggregate ("... ordered by count") or
+a superlative over rows ("employees with the highest salary").
+"""
+import functools
+import re
+
+from querycraft.schema import introspect, load_ddl, tokenize
+
+_TOKEN = re.compile(
+    r"'[^']*'|\"[^\"]*\"|\d{4}-\d{2}-\d{2}|\d+(?:\.\d+)?|[A-Za-z_][A-Za-z0-9_]*|[<>]=?|!=|="
+)
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+AGGREGATES = {
+    "how many": "COUNT",
+    "count": "COUNT",
+    "count of": "COUNT",
+    "number of": "COUNT",
+    "average": "AVG",
+    "avg": "AVG",
+    "mean": "AVG",
+    "total": "SUM",
+    "sum": "SUM",
+    "sum of": "SUM",
+    "maximum": "MAX",
+    "max": "MAX",
+    "highest": "MAX",
+    "largest": "MAX",
+    "minimum": "MIN",
+    "min": "MIN",
+    "lowest": "MIN",
+    "smallest": "MIN",
+}
+AGGREGATE_ALIASES = {"COUNT": "count", "AVG": "avg", "SUM": "total", "MAX": "max", "MIN": "min"}
+# "employees with the highest salary" asks for rows, not the aggregate
+SUPERLATIVES = frozenset(("highest", "largest", "lowest", "smallest"))
+
+OPERATORS = {
+    ">": ">", "greater than": ">", "more than": ">", "over": ">", "above": ">", "after": ">",
+    "<": "<", "less than": "<", "fewer than": "<", "under": "<", "below": "<", "before": "<",
+    ">=": ">=", "at least": ">=",
+    "<=": "<=", "at most": "<=",
+    "=": "=", "is": "=", "equals": "=", "equal to": "=",
+    "!=": "!=", "is not": "!=", "not": "!=",
+}
+
+# Comparative adjectives that imply a column: "older than 30" -> age > 30
+COMPARATIVES = {
+    "older than": ("age", ">"),
+    "younger than": ("age", "<"),
+}
+
+GROUP_WORDS = ("by", "per", "for each", "in each", "group by", "grouped by", "broken down by")
+ORDER_WORDS = ("order by", "ordered by", "sort by", "sorted by", "sorted on")
+LIMIT_WORDS = ("top", "first", "limit")
+DIRECTIONS = {
+    "asc": "ASC", "ascending": "ASC", "lowest first": "ASC", "smallest first": "ASC",
+    "desc": "DESC", "descending": "DESC", "highest first": "DESC", "largest first": "DESC",
+}
+# Words that start a condition; they also end a "by ..." list
+CONDITION_WORDS = frozenset(("where", "with", "whose", "having", "that", "who"))
+# Units allowed right after a value: "older than 30 years"
+UNITS = frozenset(("year", "old", "dollar", "day"))
+FILLERS = frozenset("""
+    a all an and any are did do does each entries every fetch find for from get give have has
+    in is list me of please record records retrieve return row rows select show table the
+    there what which display
+""".split()) | CONDITION_WORDS
+
+
+def _phrases(words):
+    """``{tuple_of_words: value}`` from a phrase-keyed mapping"""
+    if isinstance(words, dict):
+        return {tuple(phrase.split()): value for phrase, value in words.items()}
+    return {tuple(phrase.split()): True for phrase in words}
+
+
+# Precompiled once at import: phrase tuples, longest first when matching
+_AGGREGATES = _phrases(AGGREGATES)
+_OPERATORS = _phrases(OPERATORS)
+_COMPARATIVES = _phrases(COMPARATIVES)
+_GROUP = _phrases(GROUP_WORDS)
+_ORDER = _phrases(ORDER_WORDS)
+_LIMIT = _phrases(LIMIT_WORDS)
+_DIRECTIONS = _phrases(DIRECTIONS)
+_MAX_KEYWORD = max(len(phrase) for table in (_AGGREGATES, _OPERATORS, _COMPARATIVES, _GROUP,
+                                             _ORDER, _DIRECTIONS) for phrase in table)
+
+
+def _match(table, words, i, max_len):
+    """Longest phrase of ``table`` starting at ``words[i]``: ``(length, value)`` or ``(0, None)``"""
+    for length in range(min(max_len, len(words) - i), 0, -1):
+        value = table.get(tuple(words[i:i + length]))
+        if value is not None:
+            return length, value
+    return 0, None
+
+
+def _quote_identifier(name):
+    return name if _IDENTIFIER.fullmatch(name) else '"' + name.replace('"', '""') + '"'
+
+
+def _literal(token):
+    if token[0] in "'\"":
+        token = token[1:-1]
+    elif _NUMBER.fullmatch(token):
+        return token
+    return "'" + token.replace("'", "''") + "'"
+
+
+class _Query:
+    def __init__(self):
+        self.table = None
+        self.columns = []  # column candidates {table: column}
+        self.aggregates = []  # (function, candidates or None for COUNT(*))
+        self.filters = []  # (candidates, operator, literal)
+        self.group_by = []
+        self.order_by = []
+        self.direction = None
+        self.limit = None
+        self.limit_from_top = False
+
+
+class RuleEngine:
+    """Keyword grammar over one schema's tables and columns.
+
+    ``tables`` is ``{name: table_dict}`` as produced by ``querycraft.schema.introspect``.
+    """
+
+    def __init__(self, tables):
+        self.tables = tables
+        self._tables = {}
+        self._columns = {}
+        for name, table in tables.items():
+            self._tables.setdefault(tuple(tokenize(name)), name)
+            for column_name, _, _ in table["columns"]:
+                self._columns.setdefault(tuple(tokenize(column_name)), {})[name] = column_name
+        self._max_name = max((len(key) for key in (*self._tables, *self._columns)), default=1)
+
+    @classmethod
+    def from_index(cls, index):
+        return cls(index.tables)
+
+    @staticmethod
+    def _words(question):
+        tokens, words = [], []
+        for token in _TOKEN.findall(question):
+            if token[0].isalpha() or token[0] == "_":
+                terms = tokenize(token) or [token.lower()]
+                for term in terms:
+                    tokens.append(token)
+                    words.append(term)
+            else:
+                tokens.append(token)
+                words.append(token)
+        return tokens, words
+
+    def _parse(self, question, strict):
+        tokens, words = self._words(question)
+        query, mode, pending_aggregate = _Query(), None, None
+        last_column, last_list = None, None
+        after_condition = False
+        i = 0
+        while i < len(words):
+            word = words[i]
+            # <column> <operator> <value>, or <column> 'quoted value'
+            if last_column is not None:
+                length, operator = _match(_OPERATORS, words, i, _MAX_KEYWORD)
+                if not length and tokens[i][0] in "'\"":
+                    length, operator = 0, "="
+                if i + length < len(words) and operator is not None:
+                    value = tokens[i + length]
+                    if strict and words[i + length] in SUPERLATIVES:
+                        return None  # "whose salary is highest"
+                    if value.lower() not in FILLERS or value[0] in "'\"":
+                        i = self._skip_units(words, i + length + 1)
+                        if i < len(words) and _match(self._tables, words, i, self._max_name)[0]:
+                            # "departments with more than 10 employees" needs HAVING
+                            if strict:
+                                return None
+                            last_column = None
+                            continue
+                        query.filters.append((last_column, operator, _literal(value)))
+                        if last_list and last_list[-1] is last_column:
+                            last_list.pop()
+                        last_column = None
+                        continue
+            length, implied = _match(_COMPARATIVES, words, i, _MAX_KEYWORD)
+            if length and i + length < len(words):
+                column, operator = implied
+                candidates = self._columns.get((column,))
+                if candidates:
+                    value = tokens[i + length]
+                    if not (_NUMBER.fullmatch(value) or (_DATE.fullmatch(value) and self._dated(candidates))):
+                        if strict:
+                            return None  # "older than thirty" is not a value the grammar can compare
+                        i += length
+                        continue
+                    query.filters.append((candidates, operator, _literal(value)))
+                    i = self._skip_units(words, i + length + 1)
+                    continue
+            if word in CONDITION_WORDS:
+                mode, pending_aggregate = None, None
+                after_condition = True
+            length, _ = _match(_LIMIT, words, i, 1)
+            if length and i + 1 < len(words) and words[i + 1].isdigit():
+                query.limit = int(words[i + 1])
+                query.limit_from_top = word == "top"
+                i += 2
+                continue
+            length, direction = _match(_DIRECTIONS, words, i, _MAX_KEYWORD)
+            if length:
+                query.direction = direction
+                i += length
+                continue
+            length, _ = _match(_ORDER, words, i, _MAX_KEYWORD)
+            if length:
+                mode, pending_aggregate = "order", None
+                i += length
+                continue
+            length, _ = _match(_GROUP, words, i, _MAX_KEYWORD)
+            if length:
+                mode, pending_aggregate = "group", None
+                i += length
+                continue
+            length, function = _match(_AGGREGATES, words, i, _MAX_KEYWORD)
+            if length:
+                if strict and (mode is not None or (after_condition and word in SUPERLATIVES)):
+                    return None  # ordering or grouping by an aggregate, or a superlative over rows
+                pending_aggregate = function
+                if function == "COUNT":
+                    query.aggregates.append(("COUNT", None))
+                i += length
+                continue
+            length, candidates = _match(self._columns, words, i, self._max_name)
+            table_length, table = _match(self._tables, words, i, self._max_name)
+            if table_length > length or (table_length == length and table_length and query.table is None
+                                         and mode is None and pending_aggregate in (None, "COUNT")):
+                if query.table not in (None, table):
+                    return None  # joins are left to the model
+                query.table = table
+                last_column = None
+                if pending_aggregate == "COUNT":
+                    pending_aggregate = None  # "count employees": COUNT(*) over the table
+                i += table_length
+                continue
+            if length:
+                last_column = candidates
+                if mode == "group":
+                    last_list = query.group_by
+                elif mode == "order":
+                    last_list = query.order_by
+                elif pending_aggregate is not None:
+                    if pending_aggregate == "COUNT":
+                        query.aggregates.pop()
+                    query.aggregates.append((pending_aggregate, candidates))
+                    pending_aggregate, last_list = None, None
+                    i += length
+                    continue
+                else:
+                    last_list = query.columns
+                last_list.append(candidates)
+                i += length
+                continue
+            if word in FILLERS or not strict:
+                i += 1
+                continue
+            return None
+        if strict and pending_aggregate not in (None, "COUNT"):
+            return None  # an aggregate without a column to apply it to
+        return query
+
+    def _dated(self, candidates):
+        """Whether every candidate column is declared with a date or time type"""
+        for table, column in candidates.items():
+            declared = {name: (kind or "").upper() for name, kind, *_ in self.tables[table]["columns"]}
+            if not any(word in declared.get(column, "") for word in ("DATE", "TIME")):
+                return False
+        return True
+
+    @staticmethod
+    def _skip_units(words, i):
+        while i < len(words) and words[i] in UNITS:
+            i += 1
+        return i
+
+    def _resolve(self, query, strict):
+        references = list(query.columns)
+        references += [candidates for _, candidates in query.aggregates if candidates]
+        references += [candidates for candidates, _, _ in query.filters]
+        references += query.group_by + query.order_by
+        table = query.table
+        if table is None:
+            owners = set(self.tables)
+            for candidates in references:
+                owners &= set(candidates)
+            if len(owners) == 1 and (references or not strict):
+                table = owners.pop()
+            else:
+                return None
+        if not strict:
+            # Best effort: drop references the chosen table cannot satisfy
+            query.columns = [c for c in query.columns if table in c]
+            query.aggregates = [(f, c) for f, c in query.aggregates if c is None or table in c]
+            query.filters = [(c, op, v) for c, op, v in query.filters if table in c]
+            query.group_by = [c for c in query.group_by if table in c]
+            query.order_by = [c for c in query.order_by if table in c]
+        elif any(table not in candidates for candidates in references):
+            return None
+        return table
+
+    def convert(self, question, strict=True):
+        """Return SQL for ``question``, or None when the grammar cannot answer it confidently"""
+        query = self._parse(question, strict)
+        if query is None:
+            return None
+        table = self._resolve(query, strict)
+        if table is None:
+            return None
+
+        def column(candidates):
+            return _quote_identifier(candidates[table])
+
+        if query.aggregates:
+            select = [column(c) for c in query.group_by]
+            for function, candidates in query.aggregates:
+                if candidates is None:
+                    select.append(f"COUNT(*) AS {'count' if query.group_by else 'row_count'}")
+                else:
+                    alias = f"{AGGREGATE_ALIASES[function]}_{candidates[table]}"
+                    # "how many departments" counts distinct values, not rows with one
+                    argument = f"DISTINCT {column(candidates)}" if function == "COUNT" else column(candidates)
+                    select.append(f"{function}({argument}) AS {_quote_identifier(alias)}")
+            group_by = [column(c) for c in query.group_by]
+            order_by = [column(c) for c in query.order_by]
+        else:
+            # "top 5 employees by salary": without an aggregate, "by" means ordering
+            select = [column(c) for c in query.columns] or ["*"]
+            group_by = []
+            order_by = [column(c) for c in query.order_by + query.group_by]
+        direction = query.direction or ("DESC" if query.limit_from_top and order_by else None)
+
+        lines = [f"SELECT {', '.join(dict.fromkeys(select))} FROM {_quote_identifier(table)}"]
+        if query.filters:
+            lines.append("WHERE " + " AND ".join(f"{column(c)} {op} {value}" for c, op, value in query.filters))
+        if group_by:
+            lines.append(f"GROUP BY {', '.join(group_by)}")
+        if order_by:
+            lines.append(f"ORDER BY {', '.join(order_by)}" + (f" {direction}" if direction else ""))
+        if query.limit is not None:
+            lines.append(f"LIMIT {query.limit}")
+        return "\n".join(lines) + ";"
+
+
+@functools.lru_cache(maxsize=None)
+def demo_engine():
+    """Engine over the demo ``employees`` table the pages execute queries against"""
+    from querycraft.resources import DEMO_EMPLOYEES_DDL
+
+    conn, _ = load_ddl(DEMO_EMPLOYEES_DDL)
+    try:
+        return RuleEngine(introspect(conn))
+    finally:
+        conn.close()
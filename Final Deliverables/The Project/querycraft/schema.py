@@ -0,0 +1,305 @@
+# querycraft/schema.py
+"""Schema index for the database a user wants SQL for.
+
+A target database is registered either as a SQLite file or as a DDL dump.
+It is introspected into a compact index (tables, columns, types, foreign
+keys) that is cached as JSON on disk. Only tables whose CREATE statement
+changed are re-introspected on refresh. For each question a small TF-IDF
+ranker picks the top-k relevant tables, so the prompt stays small even for
+warehouses with hundreds of tables.
+"""
+import hashlib
+import json
+import math
+import os
+import re
+import sqlite3
+from collections import Counter, defaultdict
+
+DEFAULT_CACHE_DIR = os.path.join(".querycraft", "schemas")
+
+_CAMEL = re.compile(r"([a-z0-9])([A-Z])")
+_WORD = re.compile(r"[a-z]+|\d+")
+_NAME = re.compile(r"[A-Za-z0-9_-]+")
+
+
+def tokenize(text):
+    """Split identifiers and prose into lower-case, crudely singularized terms"""
+    words = _WORD.findall(_CAMEL.sub(r"\1 \2", text).lower())
+    terms = []
+    for word in words:
+        if len(word) > 3 and word.endswith("ies"):
+            word = word[:-3] + "y"
+        elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+
+def _fingerprint(text):
+    return hashlib.sha1((text or "").encode("utf-8")).hexdigest()
+
+
+def _quote(identifier):
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def introspect(conn, previous=None):
+    """Return ``{table_name: table_dict}`` for ``conn``.
+
+    Tables whose CREATE statement matches ``previous`` are reused as-is.
+    """
+    previous = previous or {}
+    tables = {}
+    rows = conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+    ).fetchall()
+    for name, sql in rows:
+        fingerprint = _fingerprint(sql)
+        cached = previous.get(name)
+        if cached is not None and cached["fingerprint"] == fingerprint:
+            tables[name] = cached
+            continue
+        columns = [
+            [col_name, col_type or "", bool(pk)]
+            for _, col_name, col_type, _, _, pk in conn.execute(f"PRAGMA table_info({_quote(name)})")
+        ]
+        foreign_keys = [
+            [from_col, ref_table, to_col]
+            for _, _, ref_table, from_col, to_col, *_ in conn.execute(
+                f"PRAGMA foreign_key_list({_quote(name)})"
+            )
+        ]
+        tables[name] = {
+            "name": name,
+            "columns": columns,
+            "foreign_keys": foreign_keys,
+            "fingerprint": fingerprint,
+        }
+    return tables
+
+
+def split_statements(ddl):
+    """Split a DDL dump into complete SQL statements"""
+    statements, current = [], ""
+    for line in ddl.splitlines(keepends=True):
+        current += line
+        if sqlite3.complete_statement(current):
+            statements.append(current.strip())
+            current = ""
+    if current.strip():
+        statements.append(current.strip())
+    return statements
+
+
+def load_ddl(ddl):
+    """Replay a DDL dump into an in-memory database; unsupported statements are skipped.
+
+    Returns ``(conn, skipped_count)``.
+    """
+    conn = sqlite3.connect(":memory:")
+    skipped = 0
+    for statement in split_statements(ddl):
+        try:
+            conn.execute(statement)
+        except sqlite3.Error:
+            skipped += 1
+    return conn, skipped
+
+
+class SchemaIndex:
+    """Introspected tables plus an inverted TF-IDF index over their vocabulary"""
+
+    def __init__(self, tables):
+        self.tables = tables
+        self._postings = defaultdict(list)
+        self._norms = {}
+        documents = {name: Counter(self._terms(table)) for name, table in tables.items()}
+        doc_freq = Counter(term for counts in documents.values() for term in counts)
+        total = len(documents)
+        self._idf = {term: math.log((1 + total) / (1 + df)) + 1 for term, df in doc_freq.items()}
+        for name, counts in documents.items():
+            weights = {term: (1 + math.log(tf)) * self._idf[term] for term, tf in counts.items()}
+            self._norms[name] = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+            for term, weight in weights.items():
+                self._postings[term].append((name, weight))
+
+    @staticmethod
+    def _terms(table):
+        # Table names count double: they are the strongest signal for "which table"
+        terms = tokenize(table["name"]) * 2
+        for column_name, _, _ in table["columns"]:
+            terms.extend(tokenize(column_name))
+        for _, ref_table, _ in table["foreign_keys"]:
+            terms.extend(tokenize(ref_table))
+        return terms
+
+    def rank(self, question, k=8):
+        """Return up to ``k`` ``(table_name, score)`` pairs, best first"""
+        scores = defaultdict(float)
+        for term, tf in Counter(tokenize(question)).items():
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            query_weight = (1 + math.log(tf)) * idf
+            for name, weight in self._postings[term]:
+                scores[name] += query_weight * weight
+        ranked = sorted(
+            ((name, score / self._norms[name]) for name, score in scores.items()),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+        return ranked[:k]
+
+    def relevant_tables(self, question, k=8):
+        return [self.tables[name] for name, _ in self.rank(question, k)]
+
+    def describe(self, question, k=8):
+        """Compact schema text for the top-k tables, or "" when nothing matches"""
+        return format_tables(self.relevant_tables(question, k))
+
+
+def format_tables(tables):
+    """One line per table: ``orders(id INTEGER PK, customer_id INTEGER -> customers.id)``"""
+    lines = []
+    for table in tables:
+        references = {from_col: f"{ref_table}.{to_col or 'id'}"
+                      for from_col, ref_table, to_col in table["foreign_keys"]}
+        columns = []
+        for column_name, column_type, pk in table["columns"]:
+            parts = [column_name]
+            if column_type:
+                parts.append(column_type)
+            if pk:
+                parts.append("PK")
+            if column_name in references:
+                parts.append(f"-> {references[column_name]}")
+            columns.append(" ".join(parts))
+        lines.append(f"{table['name']}({', '.join(columns)})")
+    return "\n".join(lines)
+
+
+class SchemaRegistry:
+    """Named target databases with their schema indexes cached on disk.
+
+    Each entry is stored as ``<cache_dir>/<name>.json`` together with a cheap
+    staleness marker: SQLite's ``schema_version`` for database files, or the
+    mtime and size of the stored DDL copy. Stale entries are re-introspected
+    incrementally, reusing every table whose CREATE statement is unchanged.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._indexes = {}
+        self._combined = {}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _cache_path(self, name):
+        if not _NAME.fullmatch(name):
+            raise ValueError("Schema names may only contain letters, digits, '_' and '-'")
+        return os.path.join(self.cache_dir, f"{name}.json")
+
+    def _ddl_path(self, name):
+        # Validated by _cache_path before anything is written under the name
+        return os.path.splitext(self._cache_path(name))[0] + ".sql"
+
+    def _load_entry(self, name):
+        path = self._cache_path(name)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def names(self):
+        return sorted(f[:-5] for f in os.listdir(self.cache_dir) if f.endswith(".json"))
+
+    def register_sqlite(self, name, db_path):
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(db_path)
+        return self._refresh(name, {"kind": "sqlite", "path": os.path.abspath(db_path)})
+
+    def register_ddl(self, name, ddl):
+        # Keep a copy of the DDL so the entry can be refreshed without the upload
+        ddl_path = os.path.abspath(self._ddl_path(name))
+        with open(ddl_path, "w", encoding="utf-8") as f:
+            f.write(ddl)
+        return self._refresh(name, {"kind": "ddl", "path": ddl_path})
+
+    def get(self, name):
+        """Return the current SchemaIndex for ``name``, refreshing it if the source changed"""
+        cached = self._indexes.get(name)
+        if cached is not None:
+            source = cached[0]
+        else:
+            entry = self._load_entry(name)
+            if entry is None:
+                raise KeyError(name)
+            source = entry["source"]
+        return self._refresh(name, source)
+
+    def connect(self, name):
+        """Read-only connection to ``name``'s database, or to its DDL replayed in memory"""
+        self.get(name)
+        return self._open_source(self._indexes[name][0])
+
+    def combined(self, names):
+        """One SchemaIndex over several registered schemas, rebuilt only when one of them changes"""
+        names = tuple(names)
+        parts = tuple(self.get(name) for name in names)
+        if len(parts) == 1:
+            return parts[0]
+        cached = self._combined.get(names)
+        if cached is not None and cached[0] == parts:
+            return cached[1]
+        tables = {}
+        for part in parts:
+            tables.update(part.tables)
+        index = SchemaIndex(tables)
+        self._combined[names] = (parts, index)
+        return index
+
+    def remove(self, name):
+        self._indexes.pop(name, None)
+        for path in (self._cache_path(name), self._ddl_path(name)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    @staticmethod
+    def _source_version(source):
+        if source["kind"] == "sqlite":
+            conn = sqlite3.connect(f"file:{source['path']}?mode=ro", uri=True)
+            try:
+                return str(conn.execute("PRAGMA schema_version").fetchone()[0])
+            finally:
+                conn.close()
+        stat = os.stat(source["path"])
+        return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+    @staticmethod
+    def _open_source(source):
+        if source["kind"] == "sqlite":
+            return sqlite3.connect(f"file:{source['path']}?mode=ro", uri=True)
+        with open(source["path"], encoding="utf-8") as f:
+            return load_ddl(f.read())[0]
+
+    def _refresh(self, name, source):
+        version = self._source_version(source)
+        cached = self._indexes.get(name)
+        if cached is not None and cached[0] == source and cached[1] == version:
+            return cached[2]
+
+        entry = self._load_entry(name)
+        if entry is not None and entry["source"] == source and entry["version"] == version:
+            tables = entry["tables"]
+        else:
+            conn = self._open_source(source)
+            try:
+                tables = introspect(conn, previous=entry["tables"] if entry else None)
+            finally:
+                conn.close()
+            with open(self._cache_path(name), "w", encoding="utf-8") as f:
+                json.dump({"source": source, "version": version, "tables": tables}, f)
+
+        index = SchemaIndex(tables)
+        self._indexes[name] = (source, version, index)
+        return index
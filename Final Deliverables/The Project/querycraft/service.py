@@ -0,0 +1,519 @@
+# querycraft/service.py
+"""Conversion pipeline as an asyncio HTTP/JSON service.
+
+The Streamlit pages block a script thread per session on the model call.
+This service runs the same Converter (rules fast path, prompt template,
+response cache, ``queries`` history) behind a small HTTP API:
+
+    POST /v1/convert        {"question": ..., "schema_target"?, "bypass_cache"?, "user_id"?, "session_id"?,
+                             "candidates"?, "conversation"?: [[question, sql], ...], "priority"?}
+    POST /v1/convert/batch  {"questions": [...], ...same options}  or  {"items": [{...}, ...]}
+    POST /v1/accept         {"query_id": ..., "question": ..., "sql": ...}
+    GET  /v1/health
+    GET  /metrics           Prometheus text from the service's tracer
+
+Conversions go through a bounded queue drained by a fixed number of
+workers, each running one conversion at a time in a thread. When the
+queue is full, new work is refused with 503 and ``Retry-After`` instead of
+piling up. A batch is admitted only as a whole. The model is wrapped in
+CoalescingModel, so identical prompts that are in flight at the same time
+share one upstream call. With ``"candidates": N`` the answer is voted on
+among N parallel generations, compared by their SQL (the service has no
+sandbox database to run them on). A non-empty ``"conversation"`` makes the
+question a follow-up that revises the last SQL in it. Model calls share the
+converter's QuotaScheduler, and a coalesced call takes budget once, for the
+caller that sent it upstream. Batch items default to ``"priority": "batch"``,
+so single conversions go first when the budget is tight.
+
+Run it with ``python -m querycraft.service --port 8765``, and point the
+Converter page at it with ``QUERYCRAFT_SERVICE_URL=http://127.0.0.1:8765``.
+"""
+import argparse
+import asyncio
+import json
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http import HTTPStatus
+
+from querycraft.pipeline import Conversation, ConversionResult
+from querycraft.quota import PRIORITIES, QuotaExceeded
+from querycraft.voting import Candidate
+
+MAX_BODY_BYTES = 1024 * 1024
+CONVERT_OPTIONS = ("schema_target", "bypass_cache", "user_id", "session_id", "candidates", "conversation",
+                   "priority")
+
+
+class SingleFlight:
+    """Run ``fn`` once per key among concurrent callers; the others wait for its outcome.
+
+    A waiting caller whose leader failed with one of ``retry_on`` runs its
+    own ``fn`` instead of sharing that error.
+    """
+
+    class _Call:
+        __slots__ = ("done", "result", "error")
+
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.shared = 0
+
+    def do(self, key, fn, retry_on=()):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+            else:
+                self.shared += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                if isinstance(call.error, retry_on):
+                    return fn()
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+
+class CoalescingModel:
+    """``generate_content`` wrapper that shares identical in-flight requests.
+
+    Streaming calls are passed through: a stream cannot be replayed to a
+    second reader.
+    """
+
+    def __init__(self, model, flights=None):
+        self.model = model
+        self.model_name = getattr(model, "model_name", None)
+        self.flights = flights or SingleFlight()
+
+    def rebind(self, wrap):
+        """Coalesce over ``wrap(model)``, sharing in-flight calls with this instance.
+
+        With QuotaScheduler.bind, only the call that goes upstream takes
+        budget; its followers are not charged. When that call is refused for
+        its own user's budget (QuotaExceeded), each follower tries again
+        under its own binding.
+        """
+        return CoalescingModel(wrap(self.model), self.flights)
+
+    def generate_content(self, prompt, generation_config=None, stream=False, request_options=None):
+        if stream:
+            return self.model.generate_content(prompt, generation_config=generation_config, stream=True,
+                                               request_options=request_options)
+        key = (prompt, json.dumps(generation_config, sort_keys=True, default=str))
+        return self.flights.do(key, lambda: self.model.generate_content(
+            prompt, generation_config=generation_config, request_options=request_options
+        ), retry_on=(QuotaExceeded,))
+
+
+def result_to_json(result):
+    return {
+        "question": result.question,
+        "sql": result.sql,
+        "query_id": result.query_id,
+        "source": result.source,
+        "from_cache": result.from_cache,
+        "ttft_ms": result.ttft_ms,
+        "latency_ms": result.latency_ms,
+        "prompt_tokens": result.prompt_tokens,
+        "schema_tables": result.schema_tables,
+        "error": result.error,
+        "candidates": [candidate.to_json() for candidate in result.candidates],
+    }
+
+
+def result_from_json(payload):
+    return ConversionResult(
+        payload["question"], payload["sql"], payload.get("query_id"), payload.get("from_cache", False),
+        payload.get("ttft_ms"), payload.get("latency_ms"), payload.get("schema_tables") or (),
+        payload.get("prompt_tokens", 0), payload.get("source", "model"), payload.get("error"),
+        [Candidate(**candidate) for candidate in payload.get("candidates") or ()],
+    )
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class ConversionService:
+    """Bounded-queue asyncio front end for a Converter"""
+
+    def __init__(self, converter, workers=8, queue_size=64, max_batch=100):
+        self.converter = converter
+        self.workers = workers
+        self.queue_size = queue_size
+        self.max_batch = max_batch
+        self.completed = 0
+        self.rejected = 0
+        self._queue = None
+        self._tasks = []
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="querycraft-service")
+        self._server = None
+
+    # --- queue and workers ---
+
+    async def start(self, host="127.0.0.1", port=8765):
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server
+
+    @property
+    def address(self):
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _work(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            options, future = await self._queue.get()
+            try:
+                if not future.cancelled():
+                    result = await loop.run_in_executor(self._executor, partial(self.converter.convert, **options))
+                    self.completed += 1
+                    if not future.cancelled():
+                        future.set_result(result)
+            except Exception as e:
+                if not future.cancelled():
+                    future.set_exception(e)
+            finally:
+                self._queue.task_done()
+
+    def _admit(self, jobs):
+        """Queue every job or none; raises 503 when the queue cannot take them all"""
+        if self._queue.maxsize - self._queue.qsize() < len(jobs):
+            self.rejected += len(jobs)
+            raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, "conversion queue is full", {"Retry-After": "1"})
+        loop = asyncio.get_running_loop()
+        futures = []
+        for options in jobs:
+            future = loop.create_future()
+            self._queue.put_nowait((options, future))
+            futures.append(future)
+        return futures
+
+    # --- API ---
+
+    @staticmethod
+    def _job(item, defaults=None):
+        if not isinstance(item, dict):
+            item = {"question": item}
+        question = item.get("question")
+        if not isinstance(question, str) or not question.strip():
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "'question' must be a non-empty string")
+        options = {name: value for name, value in (defaults or {}).items() if name in CONVERT_OPTIONS}
+        options.update({name: item[name] for name in CONVERT_OPTIONS if name in item})
+        candidates = options.get("candidates")
+        if candidates is not None and (not isinstance(candidates, int) or candidates < 1):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "'candidates' must be a positive integer")
+        turns = options.get("conversation")
+        if turns is not None:
+            if not isinstance(turns, list) or not all(
+                    isinstance(turn, list) and len(turn) == 2 and all(isinstance(v, str) for v in turn)
+                    for turn in turns):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "'conversation' must be a list of [question, sql] pairs")
+            options["conversation"] = Conversation([tuple(turn) for turn in turns])
+        if options.get("priority") not in (None,) + PRIORITIES:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"'priority' must be one of {', '.join(PRIORITIES)}")
+        options["question"] = question
+        return options
+
+    async def convert(self, body):
+        (future,) = self._admit([self._job(body)])
+        try:
+            return result_to_json(await future)
+        except Exception as e:
+            raise HTTPError(HTTPStatus.BAD_GATEWAY, f"conversion failed: {e}") from e
+
+    async def convert_batch(self, body):
+        items = body.get("items") if "items" in body else body.get("questions")
+        if not isinstance(items, list) or not items:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "expected a non-empty 'questions' or 'items' list")
+        if len(items) > self.max_batch:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"at most {self.max_batch} questions per batch")
+        futures = self._admit([self._job(item, {"priority": "batch", **body}) for item in items])
+        results = []
+        for outcome in await asyncio.gather(*futures, return_exceptions=True):
+            if isinstance(outcome, Exception):
+                results.append({"error": str(outcome)})
+            else:
+                results.append(result_to_json(outcome))
+        return {"results": results}
+
+    async def accept(self, body):
+        try:
+            query_id, question, sql = body["query_id"], body["question"], body["sql"]
+        except KeyError as e:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"missing {e.args[0]!r}") from e
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self.converter.accept, query_id, question, sql)
+        return {"accepted": query_id}
+
+    def health(self):
+        model = self.converter.model
+        flights = getattr(model, "flights", None)
+        scheduler = getattr(self.converter, "scheduler", None)
+        return {
+            "status": "ok",
+            "queued": self._queue.qsize(),
+            "queue_size": self.queue_size,
+            "workers": self.workers,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "in_flight_prompts": flights.in_flight() if flights else None,
+            "coalesced": flights.shared if flights else None,
+            "quota": scheduler.snapshot() if scheduler else None,
+        }
+
+    async def _dispatch(self, method, path, body):
+        routes = {
+            ("POST", "/v1/convert"): self.convert,
+            ("POST", "/v1/convert/batch"): self.convert_batch,
+            ("POST", "/v1/accept"): self.accept,
+        }
+        if method == "GET" and path == "/v1/health":
+            return "application/json", json.dumps(self.health()).encode()
+        if method == "GET" and path == "/metrics":
+            return "text/plain; version=0.0.4", self.converter.tracer.to_prometheus().encode()
+        handler = routes.get((method, path))
+        if handler is None:
+            known = {route_path for _, route_path in routes} | {"/v1/health", "/metrics"}
+            status = HTTPStatus.METHOD_NOT_ALLOWED if path in known else HTTPStatus.NOT_FOUND
+            raise HTTPError(status, f"{method} {path} is not supported")
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError as e:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"invalid JSON: {e}") from e
+        if not isinstance(payload, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "expected a JSON object")
+        return "application/json", json.dumps(await handler(payload)).encode()
+
+    # --- HTTP/1.1 over asyncio streams (keep-alive, Content-Length bodies) ---
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                    length = int(headers.get("content-length", 0))
+                except ValueError:
+                    await self._respond(writer, HTTPStatus.BAD_REQUEST, {"error": "malformed request"}, False)
+                    break
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                        {"error": "request body too large"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                try:
+                    content_type, payload = await self._dispatch(method, target.split("?")[0], body)
+                    await self._respond(writer, HTTPStatus.OK, payload, keep_alive, content_type)
+                except HTTPError as e:
+                    await self._respond(writer, e.status, {"error": str(e)}, keep_alive, headers=e.headers)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer, status, payload, keep_alive, content_type="application/json", headers=None):
+        if not isinstance(payload, bytes):
+            payload = json.dumps(payload).encode()
+        lines = [
+            f"HTTP/1.1 {status.value} {status.phrase}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(payload)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + payload)
+        await writer.drain()
+
+
+class ServiceError(RuntimeError):
+    """Non-200 answer from the conversion service; ``status`` is the HTTP code"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class ServiceClient:
+    """Converter look-alike that sends conversions to a running ConversionService.
+
+    Streaming is not offered by the service: ``on_partial`` is called once
+    with the final SQL. ``trace_id`` stays local; the service traces with its own tracer.
+    ``sandbox`` is ignored: the service compares voting ``candidates`` by their SQL.
+    A ``conversation``'s turns are sent along and the answer is added to it locally.
+    """
+
+    def __init__(self, url, timeout=60.0):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _post(self, path, payload):
+        request = urllib.request.Request(
+            self.url + path, data=json.dumps(payload).encode(), headers={"Content-Type": "application/json"}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get("error", e.reason)
+            except ValueError:
+                message = e.reason
+            raise ServiceError(e.code, f"conversion service: HTTP {e.code}: {message}") from e
+
+    def convert(self, question, schema_target=None, stream=False, on_partial=None, bypass_cache=False,
+                trace_id=None, user_id=None, session_id=None, candidates=None, sandbox=None, conversation=None,
+                priority="interactive"):
+        result = result_from_json(self._post("/v1/convert", {
+            "question": question,
+            "schema_target": schema_target,
+            "bypass_cache": bypass_cache,
+            "user_id": user_id,
+            "session_id": session_id,
+            "candidates": candidates,
+            "conversation": [list(turn) for turn in conversation.turns] if conversation else None,
+            "priority": priority,
+        }))
+        if conversation is not None:
+            conversation.add(result.question, result.sql)
+        if on_partial is not None:
+            on_partial(result.sql)
+        return result
+
+    def convert_many(self, questions, **options):
+        """One batch request; items that failed come back as ServiceError instances"""
+        payload = self._post("/v1/convert/batch", {"questions": list(questions), **options})
+        return [
+            ServiceError(HTTPStatus.BAD_GATEWAY, item["error"]) if "sql" not in item else result_from_json(item)
+            for item in payload["results"]
+        ]
+
+    def accept(self, query_id, question, sql):
+        self._post("/v1/accept", {"query_id": query_id, "question": question, "sql": sql})
+
+
+def build_converter(model, model_name, db_path="querycraft.db", scheduler=None):
+    """The Converter page's pipeline (cache, history, examples, schemas, rules) around ``model``.
+
+    ``scheduler`` (quota.QuotaScheduler) budgets the model calls of all clients together.
+    """
+    from querycraft.cache import ResponseCache
+    from querycraft.examples import ExampleStore
+    from querycraft.history import HistoryStore
+    from querycraft.pipeline import Converter
+    from querycraft.resources import ConnectionPool
+    from querycraft.rules import demo_engine
+    from querycraft.schema import SchemaRegistry
+    from querycraft.tracing import Tracer
+
+    history = HistoryStore(ConnectionPool(db_path))
+    examples = ExampleStore()
+    examples.extend(history.accepted_examples())
+    return Converter(
+        CoalescingModel(model),
+        model_name,
+        cache=ResponseCache(db_path),
+        history=history,
+        examples=examples,
+        schemas=SchemaRegistry(),
+        tracer=Tracer.from_env(),
+        rules=demo_engine(),
+        scheduler=scheduler,
+    )
+
+
+async def serve(converter, host="127.0.0.1", port=8765, **options):
+    service = ConversionService(converter, **options)
+    server = await service.start(host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve QueryCraft conversions over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--db", default="querycraft.db")
+    parser.add_argument("--model", default="gemini-1.5-flash",
+                        help="model name, or a comma-separated pool (see querycraft.routing)")
+    parser.add_argument("--workers", type=int, default=8, help="conversions running at once")
+    parser.add_argument("--queue-size", type=int, default=64, help="waiting conversions before 503s")
+    parser.add_argument("--max-batch", type=int, default=100)
+    parser.add_argument("--no-quota", action="store_true",
+                        help="no request/token budgets (QUERYCRAFT_RPM and friends otherwise apply)")
+    parser.add_argument("--stub", action="store_true", help="use the offline stub model")
+    parser.add_argument("--stub-latency", type=float, default=0.05)
+    args = parser.parse_args(argv)
+
+    if args.stub:
+        from querycraft.stub import StubModel
+        model = StubModel(latency=args.stub_latency)
+    else:
+        from querycraft.routing import build_router
+        model = build_router(args.model)
+    scheduler = None
+    if not args.no_quota:
+        from querycraft.quota import scheduler_from_env
+        from querycraft.resources import ConnectionPool
+        scheduler = scheduler_from_env(ConnectionPool(args.db))
+    converter = build_converter(model, args.model.split(",")[0], args.db, scheduler)
+    print(f"QueryCraft conversion service on http://{args.host}:{args.port}")
+    try:
+        asyncio.run(serve(converter, args.host, args.port, workers=args.workers, queue_size=args.queue_size,
+                          max_batch=args.max_batch))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
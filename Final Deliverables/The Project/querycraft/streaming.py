@@ -0,0 +1,80 @@
+# querycraft/streaming.py
+"""Helpers for rendering streamed Gemini output as it arrives."""
+import time
+
+PREAMBLE = "sql query:"
+FENCE = "```"
+
+
+def strip_preamble(text, final=True):
+    """Remove the "SQL Query:" line and markdown fences the template asks for.
+
+    With ``final=False`` the text is treated as an incomplete stream: a partial
+    preamble or fence at the edges is held back instead of being shown.
+    """
+    body = text.lstrip()
+    for _ in range(2):  # the preamble and an opening fence, in either order
+        head = body[:len(PREAMBLE)].lower()
+        if body.startswith(FENCE):
+            newline = body.find("\n")
+            if newline == -1:
+                return ""
+            body = body[newline + 1:].lstrip()
+        elif head == PREAMBLE:
+            body = body[len(PREAMBLE):].lstrip()
+        elif not final and (FENCE.startswith(body) or PREAMBLE.startswith(head)):
+            return ""
+        else:
+            break
+
+    closing = body.find(FENCE)
+    if closing != -1:
+        body = body[:closing]
+    elif not final:
+        body = body.rstrip("`")
+    return body.strip()
+
+
+class EmptyResponse(ValueError):
+    """The model's answer held no SQL once the preamble and fences were removed"""
+
+
+def final_sql(text):
+    """``strip_preamble(text)``, raising EmptyResponse instead of returning "" """
+    body = strip_preamble(text)
+    if not body:
+        raise EmptyResponse("The model returned no SQL.")
+    return body
+
+
+class StreamedResponse:
+    """Iterate over a streamed ``generate_content`` call, yielding cleaned partial SQL.
+
+    ``start_stream`` is called when iteration starts, and time-to-first-token
+    and total latency are measured from then. Both are set once iteration
+    ends, even early; a stream without chunks reports its latency as both.
+    ``text`` raises EmptyResponse when the stream produced no SQL.
+    """
+
+    def __init__(self, start_stream):
+        self._start_stream = start_stream
+        self.raw = ""
+        self.ttft_ms = None
+        self.latency_ms = None
+
+    def __iter__(self):
+        started = time.perf_counter()
+        try:
+            for chunk in self._start_stream():
+                if self.ttft_ms is None:
+                    self.ttft_ms = (time.perf_counter() - started) * 1000
+                self.raw += chunk.text
+                yield strip_preamble(self.raw, final=False)
+        finally:
+            self.latency_ms = (time.perf_counter() - started) * 1000
+            if self.ttft_ms is None:
+                self.ttft_ms = self.latency_ms
+
+    @property
+    def text(self):
+        return final_sql(self.raw)
@@ -0,0 +1,232 @@
+# querycraft/stub.py
+"""Offline stand-ins for ``genai.GenerativeModel`` used by tests, batch dry-runs and benchmarks.
+
+``StubModel`` answers in-process. ``StubServer`` serves the same behaviour
+over local HTTP and ``RemoteStubModel`` talks to it, so benchmarks also pay
+for sockets, JSON and thread hand-off like a real API client would.
+"""
+import json
+import math
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_SQL = "SQL Query:\nSELECT name, age FROM employees\nWHERE age > 30;\n"
+
+
+class StubError(Exception):
+    """Raised by the stubs to simulate a failed API call"""
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class LatencyDistribution:
+    """Samples simulated response latency in seconds.
+
+    Specs accepted by :meth:`parse`:
+        constant:0.05
+        uniform:0.02,0.08
+        normal:0.05,0.01          (mean, stddev; clipped at 0)
+        lognormal:0.05,0.6        (median, sigma) - long tail like real APIs
+    """
+
+    KINDS = ("constant", "uniform", "normal", "lognormal")
+
+    def __init__(self, kind="constant", a=0.05, b=0.0):
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown latency distribution {kind!r}; expected one of {self.KINDS}")
+        self.kind = kind
+        self.a = a
+        self.b = b
+
+    @classmethod
+    def parse(cls, spec):
+        kind, _, params = spec.partition(":")
+        values = [float(v) for v in params.split(",") if v.strip()]
+        return cls(kind, *values)
+
+    def sample(self, rng):
+        if self.kind == "constant":
+            value = self.a
+        elif self.kind == "uniform":
+            value = rng.uniform(self.a, self.b)
+        elif self.kind == "normal":
+            value = rng.gauss(self.a, self.b)
+        else:
+            value = self.a * math.exp(rng.gauss(0.0, self.b))
+        return max(0.0, value)
+
+    def __repr__(self):
+        return f"{self.kind}:{self.a},{self.b}"
+
+
+def _as_distribution(latency, jitter):
+    if isinstance(latency, LatencyDistribution):
+        return latency
+    if isinstance(latency, str):
+        return LatencyDistribution.parse(latency)
+    if jitter:
+        return LatencyDistribution("uniform", max(0.0, latency - jitter), latency + jitter)
+    return LatencyDistribution("constant", latency)
+
+
+def _chunks(text, chunk_size=16):
+    return [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)] or [""]
+
+
+class StubModel:
+    """Mimics ``generate_content`` with configurable latency and failure rate.
+
+    ``latency`` is seconds (optionally +/- ``jitter``), a LatencyDistribution or
+    a spec string for one; ``token_latency`` adds seconds per prompt token, like
+    a real model's prefill. ``responder`` maps the prompt to the response text;
+    by default every prompt gets the same SELECT over the demo ``employees`` table.
+    """
+
+    def __init__(self, latency=0.05, jitter=0.0, error_rate=0.0, responder=None,
+                 model_name="stub", seed=None, token_latency=0.0):
+        self.latency = _as_distribution(latency, jitter)
+        self.token_latency = token_latency
+        self.error_rate = error_rate
+        self.responder = responder or (lambda prompt: DEFAULT_SQL)
+        self.model_name = model_name
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _draw(self):
+        with self._lock:
+            self.calls += 1
+            return self.latency.sample(self._random), self._random.random() < self.error_rate
+
+    def generate_content(self, prompt, generation_config=None, stream=False, request_options=None):
+        delay, fail = self._draw()
+        delay += self.token_latency * math.ceil(len(prompt) / 4)  # same estimate as prompts.estimate_tokens
+        timeout = (request_options or {}).get("timeout")
+        if timeout is not None and delay > timeout:
+            # Like a client-side timeout: give up once the caller's budget is spent
+            time.sleep(timeout)
+            raise StubError(f"stub model: no answer within {timeout:.3f}s")
+        if fail:
+            time.sleep(delay)
+            raise StubError("stub model: injected failure")
+        text = self.responder(prompt)
+        if stream:
+            return self._stream(text, delay)
+        time.sleep(delay)
+        return StubResponse(text)
+
+    def _stream(self, text, delay):
+        chunks = _chunks(text)
+        for chunk in chunks:
+            time.sleep(delay / len(chunks))
+            yield StubResponse(chunk)
+
+
+class StubServer:
+    """Local HTTP stub of the model API, run in a background thread.
+
+    ``POST /generate`` with ``{"prompt": ..., "stream": bool}`` answers with
+    ``{"text": ...}``, or with newline-delimited ``{"text": chunk}`` objects when
+    streaming. Injected failures return HTTP 503.
+    """
+
+    def __init__(self, latency=0.05, jitter=0.0, error_rate=0.0, responder=None,
+                 host="127.0.0.1", port=0, seed=None):
+        self.model = StubModel(latency, jitter, error_rate, responder, seed=seed)
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        model = self.model
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                if self.path != "/generate":
+                    self.send_error(404)
+                    return
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                try:
+                    if body.get("stream"):
+                        chunks = model.generate_content(body["prompt"], stream=True)
+                        self.send_response(200)
+                        self.send_header("Content-Type", "application/x-ndjson")
+                        self.end_headers()
+                        for chunk in chunks:
+                            self.wfile.write(json.dumps({"text": chunk.text}).encode() + b"\n")
+                            self.wfile.flush()
+                        return
+                    payload = json.dumps({"text": model.generate_content(body["prompt"]).text}).encode()
+                except StubError as e:
+                    payload = json.dumps({"error": str(e)}).encode()
+                    self.send_response(503)
+                else:
+                    self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class RemoteStubModel:
+    """``generate_content`` client for a running StubServer"""
+
+    def __init__(self, url, model_name="stub-http", timeout=30.0):
+        self.url = url.rstrip("/") + "/generate"
+        self.model_name = model_name
+        self.timeout = timeout
+
+    def generate_content(self, prompt, generation_config=None, stream=False, request_options=None):
+        timeout = (request_options or {}).get("timeout", self.timeout)
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps({"prompt": prompt, "stream": stream}).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            response = urllib.request.urlopen(request, timeout=timeout)
+        except urllib.error.HTTPError as e:
+            raise StubError(f"stub server: HTTP {e.code}") from e
+        if stream:
+            return self._stream(response)
+        with response:
+            return StubResponse(json.loads(response.read())["text"])
+
+    @staticmethod
+    def _stream(response):
+        with response:
+            for line in response:
+                if line.strip():
+                    yield StubResponse(json.loads(line)["text"])
@@ -0,0 +1,209 @@
+# querycraft/tracing.py
+"""Lightweight per-stage tracing for the conversion pipeline.
+
+Wrap each stage in ``tracer.span("stage")``. While the tracer is disabled,
+``span()`` hands back a shared no-op object, so instrumented code pays only
+one method call. While it is enabled, durations and any recorded values
+(token counts, response sizes) go into in-process histograms and a buffer
+of raw samples. The samples can be flushed to the ``metrics`` table, and
+the histograms exported in Prometheus text format.
+"""
+import bisect
+import os
+import threading
+import time
+import uuid
+
+from querycraft.db import ensure_metrics_table
+
+DURATION_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+SIZE_BUCKETS = tuple(2 ** exponent for exponent in range(4, 19))  # 16 .. 262144
+
+
+class Histogram:
+    """Fixed-bucket histogram (Prometheus-style upper bounds)"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (None when empty)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def record(self, metric, value):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    __slots__ = ("_tracer", "stage", "trace_id", "values", "_started")
+
+    def __init__(self, tracer, stage, trace_id):
+        self._tracer = tracer
+        self.stage = stage
+        self.trace_id = trace_id
+        self.values = {}
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._tracer._finish(self, (time.perf_counter() - self._started) * 1000)
+        return False
+
+    def record(self, metric, value):
+        """Attach a measurement such as ``prompt_tokens`` or ``response_bytes``"""
+        self.values[metric] = value
+
+
+class Tracer:
+    def __init__(self, enabled=False, max_buffered=10000):
+        self.enabled = enabled
+        self.max_buffered = max_buffered
+        self._histograms = {}
+        self._buffer = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(enabled=os.getenv("QUERYCRAFT_TRACING", "").lower() in ("1", "true", "yes"))
+
+    @staticmethod
+    def new_trace():
+        return uuid.uuid4().hex
+
+    def span(self, stage, trace_id=None):
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, stage, trace_id)
+
+    def _histogram(self, stage, metric):
+        key = (stage, metric)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            buckets = DURATION_BUCKETS_MS if metric == "duration_ms" else SIZE_BUCKETS
+            histogram = self._histograms[key] = Histogram(buckets)
+        return histogram
+
+    def _finish(self, span, duration_ms):
+        now = time.time()
+        samples = [("duration_ms", duration_ms)] + list(span.values.items())
+        with self._lock:
+            for metric, value in samples:
+                self._histogram(span.stage, metric).observe(value)
+                if len(self._buffer) < self.max_buffered:
+                    self._buffer.append((now, span.trace_id, span.stage, metric, value))
+
+    def snapshot(self):
+        """``[{stage, metric, count, mean, p50, p95}, ...]`` sorted by stage"""
+        with self._lock:
+            items = sorted(self._histograms.items())
+            return [
+                {
+                    "stage": stage,
+                    "metric": metric,
+                    "count": h.count,
+                    "mean": round(h.sum / h.count, 2) if h.count else None,
+                    "p50": h.quantile(0.5),
+                    "p95": h.quantile(0.95),
+                }
+                for (stage, metric), h in items
+            ]
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._buffer.clear()
+
+    def flush(self, conn):
+        """Write buffered raw samples to the ``metrics`` table"""
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+        if not rows:
+            return 0
+        ensure_metrics_table(conn)
+        conn.executemany(
+            "INSERT INTO metrics (recorded_at, trace_id, stage, metric, value) VALUES (?, ?, ?, ?, ?)",
+            rows,
+        )
+        conn.commit()
+        return len(rows)
+
+    def to_prometheus(self):
+        lines = []
+        with self._lock:
+            by_metric = {}
+            for (stage, metric), histogram in sorted(self._histograms.items()):
+                by_metric.setdefault(metric, []).append((stage, histogram))
+            for metric, entries in by_metric.items():
+                name = f"querycraft_{metric}"
+                lines.append(f"# TYPE {name} histogram")
+                for stage, histogram in entries:
+                    cumulative = 0
+                    for bound, bucket_count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+                        cumulative += bucket_count
+                        lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.sum}')
+                    lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Atomically replace ``path`` with the current Prometheus text dump"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+
+def serve_metrics(tracer, port, host="127.0.0.1"):
+    """Serve ``GET /metrics`` for Prometheus from a background thread; returns the server"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            payload = tracer.to_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,213 @@
+# querycraft/voting.py
+"""Several model answers per question, settled by what they return.
+
+One ``generate_content`` call sometimes produces SQL that does not run, or
+runs far slower than it needs to. With voting, N candidates are requested
+in parallel, each with its own temperature and prompt hint (VARIANTS).
+Every answer is validated (CheckedQuery) and executed on the sandbox
+database within ``limits``. Answers that return the same rows fall into the
+same cluster; the largest cluster wins, ties going to the cluster with the
+fastest run, and the fastest member of that cluster is returned.
+
+Without a database to run on, candidates are clustered by their normalized
+SQL instead. Identical SQL is executed once per selection.
+"""
+import hashlib
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from querycraft.dialects import CheckedQuery, InvalidSQLError
+from querycraft.execution import ExecutionLimits, QueryTimeout, UnsafeQueryError, execute_query
+
+# (name, temperature, prompt hint); candidate i uses VARIANTS[i], so N is at most len(VARIANTS)
+VARIANTS = [
+    ("baseline", 0.0, ""),
+    ("check-joins", 0.4, "Before answering, check every join condition and filter against the schema."),
+    ("simplest", 0.6, "Prefer the simplest query that answers the question; avoid needless joins and subqueries."),
+    ("explicit", 0.8, "Qualify every column with its table name and list the selected columns explicitly."),
+    ("explore", 1.0, ""),
+]
+
+# Candidates only need to be told apart, so they get a tighter budget than the demo runs
+VOTING_LIMITS = ExecutionLimits(timeout_s=1.0, max_rows=5000, max_bytes=4 * 1024 * 1024, page_size=500)
+
+
+class Candidate:
+    """One generated answer. ``outcome`` is "ok", "invalid" (rejected SQL),
+    "error" / "timeout" (while executing) or "failed" (the model call).
+
+    ``latency_ms`` is the model call, ``exec_ms`` the sandbox run;
+    ``signature`` identifies the result and ``cluster_size`` counts the
+    candidates that share it.
+    """
+
+    def __init__(self, index, variant, temperature, text=None, latency_ms=None, exec_ms=None, outcome="failed",
+                 error=None, signature=None, cluster_size=0, chosen=False):
+        self.index = index
+        self.variant = variant
+        self.temperature = temperature
+        self.text = text
+        self.latency_ms = latency_ms
+        self.exec_ms = exec_ms
+        self.outcome = outcome
+        self.error = error
+        self.signature = signature
+        self.cluster_size = cluster_size
+        self.chosen = chosen
+
+    def to_json(self):
+        return dict(vars(self))
+
+
+class Selection:
+    """The candidates of one question and the one chosen among them"""
+
+    def __init__(self, candidates, winner):
+        self.candidates = candidates
+        self.winner = winner
+
+    @property
+    def text(self):
+        return self.winner.text
+
+    @property
+    def agreement(self):
+        """Share of candidates that returned the chosen result"""
+        return self.winner.cluster_size / len(self.candidates)
+
+
+def _canonical(value):
+    # 3 and 3.0, or an AVG summed in another order, are the same answer
+    if isinstance(value, float):
+        return int(value) if value.is_integer() else round(value, 6)
+    return value
+
+
+def result_signature(result, ordered=False):
+    """Hash of a ResultSet's values; column names are ignored and rows are sorted unless ``ordered``"""
+    rows = [
+        tuple(_canonical(value) for value in row)
+        for page in result.pages
+        for row in zip(*(page[column] for column in result.columns))
+    ]
+    if not ordered:
+        rows.sort(key=repr)
+    payload = repr((len(result.columns), result.truncated, rows)).encode("utf-8")
+    return hashlib.blake2b(payload, digest_size=12).hexdigest()
+
+
+def vote(candidates):
+    """Mark clusters and the winner on ``candidates`` and return the winner.
+
+    When nothing ran cleanly, the first candidate with parseable SQL (then
+    any answer at all) is returned so the user still sees something.
+    """
+    clusters = {}
+    for candidate in candidates:
+        if candidate.outcome == "ok":
+            clusters.setdefault(candidate.signature, []).append(candidate)
+    for members in clusters.values():
+        for candidate in members:
+            candidate.cluster_size = len(members)
+
+    def speed(candidate):
+        return (candidate.exec_ms if candidate.exec_ms is not None else 0.0, candidate.index)
+
+    if clusters:
+        fastest = [min(members, key=speed) for members in clusters.values()]
+        # Most votes first, then the fastest run (then the earliest candidate)
+        winner = min(fastest, key=lambda c: (-c.cluster_size, *speed(c)))
+    else:
+        answered = [c for c in candidates if c.text is not None]
+        runnable = [c for c in answered if c.outcome in ("error", "timeout")]
+        winner = (runnable or answered or [None])[0]
+        if winner is None:
+            return None
+    winner.chosen = True
+    return winner
+
+
+class CandidateSelector:
+    """Generates, runs and votes on up to ``len(variants)`` candidates per prompt.
+
+    Model calls run on a shared pool of ``max_workers`` threads, and each
+    worker executes its own candidate as soon as it arrives.
+    """
+
+    def __init__(self, model, variants=VARIANTS, limits=VOTING_LIMITS, max_workers=8):
+        self.model = model
+        self.variants = list(variants)
+        self.limits = limits
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="querycraft-vote")
+
+    def _generate(self, model, candidate, prompt, hint, deadline):
+        options = {"generation_config": {"temperature": candidate.temperature}}
+        if deadline is not None:
+            options["request_options"] = {"timeout": deadline}
+        started = time.perf_counter()
+        try:
+            candidate.text = model.generate_content(f"{prompt}\n{hint}\n" if hint else prompt, **options).text
+        except Exception as e:
+            candidate.error = str(e)
+        candidate.latency_ms = (time.perf_counter() - started) * 1000
+
+    def _run(self, model, candidate, prompt, hint, connect, deadline, runs):
+        self._generate(model, candidate, prompt, hint, deadline)
+        if candidate.text is None:
+            return candidate
+        try:
+            checked = CheckedQuery(candidate.text)
+        except (InvalidSQLError, UnsafeQueryError) as e:
+            candidate.outcome, candidate.error = "invalid", str(e)
+            return candidate
+        key = checked.to("sqlite", pretty=False)
+        if connect is None:
+            candidate.outcome = "ok"
+            candidate.signature = hashlib.blake2b(key.encode("utf-8"), digest_size=12).hexdigest()
+            return candidate
+        # Identical SQL from several candidates is executed once, by whoever registered it first
+        mine = Future()
+        future = runs.setdefault(key, mine)
+        if future is mine:
+            try:
+                conn = connect()
+                try:
+                    result = execute_query(conn, checked, self.limits)
+                finally:
+                    conn.close()
+                ordered = checked.tree.args.get("order") is not None
+                future.set_result((result.elapsed_ms, result_signature(result, ordered)))
+            except Exception as e:
+                future.set_exception(e)
+        try:
+            candidate.exec_ms, candidate.signature = future.result()
+            candidate.outcome = "ok"
+        except QueryTimeout as e:
+            candidate.outcome, candidate.error, candidate.exec_ms = "timeout", str(e), self.limits.timeout_s * 1000
+        except Exception as e:
+            candidate.outcome, candidate.error = "error", str(e)
+        return candidate
+
+    def select(self, prompt, n, connect=None, deadline=None, model=None):
+        """Run ``n`` candidates for ``prompt`` and return a Selection.
+
+        ``connect()`` opens the database candidates run on (None clusters by
+        SQL); ``deadline`` bounds each model call in seconds; ``model``
+        replaces the selector's own for this prompt. Raises RuntimeError when
+        no candidate produced an answer.
+        """
+        model = model or self.model
+        n = max(1, min(n, len(self.variants)))
+        runs = {}
+        futures = []
+        for index, (name, temperature, hint) in enumerate(self.variants[:n]):
+            candidate = Candidate(index, name, temperature)
+            futures.append(self._pool.submit(self._run, model, candidate, prompt, hint, connect, deadline, runs))
+        candidates = [future.result() for future in futures]
+        winner = vote(candidates)
+        if winner is None:
+            raise RuntimeError(f"All {n} candidate model calls failed: {candidates[0].error}")
+        return Selection(candidates, winner)
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,70 @@
+# tests/test_cache.py
+"""Response cache keys and the memory tier's last_access write-through.
+
+Run (from "Final Deliverables/The Project"):
+    python -m unittest discover tests
+"""
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from querycraft.cache import ResponseCache, make_key, normalize_text
+
+
+class CacheKeyTest(unittest.TestCase):
+    def key(self, text):
+        return make_key(text, "tmpl", "gemini-pro")
+
+    def test_case_and_spacing_outside_quotes_are_ignored(self):
+        self.assertEqual(self.key("Show  ALL employees"), self.key("show all employees "))
+        self.assertEqual(normalize_text("What's Alice's  SALARY"), "what's alice's salary")
+
+    def test_quoted_literals_keep_their_case(self):
+        self.assertNotEqual(self.key("orders with status 'Paid'"), self.key("orders with status 'paid'"))
+        self.assertNotEqual(self.key('name is "Ann  Lee"'), self.key('name is "Ann Lee"'))
+        self.assertEqual(self.key("Orders with STATUS 'Paid'"), self.key("orders with status 'Paid'"))
+
+
+class HotTierWriteThroughTest(unittest.TestCase):
+    def setUp(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        self.path = os.path.join(workdir.name, "querycraft.db")
+
+    def cache(self, **kwargs):
+        cache = ResponseCache(self.path, **kwargs)
+        self.addCleanup(cache._conn.close)
+        return cache
+
+    def last_access(self, cache, key):
+        return cache._conn.execute("SELECT last_access FROM response_cache WHERE key = ?", (key,)).fetchone()[0]
+
+    def test_hot_hits_are_written_before_eviction(self):
+        cache = self.cache(max_entries=2, touch_batch=100)
+        cache.set("a", "SELECT 1;")
+        time.sleep(0.01)
+        cache.set("b", "SELECT 2;")
+        time.sleep(0.01)
+        self.assertEqual(cache.get("a"), "SELECT 1;")
+        self.assertEqual(cache.hot_hits, 1)
+        cache.set("c", "SELECT 3;")
+        keys = {key for key, in cache._conn.execute("SELECT key FROM response_cache")}
+        self.assertEqual(keys, {"a", "c"})
+
+    def test_hot_hits_are_flushed_in_batches(self):
+        cache = self.cache(touch_batch=2)
+        cache.set("a", "SELECT 1;")
+        cache.set("b", "SELECT 2;")
+        stored = self.last_access(cache, "a")
+        time.sleep(0.01)
+        cache.get("a")
+        self.assertEqual(self.last_access(cache, "a"), stored)
+        cache.get("b")
+        self.assertGreater(self.last_access(cache, "a"), stored)
+
+if __name__ == "__main__":
+    unittest.main()
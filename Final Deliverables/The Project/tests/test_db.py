@@ -0,0 +1,68 @@
+# tests/test_db.py
+"""Query store layout and its one-off migration.
+
+Run (from "Final Deliverables/The Project"):
+    python -m unittest discover tests
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from querycraft.db import MigrationRequired, ensure_queries_table, insert_query, migrate_query_store
+from querycraft.history import HistoryStore
+from querycraft.resources import ConnectionPool
+
+LEGACY_SCHEMA = """
+    CREATE TABLE queries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        input_text TEXT NOT NULL,
+        sql_generated TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+"""
+
+
+class QueryStoreTest(unittest.TestCase):
+    def setUp(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        self.path = os.path.join(workdir.name, "querycraft.db")
+
+    def pool(self):
+        pool = ConnectionPool(self.path, size=1)
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_sql_bodies_are_hash_keyed_and_stored_once(self):
+        history = HistoryStore(self.pool())
+        sql = "SQL Query:\n```sql\n" + "SELECT name, salary FROM employees WHERE salary > 50000;\n" * 4 + "```"
+        for _ in range(3):
+            history.record("high earners", sql)
+        with history.pool.connection() as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*), typeof(body), length(hash) FROM query_sql").fetchone(),
+                             (1, "blob", 16))
+            self.assertEqual(conn.execute("SELECT DISTINCT sql_generated FROM queries").fetchall(),
+                             [(sql[len("SQL Query:\n```sql\n"):-len("```")].strip(),)])
+
+    def test_legacy_table_is_migrated_by_the_maintenance_step_only(self):
+        conn = sqlite3.connect(self.path)
+        conn.executescript(LEGACY_SCHEMA)
+        conn.executemany("INSERT INTO queries (input_text, sql_generated) VALUES (?, ?)",
+                         [("how many employees", "SELECT COUNT(*) FROM employees;")] * 3)
+        conn.commit()
+        with self.assertRaises(MigrationRequired):
+            ensure_queries_table(conn)
+        self.assertEqual(migrate_query_store(conn, chunk_size=2), {"migrated": True, "vacuumed": True})
+        ensure_queries_table(conn)
+        insert_query(conn, "how many employees", "SELECT COUNT(*) FROM employees;")
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM queries").fetchone(), (4,))
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM query_sql").fetchone(), (1,))
+        conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+# tests/test_dialects.py
+"""Extracting, checking and transpiling generated SQL.
+
+Run (from "Final Deliverables/The Project"):
+    python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from querycraft.dialects import CheckedQuery, extract_sql
+from querycraft.resources import DemoDatabase
+
+
+class ExtractSqlTest(unittest.TestCase):
+    def test_prose_lead_in_is_skipped(self):
+        text = "Select all employees older than 30:\nSELECT * FROM employees WHERE age > 30;"
+        self.assertEqual(extract_sql(text), "SELECT * FROM employees WHERE age > 30;")
+
+    def test_trailing_explanation_after_semicolon_is_dropped(self):
+        text = "SELECT name FROM employees;\nThis lists every employee's name."
+        self.assertEqual(extract_sql(text), "SELECT name FROM employees;")
+
+    def test_trailing_explanation_without_semicolon_is_dropped(self):
+        text = "Here is the query:\nSELECT name\nFROM employees\nThis lists every employee's name."
+        self.assertEqual(CheckedQuery(text).sql, "SELECT name\nFROM employees")
+
+    def test_lead_in_and_explanation_together(self):
+        text = "Select the names of employees:\nSELECT name FROM employees WHERE age > 30;\nIt filters on age."
+        self.assertEqual(CheckedQuery(text).sql, "SELECT name FROM employees WHERE age > 30;")
+
+
+class TranspileTest(unittest.TestCase):
+    SQL = "SELECT name FROM employees WHERE hired >= CURRENT_DATE - INTERVAL '1' MONTH"
+
+    def test_interval_arithmetic_is_rewritten_per_dialect(self):
+        rendered = CheckedQuery(self.SQL).transpile()
+        self.assertIn("DATEADD(MONTH, -1", rendered["SQL Server"])
+        self.assertIn("DATE(CURRENT_DATE, '-1 MONTH')", rendered["SQLite"])
+        self.assertIn("DATE_ADD(CURRENT_DATE, INTERVAL -1 MONTH)", rendered["MySQL"])
+        for sql in rendered.values():
+            self.assertNotIn("Could not transpile", sql)
+
+    def test_sqlite_rendering_runs(self):
+        conn = DemoDatabase().clone()
+        self.addCleanup(conn.close)
+        sql = CheckedQuery("SELECT COUNT(*) FROM employees WHERE CURRENT_DATE - INTERVAL '1' MONTH < CURRENT_DATE")
+        self.assertEqual(conn.execute(sql.to("sqlite", pretty=False)).fetchall(), [(4,)])
+
+
+if __name__ == "__main__":
+    unittest.main()
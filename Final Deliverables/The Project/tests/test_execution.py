@@ -0,0 +1,112 @@
+# tests/test_execution.py
+"""Time and size limits on generated queries, and the connection pool's timeout.
+
+Run (from "Final Deliverables/The Project"):
+    python -m unittest discover tests
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from querycraft.execution import (
+    ExecutionLimits,
+    QueryExecutor,
+    QueryQueueTimeout,
+    QueryTimeout,
+    execute_query,
+)
+from querycraft.resources import ConnectionPool, PoolExhausted
+
+ENDLESS = "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n) SELECT COUNT(*) FROM n;"
+COUNT_TO_50 = "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 50) SELECT x FROM n;"
+
+
+def connect():
+    return sqlite3.connect(":memory:", check_same_thread=False)
+
+
+class ExecuteQueryTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = connect()
+        self.addCleanup(self.conn.close)
+
+    def test_recursive_cte_times_out_within_the_limit(self):
+        started = time.monotonic()
+        with self.assertRaises(QueryTimeout):
+            execute_query(self.conn, ENDLESS, ExecutionLimits(timeout_s=0.2))
+        self.assertLess(time.monotonic() - started, 1.0)
+        # the progress handler is removed afterwards
+        self.assertEqual(self.conn.execute("SELECT 1").fetchone(), (1,))
+
+    def test_max_rows_sets_truncated(self):
+        result = execute_query(self.conn, COUNT_TO_50, ExecutionLimits(max_rows=20, page_size=8))
+        self.assertEqual(result.truncated, "rows")
+        self.assertEqual(len(result), 20)
+        self.assertEqual(result.page_count, 3)
+        self.assertEqual(result.to_frame()["x"].tolist(), list(range(1, 21)))
+
+    def test_max_bytes_sets_truncated(self):
+        result = execute_query(self.conn, COUNT_TO_50, ExecutionLimits(max_bytes=80))
+        self.assertEqual(result.truncated, "bytes")
+        self.assertEqual(len(result), 10)
+
+    def test_small_result_is_complete(self):
+        result = execute_query(self.conn, COUNT_TO_50)
+        self.assertIsNone(result.truncated)
+        self.assertEqual(len(result), 50)
+
+
+class QueryExecutorTest(unittest.TestCase):
+    def setUp(self):
+        self.executor = QueryExecutor(connect, max_workers=1, grace_s=0.1)
+        self.addCleanup(self.executor.close)
+
+    def occupy(self, seconds):
+        """Keep the only worker busy for about ``seconds``"""
+        token, future = self.executor.submit(ENDLESS, ExecutionLimits(timeout_s=seconds))
+        self.assertTrue(token.wait(1.0))
+        return future
+
+    def test_queued_query_timer_starts_when_it_runs(self):
+        busy = self.occupy(0.6)
+        # queued for ~0.6s, longer than this query's own 0.2s + 0.1s grace
+        result = self.executor.run(COUNT_TO_50, ExecutionLimits(timeout_s=0.2))
+        self.assertEqual(len(result), 50)
+        self.assertIsInstance(busy.exception(), QueryTimeout)
+
+    def test_query_that_never_starts_raises_queue_timeout(self):
+        self.executor.queue_timeout_s = 0.1
+        busy = self.occupy(0.5)
+        with self.assertRaises(QueryQueueTimeout):
+            self.executor.run(COUNT_TO_50)
+        busy.exception()
+
+    def test_running_query_is_stopped(self):
+        with self.assertRaises(QueryTimeout):
+            self.executor.run(ENDLESS, ExecutionLimits(timeout_s=0.2))
+
+
+class ConnectionPoolTest(unittest.TestCase):
+    def test_exhausted_pool_names_itself(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        path = os.path.join(workdir.name, "querycraft.db")
+        pool = ConnectionPool(path, size=1, timeout=0.05)
+        self.addCleanup(pool.close)
+        with pool.connection():
+            with self.assertRaises(PoolExhausted) as caught:
+                with pool.connection():
+                    pass
+        self.assertIn(path, str(caught.exception))
+        self.assertIsInstance(caught.exception, TimeoutError)
+        with pool.connection() as conn:
+            self.assertEqual(conn.execute("SELECT 1").fetchone(), (1,))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+# tests/test_history.py
+"""Scoped history reads and deletes.
+
+Run (from "Final Deliverables/The Project"):
+    python -m unittest discover tests
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from querycraft.history import HistoryStore
+from querycraft.resources import ConnectionPool
+
+
+class HistoryClearTest(unittest.TestCase):
+    def setUp(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        pool = ConnectionPool(os.path.join(workdir.name, "querycraft.db"), size=1)
+        self.addCleanup(pool.close)
+        self.history = HistoryStore(pool)
+        self.mine = self.history.record("how many employees", "SELECT COUNT(*) FROM employees;",
+                                        user_id="a@example.com", session_id="s1")
+        self.theirs = self.history.record("average salary", "SELECT AVG(salary) FROM employees;",
+                                          user_id="b@example.com", session_id="s2")
+        self.history.accept(self.theirs)
+
+    def test_session_scope_keeps_other_sessions(self):
+        self.assertEqual(self.history.clear(session_id="s1"), 0)
+        self.assertEqual([row[0] for row in self.history.page(10)], [self.theirs])
+        self.assertEqual(self.history.accepted_examples(),
+                         [("average salary", "SELECT AVG(salary) FROM employees;")])
+
+    def test_reports_accepted_rows_removed(self):
+        self.assertEqual(self.history.clear(user_id="b@example.com"), 1)
+        self.assertEqual(self.history.accepted_examples(), [])
+        self.assertEqual(self.history.clear(), 0)
+        self.assertEqual(len(self.history.page(10)), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
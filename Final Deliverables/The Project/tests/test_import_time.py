@@ -0,0 +1,70 @@
+# tests/test_import_time.py
+"""Import-time regression check for the querycraft core.
+
+Each sample imports the core modules in a fresh interpreter and times the
+imports from inside it, so interpreter start-up is not counted. Heavy
+UI/SDK dependencies must not be loaded by the imports.
+
+Run (from "Final Deliverables/The Project"):
+    python -m unittest discover tests
+"""
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CORE_MODULES = (
+    "querycraft",
+    "querycraft.cache",
+    "querycraft.client",
+    "querycraft.examples",
+    "querycraft.execution",
+    "querycraft.fallback",
+    "querycraft.history",
+    "querycraft.pipeline",
+    "querycraft.prompts",
+    "querycraft.resources",
+    "querycraft.schema",
+    "querycraft.streaming",
+    "querycraft.tracing",
+)
+
+# Must only be imported when a feature that needs them is actually used
+HEAVY_MODULES = ("sqlglot", "numpy", "google.generativeai", "streamlit", "streamlit_extras", "PIL", "pandas",
+                 "dotenv")
+
+BUDGET_MS = 100.0
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+elapsed_ms = (time.perf_counter() - started) * 1000
+print(json.dumps({{"ms": elapsed_ms, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def sample(modules):
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE.format(modules=tuple(modules), heavy=HEAVY_MODULES)],
+        cwd=PROJECT_DIR, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output)
+
+
+class ImportTimeTest(unittest.TestCase):
+    def test_pipeline_import_leaves_heavy_dependencies_unloaded(self):
+        self.assertEqual(sample(("querycraft.pipeline",))["heavy"], [])
+
+    def test_core_imports_stay_light_and_fast(self):
+        samples = [sample(CORE_MODULES) for _ in range(3)]
+        self.assertEqual(sorted({name for s in samples for name in s["heavy"]}), [])
+        self.assertLessEqual(min(s["ms"] for s in samples), BUDGET_MS)
+
+
+if __name__ == "__main__":
+    unittest.main()
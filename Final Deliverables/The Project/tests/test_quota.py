@@ -0,0 +1,147 @@
+# tests/test_quota.py
+"""QuotaScheduler waits, token settlement, daily budgets and the Converter's fallbacks.
+
+Run (from "Final Deliverables/The Project"):
+    python -m unittest discover tests
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from querycraft.cache import ResponseCache
+from querycraft.pipeline import Converter
+from querycraft.quota import QuotaExceeded, QuotaScheduler
+from querycraft.resources import ConnectionPool
+from querycraft.rules import demo_engine
+
+
+class UsageMetadata:
+    def __init__(self, prompt_token_count, candidates_token_count):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+
+
+class FakeResponse:
+    def __init__(self, text, usage_metadata=None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class FakeModel:
+    model_name = "fake"
+
+    def __init__(self, text="SELECT name FROM employees;", usage=(10, 5)):
+        self.text = text
+        self.usage = usage
+        self.calls = 0
+
+    def generate_content(self, prompt, **options):
+        self.calls += 1
+        return FakeResponse(self.text, UsageMetadata(*self.usage))
+
+
+class QuotaSchedulerTest(unittest.TestCase):
+    def pool(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        pool = ConnectionPool(os.path.join(workdir.name, "querycraft.db"), size=1)
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_interactive_call_overtakes_a_waiting_batch_call(self):
+        scheduler = QuotaScheduler(requests_per_minute=600, max_wait_s=5.0)  # refills 10 requests a second
+        scheduler.acquire(requests=600)
+        served = []
+
+        def call(priority):
+            scheduler.acquire(priority=priority)
+            served.append(priority)
+
+        batch = threading.Thread(target=call, args=("batch",))
+        batch.start()
+        time.sleep(0.02)  # the batch call is first in line
+        interactive = threading.Thread(target=call, args=("interactive",))
+        interactive.start()
+        batch.join(5)
+        interactive.join(5)
+        self.assertEqual(served, ["interactive", "batch"])
+
+    def test_over_reserved_tokens_are_refunded_on_settle(self):
+        scheduler = QuotaScheduler(requests_per_minute=None, tokens_per_minute=6000, output_reserve=2000,
+                                   pool=self.pool())
+        model = scheduler.bind(FakeModel(usage=(10, 5)), user="a")
+        model.generate_content("how many employees")
+        # 2000+ tokens were reserved; only the 15 really used stay charged
+        self.assertGreater(scheduler.tokens.available, 6000 - 100)
+        self.assertEqual([row[1:5] for row in scheduler.usage()], [("a", 1, 10, 5)])
+
+    def test_failed_call_is_refunded(self):
+        class Broken(FakeModel):
+            def generate_content(self, prompt, **options):
+                raise ConnectionError("reset")
+
+        scheduler = QuotaScheduler(requests_per_minute=None, tokens_per_minute=6000, output_reserve=2000,
+                                   pool=self.pool())
+        with self.assertRaises(ConnectionError):
+            scheduler.bind(Broken(), user="a").generate_content("q")
+        self.assertGreater(scheduler.tokens.available, 6000 - 1)
+        self.assertEqual([row[1:5] for row in scheduler.usage()], [("a", 1, 0, 0)])
+
+    def test_daily_budget_raises_and_survives_a_restart(self):
+        options = dict(requests_per_minute=None, user_tokens_per_day=1000, output_reserve=100, pool=self.pool())
+        scheduler = QuotaScheduler(**options)
+        model = FakeModel(usage=(600, 300))
+        scheduler.bind(model, user="a").generate_content("q")
+        with self.assertRaises(QuotaExceeded) as raised:
+            scheduler.bind(model, user="a").generate_content("q")
+        self.assertGreater(raised.exception.retry_after, 0)
+        scheduler.bind(model, user="b").generate_content("q")  # other users keep their budget
+        scheduler.flush()
+
+        restarted = QuotaScheduler(**options)
+        with self.assertRaises(QuotaExceeded):
+            restarted.bind(model, user="a").generate_content("q")
+        self.assertEqual(model.calls, 2)
+        self.assertEqual([row[1:4] for row in restarted.usage()], [("a", 1, 600), ("b", 1, 600)])
+
+
+class ConverterFallbackTest(unittest.TestCase):
+    QUESTION = "employees who joined last quarter"  # the strict rules decline it, the lenient ones do not
+
+    def setUp(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        self.cache = ResponseCache(os.path.join(workdir.name, "querycraft.db"))
+        self.model = FakeModel("SELECT * FROM employees WHERE joined >= '2026-07-01';")
+
+    def converter(self, scheduler):
+        return Converter(self.model, "fake", cache=self.cache, rules=demo_engine(), scheduler=scheduler)
+
+    @staticmethod
+    def exhausted():
+        scheduler = QuotaScheduler(requests_per_minute=1, max_wait_s=0.0)
+        scheduler.acquire()
+        return scheduler
+
+    def test_out_of_budget_refresh_answers_from_the_cache(self):
+        answered = self.converter(QuotaScheduler()).convert(self.QUESTION)
+        self.assertEqual(answered.source, "model")
+        result = self.converter(self.exhausted()).convert(self.QUESTION, bypass_cache=True)
+        self.assertEqual((result.source, result.sql), ("cache", answered.sql))
+        self.assertIn("budget", result.error)
+        self.assertEqual(self.model.calls, 1)
+
+    def test_out_of_budget_without_a_cached_answer_uses_lenient_rules(self):
+        result = self.converter(self.exhausted()).convert(self.QUESTION)
+        self.assertEqual(result.source, "fallback")
+        self.assertEqual(result.sql, demo_engine().convert(self.QUESTION, strict=False))
+        self.assertEqual(self.model.calls, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,159 @@
+# tests/test_routing.py
+"""Router hedging, failover and circuit breakers over fake models.
+
+Run (from "Final Deliverables/The Project"):
+    python -m unittest discover tests
+"""
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from querycraft.quota import QuotaExceeded
+from querycraft.routing import CircuitBreaker, NoTargetAvailable, Router, Target
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """Answers ``text`` after ``delay`` seconds, or raises ``error``"""
+
+    def __init__(self, text="SELECT 1;", delay=0.0, error=None):
+        self.text = text
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, generation_config=None, stream=False, request_options=None):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return FakeResponse(self.text)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class RouterTest(unittest.TestCase):
+    def router(self, *models, **options):
+        router = Router([Target(f"t{i}", model) for i, model in enumerate(models)], **options)
+        self.addCleanup(router.close)
+        return router
+
+    def test_slow_primary_is_hedged_and_the_backup_wins(self):
+        slow, fast = FakeModel("slow", delay=1.0), FakeModel("fast")
+        router = self.router(slow, fast, hedge_delay=0.05)
+        started = time.perf_counter()
+        self.assertEqual(router.generate_content("q").text, "fast")
+        self.assertLess(time.perf_counter() - started, 0.5)
+        self.assertEqual((router.hedges, router.backup_wins), (1, 1))
+        self.assertEqual((slow.calls, fast.calls), (1, 1))
+
+    def test_fast_primary_is_not_hedged(self):
+        primary, backup = FakeModel("primary"), FakeModel("backup")
+        router = self.router(primary, backup, hedge_delay=0.5)
+        self.assertEqual(router.generate_content("q").text, "primary")
+        self.assertEqual((router.hedges, router.backup_wins, backup.calls), (0, 0, 0))
+
+    def test_single_target_is_not_hedged_against_itself(self):
+        model = FakeModel(delay=0.2)
+        router = self.router(model, hedge_delay=0.02)
+        router.generate_content("q")
+        self.assertEqual((model.calls, router.hedges), (1, 0))
+
+    def test_error_fails_over_to_the_next_target(self):
+        broken, healthy = FakeModel(error=ConnectionError("reset")), FakeModel("healthy")
+        router = self.router(broken, healthy, hedge=False)
+        self.assertEqual(router.generate_content("q").text, "healthy")
+        self.assertEqual(router.backup_wins, 1)
+
+    def test_quota_exceeded_is_not_failed_over(self):
+        limited, healthy = FakeModel(error=QuotaExceeded("no budget")), FakeModel("healthy")
+        router = self.router(limited, healthy, hedge=False)
+        with self.assertRaises(QuotaExceeded):
+            router.generate_content("q")
+        self.assertEqual(healthy.calls, 0)
+        self.assertEqual(router.targets[0].breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(router.targets[0].stats.failures, 0)
+
+    def test_breaker_opens_after_failures_and_probes_after_cooldown(self):
+        clock = FakeClock()
+        model = FakeModel(error=ConnectionError("reset"))
+        router = Router([Target("t0", model, CircuitBreaker(failure_threshold=2, reset_after=30.0, clock=clock))],
+                        hedge=False)
+        self.addCleanup(router.close)
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                router.generate_content("q")
+        with self.assertRaises(NoTargetAvailable):
+            router.generate_content("q")
+        self.assertEqual(model.calls, 2)
+
+        clock.now = 30.0
+        model.error = None
+        self.assertEqual(router.generate_content("q").text, "SELECT 1;")
+        self.assertEqual(router.targets[0].breaker.state, CircuitBreaker.CLOSED)
+
+    def test_counters_are_exact_under_concurrent_calls(self):
+        router = self.router(FakeModel(delay=1.0), FakeModel(), hedge_delay=0.01, max_workers=64)
+        threads = [threading.Thread(target=router.generate_content, args=("q",)) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(router.hedges, router.backup_wins)
+        self.assertEqual(router.hedges, 20)
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def test_opens_after_threshold_and_half_opens_after_cooldown(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=3, reset_after=10.0, clock=clock)
+        for _ in range(2):
+            self.assertTrue(breaker.allow())
+            breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+
+        clock.now = 10.0
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())  # one probe at a time
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+        clock.now = 20.0
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(breaker.allow())
+
+    def test_released_probe_does_not_change_state(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_after=5.0, clock=clock)
+        breaker.record_failure()
+        clock.now = 5.0
+        self.assertTrue(breaker.allow())
+        breaker.release()
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+# tests/test_rules.py
+"""Rule-engine phrasings over the demo ``employees`` table.
+
+Run (from "Final Deliverables/The Project"):
+    python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from querycraft.resources import DemoDatabase
+from querycraft.rules import demo_engine
+
+
+class StrictRulesTest(unittest.TestCase):
+    def setUp(self):
+        self.engine = demo_engine()
+        self.conn = DemoDatabase().clone()
+        self.addCleanup(self.conn.close)
+
+    def rows(self, question, strict=True):
+        sql = self.engine.convert(question, strict=strict)
+        self.assertIsNotNone(sql, question)
+        return self.conn.execute(sql).fetchall()
+
+    def test_simple_questions(self):
+        self.assertEqual(self.rows("how many employees"), [(4,)])
+        self.assertEqual(self.rows("names of employees older than 30"), [("Alice",), ("Bob",), ("David",)])
+        self.assertEqual(self.rows("count employees by department"), [("HR", 1), ("IT", 1), ("Sales", 2)])
+        self.assertEqual(self.rows("highest salary"), [(75000.0,)])
+        self.assertEqual([row[1] for row in self.rows("top 2 employees by salary")], ["Bob", "David"])
+
+    def test_how_many_column_counts_distinct_values(self):
+        self.assertEqual(self.rows("how many departments"), [(3,)])
+        self.assertEqual(self.rows("number of departments"), [(3,)])
+        self.assertEqual(self.rows("number of departments", strict=False), [(3,)])
+
+    def test_ordering_by_an_aggregate_is_declined(self):
+        for question in ("count employees by department ordered by count",
+                         "count employees by department sorted by count desc",
+                         "employees ordered by average salary"):
+            self.assertIsNone(self.engine.convert(question), question)
+
+    def test_superlative_over_rows_is_declined(self):
+        for question in ("employees with highest salary", "employees with the highest salary",
+                         "employees who have the lowest age", "employees whose salary is highest"):
+            self.assertIsNone(self.engine.convert(question), question)
+
+    def test_aggregate_without_a_column_is_declined(self):
+        self.assertIsNone(self.engine.convert("average employees"))
+
+    def test_comparative_needs_a_number(self):
+        self.assertIsNone(self.engine.convert("employees older than thirty"))
+        self.assertNotIn("thirty", self.engine.convert("employees older than thirty", strict=False))
+        self.assertEqual(len(self.rows("employees younger than 30")), 1)
+
+    def test_unknown_words_are_declined(self):
+        self.assertIsNone(self.engine.convert("employees who joined last quarter"))
+        self.assertIsNotNone(self.engine.convert("employees who joined last quarter", strict=False))
+
+
+if __name__ == "__main__":
+    unittest.main()
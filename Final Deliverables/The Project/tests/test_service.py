@@ -0,0 +1,139 @@
+# tests/test_service.py
+"""Single-flight coalescing and queue backpressure of the conversion service.
+
+Run (from "Final Deliverables/The Project"):
+    python -m unittest discover tests
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from querycraft.pipeline import ConversionResult
+from querycraft.quota import QuotaExceeded
+from querycraft.service import CoalescingModel, ConversionService, ServiceClient, ServiceError
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """Answers after ``delay`` seconds, or raises ``error`` then"""
+
+    def __init__(self, text="SELECT 1;", delay=0.0, error=None):
+        self.text = text
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, generation_config=None, stream=False, request_options=None):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return FakeResponse(self.text)
+
+
+class CoalescingModelTest(unittest.TestCase):
+    def test_identical_prompts_share_one_upstream_call(self):
+        model = FakeModel(delay=0.2)
+        coalescing = CoalescingModel(model)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            texts = list(executor.map(lambda _: coalescing.generate_content("q").text, range(8)))
+        self.assertEqual(texts, ["SELECT 1;"] * 8)
+        self.assertEqual((model.calls, coalescing.flights.shared), (1, 7))
+
+    def race(self, leader_model, follower_model):
+        """The leader's call goes upstream first; the follower joins it while it is in flight"""
+        coalescing = CoalescingModel(FakeModel())
+        leader = coalescing.rebind(lambda _: leader_model)
+        follower = coalescing.rebind(lambda _: follower_model)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            led = executor.submit(leader.generate_content, "q")
+            time.sleep(0.05)
+            followed = executor.submit(follower.generate_content, "q")
+            return led, followed
+
+    def test_follower_retries_under_its_own_budget_when_the_leader_is_over_quota(self):
+        over_quota, with_budget = FakeModel(delay=0.2, error=QuotaExceeded("user a is over budget")), FakeModel()
+        led, followed = self.race(over_quota, with_budget)
+        with self.assertRaises(QuotaExceeded):
+            led.result()
+        self.assertEqual(followed.result().text, "SELECT 1;")
+        self.assertEqual((over_quota.calls, with_budget.calls), (1, 1))
+
+    def test_other_leader_errors_are_shared(self):
+        broken, unused = FakeModel(delay=0.2, error=ConnectionError("reset")), FakeModel()
+        led, followed = self.race(broken, unused)
+        for future in (led, followed):
+            with self.assertRaises(ConnectionError):
+                future.result()
+        self.assertEqual(unused.calls, 0)
+
+
+class BlockingConverter:
+    """Holds every conversion until ``release`` is set"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = threading.Semaphore(0)
+
+    def convert(self, question, **options):
+        self.started.release()
+        self.release.wait(5)
+        return ConversionResult(question, "SELECT 1;")
+
+
+class BackpressureTest(unittest.TestCase):
+    def setUp(self):
+        self.converter = BlockingConverter()
+        self.loop = asyncio.new_event_loop()
+        self.service = ConversionService(self.converter, workers=1, queue_size=1)
+        self.loop.run_until_complete(self.service.start("127.0.0.1", 0))
+        thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        thread.start()
+        self.client = ServiceClient("http://%s:%d" % self.service.address, timeout=10)
+        self.executor = ThreadPoolExecutor(max_workers=4)
+
+        def cleanup():
+            self.converter.release.set()
+            self.executor.shutdown(wait=True)
+            asyncio.run_coroutine_threadsafe(self.service.stop(), self.loop).result(5)
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            thread.join(5)
+            self.loop.close()
+
+        self.addCleanup(cleanup)
+
+    def test_full_queue_answers_503(self):
+        running = self.executor.submit(self.client.convert, "first")
+        self.assertTrue(self.converter.started.acquire(timeout=5))  # the only worker is busy
+        queued = self.executor.submit(self.client.convert, "second")
+        while self.service._queue.qsize() < 1:
+            time.sleep(0.01)
+
+        with self.assertRaises(ServiceError) as refused:
+            self.client.convert("third")
+        self.assertEqual(refused.exception.status, 503)
+        self.converter.release.set()
+        self.assertEqual([future.result(5).sql for future in (running, queued)], ["SELECT 1;"] * 2)
+        self.assertEqual(self.service.rejected, 1)
+
+    def test_batch_larger_than_the_free_queue_is_refused_whole(self):
+        with self.assertRaises(ServiceError) as refused:
+            self.client.convert_many(["a", "b"])
+        self.assertEqual(refused.exception.status, 503)
+        self.assertEqual(self.service.rejected, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
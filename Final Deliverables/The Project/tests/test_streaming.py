@@ -0,0 +1,85 @@
+# tests/test_streaming.py
+"""Streamed model output: partial rendering and answers without any SQL.
+
+Run (from "Final Deliverables/The Project"):
+    python -m unittest discover tests
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from querycraft.cache import ResponseCache
+from querycraft.pipeline import Converter
+from querycraft.rules import demo_engine
+from querycraft.streaming import EmptyResponse, StreamedResponse, strip_preamble
+
+
+class Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class StreamingModel:
+    """Streams ``chunks`` (or returns them joined) for every call"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.calls = 0
+
+    def generate_content(self, prompt, stream=False, **options):
+        self.calls += 1
+        if stream:
+            return iter([Chunk(text) for text in self.chunks])
+        return Chunk("".join(self.chunks))
+
+
+class StreamedResponseTest(unittest.TestCase):
+    def test_partials_hold_back_the_preamble_and_fences(self):
+        streamed = StreamedResponse(lambda: iter([Chunk("SQL Qu"), Chunk("ery:\n```sql\nSELECT *"),
+                                                  Chunk(" FROM employees;\n``"), Chunk("`")]))
+        self.assertEqual(list(streamed), ["", "SELECT *", "SELECT * FROM employees;", "SELECT * FROM employees;"])
+        self.assertEqual(streamed.text, "SELECT * FROM employees;")
+        self.assertIsNotNone(streamed.ttft_ms)
+
+    def test_stream_without_sql_is_an_error(self):
+        for chunks in ([], [Chunk("")], [Chunk("SQL Query:\n```sql\n"), Chunk("```")]):
+            streamed = StreamedResponse(lambda: iter(chunks))
+            list(streamed)
+            with self.assertRaises(EmptyResponse):
+                streamed.text
+        self.assertEqual(strip_preamble("SQL Query:\n```\n```"), "")
+
+
+class EmptyAnswerTest(unittest.TestCase):
+    QUESTION = "employees who joined last quarter"  # the strict rules decline it, the lenient ones do not
+
+    def setUp(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        self.cache = ResponseCache(os.path.join(workdir.name, "querycraft.db"))
+        self.addCleanup(self.cache._conn.close)
+
+    def convert(self, model, stream):
+        return Converter(model, "fake", cache=self.cache, rules=demo_engine()).convert(self.QUESTION, stream=stream)
+
+    def test_empty_answer_is_not_cached(self):
+        for stream in (True, False):
+            with self.subTest(stream=stream):
+                self.cache.clear()
+                result = self.convert(StreamingModel(["SQL Query:\n", "```sql\n```"]), stream)
+                self.assertEqual(result.source, "fallback")
+                self.assertTrue(result.sql)
+                self.assertIn("no SQL", result.error)
+                self.assertEqual(self.cache.stats()["entries"], 0)
+
+                model = StreamingModel(["SELECT * FROM employees;"])
+                result = self.convert(model, stream)
+                self.assertEqual((result.source, result.sql), ("model", "SELECT * FROM employees;"))
+                self.assertEqual(model.calls, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()